@@ -1,60 +1,424 @@
 import os
 import json
-import requests
 import math
-from flask import Flask, render_template, request, jsonify
+import time
+import threading
+import hmac
+import secrets
+import hashlib
+import httpx
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context, redirect, send_file
 from dotenv import load_dotenv
-from groq import Groq
+from groq import Groq, APITimeoutError, RateLimitError
+from cache import TTLCache, CACHE_DB_PATH
+from catalogue import DrugCatalogue, DEFAULT_CATALOGUE_PATH, normalize_brand, normalize_composition, split_constituents
+# The backend's module; one copy serves both apps
+from backend.app.name_index import NameIndex
+from kendras import KendraIndex, DEFAULT_KENDRAS_PATH
+from singleflight import SingleFlight
+from stage_graph import StageGraph, StageError, Degraded
+from context_compactor import compact_results, compact_snippets, estimate_tokens, load_tokenizer, log_compaction
+from deadline import Deadline, call_timeout, out_of_time
+from image_store import ImageStore
+from rate_limiter import TokenBucket, PRIORITY_HIGH, PRIORITY_LOW, backoff_delay, parse_retry_after
+
+try:
+    import h2
+except ImportError:  # HTTP/2 is optional; the pooled client falls back to HTTP/1.1 keep-alive
+    h2 = None
 
 # --- Initialization ---
 load_dotenv()
 app = Flask(__name__)
 
 try:
-    groq_client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+    # Retries multiply the per-call timeouts below, so only one is allowed
+    groq_client = Groq(api_key=os.environ.get("GROQ_API_KEY"), max_retries=int(os.environ.get("GROQ_MAX_RETRIES", 1)))
     GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
     GOOGLE_CSE_ID = os.environ.get("GOOGLE_CSE_ID")
 except Exception as e:
     print(f"Error initializing API clients: {e}")
     groq_client = None
 
+# Bounded thread pools for outbound Google calls. Whole queries and the result pages
+# inside a single query use separate pools so a query never waits on its own pool.
+SEARCH_MAX_WORKERS = int(os.environ.get("SEARCH_MAX_WORKERS", 8))
+SEARCH_FANOUT_TIMEOUT = float(os.environ.get("SEARCH_FANOUT_TIMEOUT", 20))
+# Overall time budget of one medicine lookup request; kept below gunicorn's worker timeout
+REQUEST_DEADLINE = float(os.environ.get("REQUEST_DEADLINE", 25))
+query_executor = ThreadPoolExecutor(max_workers=SEARCH_MAX_WORKERS, thread_name_prefix="google-query")
+page_executor = ThreadPoolExecutor(max_workers=SEARCH_MAX_WORKERS * 2, thread_name_prefix="google-page")
+
+# One pooled, thread-safe client for every Google call. Connections are kept alive and
+# reused (multiplexed over HTTP/2 when h2 is installed) instead of paying TCP and TLS
+# setup again for each Custom Search page.
+google_http_client = httpx.Client(
+    http2=h2 is not None,
+    timeout=15,
+    limits=httpx.Limits(
+        max_connections=SEARCH_MAX_WORKERS * 3,
+        max_keepalive_connections=SEARCH_MAX_WORKERS * 3,
+        keepalive_expiry=60
+    )
+)
+
+# Google Custom Search responses are cached per (query, num, start, searchType).
+# TTLs (in seconds) are chosen per query family: prices move daily, compositions almost never.
+SEARCH_CACHE_TTLS = {
+    'price': int(os.environ.get("CACHE_TTL_PRICE", 6 * 3600)),
+    'composition': int(os.environ.get("CACHE_TTL_COMPOSITION", 30 * 86400)),
+    'image': int(os.environ.get("CACHE_TTL_IMAGE", 30 * 86400)),
+    'default': int(os.environ.get("CACHE_TTL_DEFAULT", 86400)),
+}
+google_search_cache = TTLCache('google_search', max_entries=int(os.environ.get("SEARCH_CACHE_SIZE", 2048)))
+
+# Groq completions are memoized on a hash of everything that shapes the answer.
+# The disk tier can be switched off with GROQ_CACHE_PERSIST=0.
+GROQ_MODEL = "llama3-70b-8192"
+# Per-call Groq time limits in seconds. Extractions that only decorate a response
+# (a single price, a drug category) get less time than the main reports.
+GROQ_TIMEOUTS = {
+    'default': float(os.environ.get("GROQ_TIMEOUT", 30)),
+    'auxiliary': float(os.environ.get("GROQ_TIMEOUT_AUXILIARY", 15)),
+}
+groq_cache = TTLCache(
+    'groq_completions',
+    max_entries=int(os.environ.get("GROQ_CACHE_SIZE", 512)),
+    default_ttl=int(os.environ.get("CACHE_TTL_GROQ", 7 * 86400)),
+    db_path=CACHE_DB_PATH if os.environ.get("GROQ_CACHE_PERSIST", "1") != "0" else None
+)
+
+# Token budgets for search results pasted into Groq prompts. GROQ_MODEL has an 8k
+# window shared by the system prompt, the search context and the JSON answer.
+CONTEXT_TOKEN_BUDGETS = {
+    'section': int(os.environ.get("CONTEXT_TOKENS_SECTION", 900)),
+    'results': int(os.environ.get("CONTEXT_TOKENS_RESULTS", 3000)),
+    'snippets': int(os.environ.get("CONTEXT_TOKENS_SNIPPETS", 600)),
+}
+# Budgets are counted with tiktoken; its encoding is loaded (and on first use downloaded) now, not in a request
+load_tokenizer()
+
+# Upstream quotas, tracked in token buckets shared by every worker process (see
+# rate_limiter.py). Google Custom Search counts queries against a daily quota;
+# Groq counts prompt and completion tokens per minute.
+GOOGLE_CSE_DAILY_QUOTA = int(os.environ.get("GOOGLE_CSE_DAILY_QUOTA", 100))
+GROQ_TOKENS_PER_MINUTE = int(os.environ.get("GROQ_TOKENS_PER_MINUTE", 30000))
+# Completion tokens reserved per Groq call on top of the prompt
+GROQ_COMPLETION_TOKENS = int(os.environ.get("GROQ_COMPLETION_TOKENS", 1024))
+# Longest a call waits for quota before falling back to cached data
+RATE_LIMIT_MAX_WAIT = float(os.environ.get("RATE_LIMIT_MAX_WAIT", 5))
+# Retries of a Google page after a 429 or rate-limit 403
+GOOGLE_RATE_LIMIT_RETRIES = 2
+# How long a spent daily Google quota blocks further calls
+GOOGLE_DAILY_LIMIT_BLOCK = int(os.environ.get("GOOGLE_DAILY_LIMIT_BLOCK", 3600))
+GOOGLE_RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded', 'dailyLimitExceeded', 'quotaExceeded'}
+google_rate_limiter = TokenBucket('google_cse', GOOGLE_CSE_DAILY_QUOTA, GOOGLE_CSE_DAILY_QUOTA / 86400)
+groq_rate_limiter = TokenBucket('groq_tokens', GROQ_TOKENS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE / 60)
+RATE_LIMITERS = [google_rate_limiter, groq_rate_limiter]
+
+# The local drug catalogue answers composition and same-composition alternative
+# lookups for known brands without any network calls.
+try:
+    drug_catalogue = DrugCatalogue.load(os.environ.get("CATALOGUE_PATH", DEFAULT_CATALOGUE_PATH))
+    print(f"Loaded {len(drug_catalogue)} medicines into the local catalogue.")
+except Exception as e:
+    print(f"Error loading drug catalogue: {e}")
+    drug_catalogue = DrugCatalogue()
+
+# Typo-tolerant index over catalogue brand names and their generic ingredient names,
+# used to resolve what the user typed ("dollo 650") to a canonical name.
+medicine_name_index = NameIndex()
+for brand in drug_catalogue.brands:
+    medicine_name_index.add(brand)
+for generic_name in drug_catalogue.generic_names():
+    medicine_name_index.add(generic_name)
+
+# Jan Aushadhi Kendra locations, loaded once into a spatial index.
+try:
+    kendra_index = KendraIndex.load(os.environ.get("KENDRAS_PATH", DEFAULT_KENDRAS_PATH))
+except Exception as e:
+    print(f"Error loading Jan Aushadhi Kendra data: {e}")
+    kendra_index = KendraIndex([])
+
+MAX_BATCH_POINTS = int(os.environ.get("KENDRA_BATCH_MAX_POINTS", 10000))
+
+# Identical medicine lookups already in flight (in this or another worker process)
+# are joined rather than repeated. Successful responses are kept just long enough
+# for the callers queued behind them to pick them up.
+request_flights = SingleFlight(
+    'coalesced_requests',
+    result_ttl=int(os.environ.get("COALESCE_RESULT_TTL", 30)),
+    wait_timeout=float(os.environ.get("COALESCE_WAIT_TIMEOUT", 90))
+)
+
+# Intermediate results of medicine lookups (composition, prices, alternatives, ...),
+# shared by every route that needs them. Stages run on their own pool, above the
+# Google query and page pools they submit to.
+stage_executor = ThreadPoolExecutor(max_workers=SEARCH_MAX_WORKERS, thread_name_prefix="stage")
+stage_flights = SingleFlight(
+    'stage_results',
+    result_ttl=SEARCH_CACHE_TTLS['default'],
+    max_entries=int(os.environ.get("STAGE_CACHE_SIZE", 1024))
+)
+medicine_stages = StageGraph(stage_executor, stage_flights, key_normalizers={'composition': normalize_composition})
+
+# Medicine images are resolved lazily by /medicine-image/<name> when the browser asks
+# for them, not while the lookup response is being built. Set IMAGE_STORE_DIR to keep
+# a local copy (a thumbnail when Pillow is installed) of every image resolved.
+IMAGE_RESOLVE_DEADLINE = float(os.environ.get("IMAGE_RESOLVE_DEADLINE", 10))
+# Browser cache lifetimes in seconds for image redirects, stored images and "no image found"
+IMAGE_MAX_AGES = {
+    'redirect': int(os.environ.get("IMAGE_MAX_AGE_REDIRECT", 86400)),
+    'stored': int(os.environ.get("IMAGE_MAX_AGE_STORED", 30 * 86400)),
+    'missing': int(os.environ.get("IMAGE_MAX_AGE_MISSING", 3600)),
+}
+IMAGE_STORE_DIR = os.environ.get("IMAGE_STORE_DIR")
+# Image URLs handed out in responses are signed, so /medicine-image only spends image
+# searches on names this app issued (or on catalogue brands). Signed URLs are kept in
+# the response cache for days, so the key must outlive restarts and be the same in
+# every worker: without IMAGE_URL_SECRET (which several machines must share) a key is
+# generated once and kept in a file beside the cache, living and dying with it.
+IMAGE_URL_SECRET_PATH = os.environ.get("IMAGE_URL_SECRET_PATH", os.path.join(os.path.dirname(CACHE_DB_PATH), "image_url_secret"))
+
+def persisted_secret(path):
+    """
+    Returns the secret stored in the file at `path`, creating the file on first use.
+    """
+    if not os.path.exists(path):
+        # Written aside and linked into place, so concurrent workers agree on one secret
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(secrets.token_hex(32))
+        os.chmod(temp_path, 0o600)
+        try:
+            os.link(temp_path, path)
+            print(f"Generated a new image URL key in {path}")
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(temp_path)
+    with open(path) as f:
+        return f.read().strip()
+
+IMAGE_URL_SECRET = (os.environ.get("IMAGE_URL_SECRET") or persisted_secret(IMAGE_URL_SECRET_PATH)).encode('utf-8')
+image_store = ImageStore(IMAGE_STORE_DIR, httpx.Client(timeout=5, follow_redirects=True)) if IMAGE_STORE_DIR else None
+
+# Complete lookup responses, served from cache with stale-while-revalidate: a response
+# is fresh for RESPONSE_FRESH_TTL seconds, after which it is still served (for up to
+# RESPONSE_STALE_TTL more) while a background refresh replaces it. warmup.py fills
+# and refreshes this cache for popular medicines off-peak.
+RESPONSE_FRESH_TTL = int(os.environ.get("RESPONSE_FRESH_TTL", SEARCH_CACHE_TTLS['price']))
+RESPONSE_STALE_TTL = int(os.environ.get("RESPONSE_STALE_TTL", 3 * 86400))
+response_cache = TTLCache(
+    'lookup_responses',
+    max_entries=int(os.environ.get("RESPONSE_CACHE_SIZE", 1024)),
+    default_ttl=RESPONSE_FRESH_TTL + RESPONSE_STALE_TTL
+)
+refresh_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("RESPONSE_REFRESH_WORKERS", 2)),
+                                      thread_name_prefix="refresh")
+refreshing_keys = set()
+refreshing_lock = threading.Lock()
+
+# Caches that can be inspected and purged through the admin endpoints.
+CACHES = {
+    google_search_cache.namespace: google_search_cache,
+    groq_cache.namespace: groq_cache,
+    request_flights.results.namespace: request_flights.results,
+    stage_flights.results.namespace: stage_flights.results,
+    response_cache.namespace: response_cache,
+}
+
 # --- API Helper Functions ---
 
-def perform_google_search(query, api_key, cse_id, num_results=10):
+def coalesce_key(route, medicine_name):
     """
-    Performs a Google search, handling pagination for more than 10 results.
-    Returns a tuple: (list_of_results, error_message).
-    Each result is a dictionary with 'snippet', 'title', and 'link'.
-    On success, error_message is None. On failure, list_of_results is None.
+    Builds the single-flight key for a lookup. Names are case and whitespace insensitive.
     """
-    print(f"--- Performing Google Search for: '{query}' ---")
-    if not api_key or not cse_id:
-        return None, "Google Search API credentials are not configured on the server."
+    return f"{route}:{' '.join(medicine_name.lower().split())}"
 
-    url = "https://www.googleapis.com/customsearch/v1"
-    all_results = []
-    
-    # The API is limited to 10 results per request. Paginate if more are requested.
-    # The API is also limited to a total of 100 results.
-    num_results = min(num_results, 100)
-    
-    for start_index in range(1, num_results, 10):
-        num_for_this_request = min(10, num_results - start_index + 1)
-        
-        params = {
-            'q': query, 
-            'key': api_key, 
-            'cx': cse_id, 
-            'num': num_for_this_request,
-            'start': start_index
-        }
-        
+def is_complete_response(result):
+    """
+    True for a (payload, status) result that may be reused by later requests: a 200 that
+    is not missing any sections because of failures or the request deadline, and has no
+    degraded sections standing in for ones that could not be looked up.
+    """
+    return (result is not None and result[1] == 200 and not result[0].get('missing_sections')
+            and not result[0].get('degraded_sections'))
+
+def store_response(route, medicine_name, result):
+    """
+    Keeps a complete (payload, status) lookup result in the response cache.
+    """
+    if not is_complete_response(result):
+        return
+    now = time.time()
+    response_cache.set(coalesce_key(route, medicine_name), {
+        'payload': result[0],
+        'status': result[1],
+        'cached_at': now,
+        'fresh_until': now + RESPONSE_FRESH_TTL
+    })
+
+def cached_response(route, medicine_name):
+    """
+    Returns the cached (payload, status) for a lookup, or None. A stale entry is still
+    returned, and a background refresh is started to replace it.
+    """
+    entry = response_cache.get(coalesce_key(route, medicine_name))
+    if entry is None:
+        return None
+    if entry['fresh_until'] <= time.time():
+        schedule_refresh(route, medicine_name)
+    return entry['payload'], entry['status']
+
+def schedule_refresh(route, medicine_name):
+    """
+    Recomputes a lookup on the refresh pool unless a refresh of it is already queued here.
+    """
+    key = coalesce_key(route, medicine_name)
+    with refreshing_lock:
+        if key in refreshing_keys:
+            return
+        refreshing_keys.add(key)
+
+    def refresh():
         try:
-            print(f"   - Requesting {num_for_this_request} results, starting at index {start_index}...")
-            response = requests.get(url, params=params, timeout=15)
+            print(f"--- Refreshing stale '{route}' response for '{medicine_name}' ---")
+            refresh_response(route, medicine_name)
+        except Exception as e:
+            print(f"Error refreshing '{route}' response for '{medicine_name}': {e}")
+        finally:
+            with refreshing_lock:
+                refreshing_keys.discard(key)
+
+    refresh_executor.submit(refresh)
+
+def refresh_response(route, medicine_name):
+    """
+    Runs a lookup for `medicine_name` outside any user request, bypassing the response
+    cache, and stores the result. Returns the (payload, status) result.
+    """
+    deadline = Deadline(REQUEST_DEADLINE)
+    compute = LOOKUPS[route]
+    return run_coalesced(route, medicine_name, lambda: compute(medicine_name, deadline), deadline)
+
+def run_coalesced(route, medicine_name, compute, deadline):
+    """
+    Runs `compute` (returning a (payload, status) result) for a lookup, joining an identical
+    lookup already in flight. Waiting for that lookup counts against the request's `deadline`.
+    """
+    call, shared = request_flights.begin(coalesce_key(route, medicine_name), timeout=deadline.remaining())
+    if shared is not None:
+        payload, status = shared
+        return payload, status
+    if call is None:
+        return compute()
+
+    result = None
+    try:
+        result = compute()
+        return result
+    finally:
+        request_flights.finish(call, result, cacheable=is_complete_response(result))
+        store_response(route, medicine_name, result)
+
+def serve_coalesced(route):
+    """
+    Answers a JSON medicine lookup request with `LOOKUPS[route]`, so that identical
+    concurrent requests share one computation, and complete responses are served from
+    the response cache afterwards. Only complete 200 responses are shared across
+    processes; errors and partial responses reach the requests already waiting on them
+    but are never cached. The request's Deadline starts here.
+    """
+    deadline = Deadline(REQUEST_DEADLINE)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid request: expected a JSON object."}), 400
+    medicine_name = data.get('medicine_name')
+    medicine_name = medicine_name.strip() if isinstance(medicine_name, str) else ''
+    if not medicine_name:
+        return jsonify({'error': 'Please enter a medicine name.'}), 400
+
+    result = cached_response(route, medicine_name)
+    if result is None:
+        compute = LOOKUPS[route]
+        result = run_coalesced(route, medicine_name, lambda: compute(medicine_name, deadline), deadline)
+    payload, status = result
+    return jsonify(payload), status
+
+def search_cache_key(query, num, start, search_type=None):
+    """
+    Builds the cache key for one Custom Search request. Queries are case and whitespace insensitive.
+    """
+    normalized_query = " ".join(query.lower().split())
+    return json.dumps([normalized_query, num, start, search_type])
+
+def search_cache_ttl(query, search_type=None):
+    """
+    Picks the TTL for a Custom Search request based on its query family.
+    """
+    if search_type == 'image':
+        return SEARCH_CACHE_TTLS['image']
+    lowered = query.lower()
+    if any(word in lowered for word in ('price', 'cost', 'buy')):
+        return SEARCH_CACHE_TTLS['price']
+    if any(word in lowered for word in ('composition', 'ingredient')):
+        return SEARCH_CACHE_TTLS['composition']
+    return SEARCH_CACHE_TTLS['default']
+
+def google_rate_limit_backoff(response, attempt):
+    """
+    Returns how many seconds to hold off Google after an error response, or None when
+    the error is not a rate or quota limit. Retry-After is honoured when present.
+    """
+    if response.status_code == 429:
+        return backoff_delay(attempt, parse_retry_after(response.headers.get('Retry-After')))
+    if response.status_code != 403:
+        return None
+    try:
+        reasons = {error.get('reason') for error in response.json().get('error', {}).get('errors', [])}
+    except ValueError:
+        return None
+    if 'dailyLimitExceeded' in reasons:
+        return GOOGLE_DAILY_LIMIT_BLOCK
+    return backoff_delay(attempt) if reasons & GOOGLE_RATE_LIMIT_REASONS else None
+
+def _stale_search_page(cache_key, query):
+    """
+    Answers a search that cannot reach Google with its expired cached results, if any.
+    """
+    stale_results = google_search_cache.get_stale(cache_key)
+    if stale_results is not None:
+        print(f"   - Google quota exhausted; serving expired cached results for '{query}'")
+        return stale_results, None
+    return None, "The search quota is used up for now. Please try again later."
+
+def _fetch_search_page(url, params, query, deadline=None, priority=PRIORITY_HIGH):
+    """
+    Fetches a single page of Google Custom Search results, serving repeats from the cache.
+    The call waits its turn on the shared Google quota; when the quota is spent or Google
+    answers with a rate limit, expired cached results are served instead.
+    Returns a tuple: (list_of_results, error_message), like perform_google_search.
+    """
+    cache_key = search_cache_key(query, params['num'], params['start'])
+    cached_results = google_search_cache.get(cache_key)
+    if cached_results is not None:
+        print(f"   - Cache hit for {params['num']} results, starting at index {params['start']}")
+        return cached_results, None
+
+    for attempt in range(GOOGLE_RATE_LIMIT_RETRIES + 1):
+        if out_of_time(deadline):
+            return None, "The search ran out of time."
+        if not google_rate_limiter.acquire(priority=priority, max_wait=call_timeout(deadline, RATE_LIMIT_MAX_WAIT)):
+            return _stale_search_page(cache_key, query)
+
+        try:
+            print(f"   - Requesting {params['num']} results, starting at index {params['start']}...")
+            response = google_http_client.get(url, params=params, timeout=call_timeout(deadline, 15))
             response.raise_for_status()
             results = response.json().get('items', [])
-            
+
             processed_results = [
                 {
                     'title': item.get('title', ''),
@@ -63,74 +427,678 @@ def perform_google_search(query, api_key, cse_id, num_results=10):
                 }
                 for item in results
             ]
-            all_results.extend(processed_results)
-            
-        except requests.exceptions.HTTPError as http_err:
+            google_search_cache.set(cache_key, processed_results, ttl=search_cache_ttl(query))
+            return processed_results, None
+
+        except httpx.HTTPStatusError as http_err:
+            backoff = google_rate_limit_backoff(http_err.response, attempt)
+            if backoff is not None:
+                # Every worker holds off; the next attempt waits for the block to lapse if it can
+                print(f"Google Search rate limited for query '{query}'; holding off for {backoff:.1f}s")
+                google_rate_limiter.block_for(backoff)
+                continue
             error_details = http_err.response.json().get('error', {})
             error_message = error_details.get('message', 'An unknown HTTP error occurred.')
             status_code = error_details.get('code', 'N/A')
             print(f"Google Search HTTP Error for query '{query}': {status_code} - {error_message}")
             return None, f"Google API Error: {error_message}"
-        except requests.exceptions.RequestException as req_err:
+        except httpx.HTTPError as req_err:
             print(f"Google Search Request Error for query '{query}': {req_err}")
             return None, "A network error occurred while contacting the Google Search API."
         except Exception as e:
             print(f"An unexpected error occurred during Google Search for '{query}': {e}")
             return None, "An unexpected server error occurred during the search."
+    return _stale_search_page(cache_key, query)
+
+def perform_google_search(query, api_key, cse_id, num_results=10, deadline=None, priority=PRIORITY_HIGH):
+    """
+    Performs a Google search, handling pagination for more than 10 results.
+    Network calls are cut short to fit the request `deadline`, if given. Low `priority`
+    searches leave the last part of the Google quota to high-priority ones.
+    Returns a tuple: (list_of_results, error_message).
+    Each result is a dictionary with 'snippet', 'title', and 'link'.
+    On success, error_message is None. On failure, list_of_results is None.
+    """
+    print(f"--- Performing Google Search for: '{query}' ---")
+    if not api_key or not cse_id:
+        return None, "Google Search API credentials are not configured on the server."
+
+    url = "https://www.googleapis.com/customsearch/v1"
+    
+    # The API is limited to 10 results per request. Paginate if more are requested.
+    # The API is also limited to a total of 100 results.
+    num_results = min(num_results, 100)
+    
+    pages = []
+    for start_index in range(1, num_results, 10):
+        num_for_this_request = min(10, num_results - start_index + 1)
+        pages.append({
+            'q': query, 
+            'key': api_key, 
+            'cx': cse_id, 
+            'num': num_for_this_request,
+            'start': start_index
+        })
+
+    # A single page needs no thread hand-off; extra pages are fetched concurrently.
+    if len(pages) == 1:
+        return _fetch_search_page(url, pages[0], query, deadline, priority)
+
+    futures = [page_executor.submit(_fetch_search_page, url, params, query, deadline, priority) for params in pages]
+    all_results = []
+    for future in futures:
+        results, error = future.result()
+        if error:
+            return None, error
+        all_results.extend(results)
             
     return all_results, None
 
-def get_medicine_image_url(medicine_name, api_key, cse_id):
+def iter_searches_concurrently(queries, api_key, cse_id, timeout=SEARCH_FANOUT_TIMEOUT, deadline=None):
+    """
+    Runs many Google searches in parallel under a single overall deadline.
+    `queries` is a list of (key, (query, num_results)) tuples.
+    Yields (position, key, list_of_results, error_message) as each search finishes,
+    where `position` is the query's index in `queries`. Searches that have not
+    finished when the deadline expires are reported as errors. The deadline is the
+    earlier of `timeout` seconds and the request `deadline`.
+    """
+    timeout = call_timeout(deadline, timeout)
+    futures = {
+        query_executor.submit(perform_google_search, query, api_key, cse_id, num_results, deadline): position
+        for position, (_, (query, num_results)) in enumerate(queries)
+    }
+    pending = set(futures)
+    try:
+        for future in as_completed(futures, timeout=timeout):
+            pending.discard(future)
+            position = futures[future]
+            search_results, error = future.result()
+            yield position, queries[position][0], search_results, error
+    except FuturesTimeoutError:
+        for future in pending:
+            future.cancel()
+            position = futures[future]
+            print(f"Google Search timed out after {timeout}s for query '{queries[position][1][0]}'")
+            yield position, queries[position][0], None, "The search timed out."
+
+def run_searches_concurrently(queries, api_key, cse_id, timeout=SEARCH_FANOUT_TIMEOUT, deadline=None):
+    """
+    Like iter_searches_concurrently, but waits for every search and returns a list of
+    (key, list_of_results, error_message) in the same order as `queries`.
+    """
+    outcomes = [None] * len(queries)
+    for position, key, search_results, error in iter_searches_concurrently(queries, api_key, cse_id, timeout, deadline):
+        outcomes[position] = (key, search_results, error)
+    return outcomes
+
+def get_medicine_image_url(medicine_name, api_key, cse_id, deadline=None):
     """
     Gets the URL of the first relevant image result for a medicine.
+    Images are low priority: without spare Google quota an expired cached link is used.
     """
     print(f"--- Searching for image of: {medicine_name} ---")
     if not api_key or not cse_id: return None
     url = "https://www.googleapis.com/customsearch/v1"
     # A more specific query to get clean product shots
     query = f'{medicine_name} tablet strip box'
+    cache_key = search_cache_key(query, 1, 1, 'image')
+    cached_link = google_search_cache.get(cache_key)
+    if cached_link is not None:
+        return cached_link or None
+    if out_of_time(deadline):
+        return None
+    if not google_rate_limiter.acquire(priority=PRIORITY_LOW, max_wait=call_timeout(deadline, RATE_LIMIT_MAX_WAIT)):
+        return google_search_cache.get_stale(cache_key) or None
     params = {'q': query, 'key': api_key, 'cx': cse_id, 'searchType': 'image', 'num': 1, 'imgSize': 'medium'}
     try:
-        response = requests.get(url, params=params, timeout=5)
+        response = google_http_client.get(url, params=params, timeout=call_timeout(deadline, 5))
         response.raise_for_status()
         items = response.json().get('items', [])
-        return items[0]['link'] if items else None
+        link = items[0]['link'] if items else None
+        # An empty string records "no image found" so repeats skip the API as well.
+        google_search_cache.set(cache_key, link or "", ttl=search_cache_ttl(query, 'image'))
+        return link
+    except httpx.HTTPStatusError as http_err:
+        backoff = google_rate_limit_backoff(http_err.response, 0)
+        if backoff is not None:
+            google_rate_limiter.block_for(backoff)
+        print(f"Google Image Search Error: {http_err}")
+        return google_search_cache.get_stale(cache_key) or None
     except Exception as e:
         print(f"Google Image Search Error: {e}")
         return None
 
-def process_with_groq(system_prompt, user_prompt):
+def resolve_medicine_name(user_query):
+    """
+    Maps a misspelt medicine name onto the known brand or generic name it stands for.
+    Returns the query unchanged unless exactly one name is that close to it; a partial
+    name such as "crocin" is never completed to a particular product.
+    """
+    if drug_catalogue.lookup(user_query):
+        return user_query
+    match = medicine_name_index.correct(user_query)
+    if match:
+        print(f"--- Resolved '{user_query}' to '{match['name']}' ---")
+        return match['name']
+    return user_query
+
+def format_catalogue_price(price):
+    """
+    Formats a catalogue price in rupees, or returns None when the catalogue has no price.
+    """
+    return f"₹{price:.2f}" if price is not None else None
+
+def groq_cache_key(model, system_prompt, user_prompt, response_format):
+    """
+    Content-addresses a completion request so byte-identical prompts share one cache entry.
+    """
+    payload = json.dumps([model, system_prompt, user_prompt, response_format], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def reserve_groq_tokens(system_prompt, user_prompt, priority=PRIORITY_HIGH, deadline=None):
+    """
+    Takes a call's estimated prompt and completion tokens from the shared Groq quota,
+    waiting briefly for them. Returns False when the quota cannot cover the call in time.
+    """
+    cost = estimate_tokens(system_prompt) + estimate_tokens(user_prompt) + GROQ_COMPLETION_TOKENS
+    return groq_rate_limiter.acquire(cost, priority, max_wait=call_timeout(deadline, RATE_LIMIT_MAX_WAIT))
+
+def groq_rate_limited(cache_key, retry_after=None):
+    """
+    Answers a call that hit the Groq rate limit with an expired cached completion, if any.
+    `retry_after` (seconds, from a 429) holds off every worker for that long.
+    """
+    if retry_after is not None:
+        groq_rate_limiter.block_for(retry_after)
+    stale_response = groq_cache.get_stale(cache_key)
+    if stale_response is not None:
+        print("--- Groq rate limited; serving expired cached response ---")
+        return stale_response
+    return {"error": "The AI service is busy right now. Please try again in a moment."}
+
+def process_with_groq(system_prompt, user_prompt, timeout=None, deadline=None, priority=PRIORITY_HIGH):
     """
     A generic function to call the Groq AI with specified prompts.
+    Responses that parse as valid JSON are memoized, so identical requests skip the API.
+    The call is abandoned after `timeout` seconds (GROQ_TIMEOUTS['default'] when omitted),
+    or earlier if the request `deadline` passes first. It waits its turn on the shared
+    Groq token quota; low `priority` calls leave the last part of it to the others.
     """
+    response_format = {"type": "json_object"}
+    cache_key = groq_cache_key(GROQ_MODEL, system_prompt, user_prompt, response_format)
+    cached_response = groq_cache.get(cache_key)
+    if cached_response is not None:
+        print("--- Groq cache hit ---")
+        return cached_response
+
     if not groq_client: 
         print("Groq client not initialized.")
         return {"error": "AI service is not available."}
+    if out_of_time(deadline):
+        return {"error": "The request ran out of time before the AI could respond."}
+    if not reserve_groq_tokens(system_prompt, user_prompt, priority, deadline):
+        return groq_rate_limited(cache_key)
+    timeout = call_timeout(deadline, timeout or GROQ_TIMEOUTS['default'])
         
     try:
         completion = groq_client.chat.completions.create(
-            model="llama3-70b-8192",
-            response_format={"type": "json_object"},
+            model=GROQ_MODEL,
+            response_format=response_format,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
-            ]
+            ],
+            timeout=timeout
         )
         response_text = completion.choices[0].message.content
         
         try:
-            # Ensure we get valid JSON
-            return json.loads(response_text)
+            # Ensure we get valid JSON; only valid responses are cached
+            parsed_response = json.loads(response_text)
+            groq_cache.set(cache_key, parsed_response)
+            return parsed_response
         except json.JSONDecodeError as json_err:
             print(f"JSON parsing error: {json_err}. Response text: {response_text[:200]}...")
             return {"error": "Failed to parse AI response as JSON."}
             
+    except APITimeoutError:
+        print(f"Groq API call timed out after {timeout:.1f}s")
+        return {"error": "The AI service took too long to respond."}
+    except RateLimitError as e:
+        # The client has already retried once, honouring Retry-After
+        print(f"Groq API rate limited: {e}")
+        return groq_rate_limited(cache_key, parse_retry_after(e.response.headers.get('retry-after')) or backoff_delay(0))
+    except Exception as e:
+        print(f"Groq API Error: {e}")
+        return {"error": "The AI service encountered an error during processing."}
+
+def stream_with_groq(system_prompt, user_prompt, deadline=None):
+    """
+    Streams a JSON-mode Groq completion, yielding text deltas as they arrive.
+    The generator's return value is the parsed JSON (or an error dict), as with process_with_groq,
+    and valid responses are memoized in the same cache.
+    """
+    response_format = {"type": "json_object"}
+    cache_key = groq_cache_key(GROQ_MODEL, system_prompt, user_prompt, response_format)
+    cached_response = groq_cache.get(cache_key)
+    if cached_response is not None:
+        print("--- Groq cache hit ---")
+        return cached_response
+
+    if not groq_client:
+        print("Groq client not initialized.")
+        return {"error": "AI service is not available."}
+    if out_of_time(deadline):
+        return {"error": "The request ran out of time before the AI could respond."}
+    if not reserve_groq_tokens(system_prompt, user_prompt, deadline=deadline):
+        return groq_rate_limited(cache_key)
+
+    stream = None
+    try:
+        stream = groq_client.chat.completions.create(
+            model=GROQ_MODEL,
+            response_format=response_format,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            stream=True,
+            timeout=call_timeout(deadline, GROQ_TIMEOUTS['default'])
+        )
+        parts = []
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+        response_text = "".join(parts)
+    except APITimeoutError:
+        print("Groq API stream timed out")
+        return {"error": "The AI service took too long to respond."}
+    except RateLimitError as e:
+        print(f"Groq API rate limited: {e}")
+        return groq_rate_limited(cache_key, parse_retry_after(e.response.headers.get('retry-after')) or backoff_delay(0))
     except Exception as e:
         print(f"Groq API Error: {e}")
         return {"error": "The AI service encountered an error during processing."}
+    finally:
+        # Also reached when the consumer stops early; closing drops the upstream HTTP response
+        if stream is not None:
+            stream.close()
+
+    try:
+        parsed_response = json.loads(response_text)
+        groq_cache.set(cache_key, parsed_response)
+        return parsed_response
+    except json.JSONDecodeError as json_err:
+        print(f"JSON parsing error: {json_err}. Response text: {response_text[:200]}...")
+        return {"error": "Failed to parse AI response as JSON."}
+
+# --- Medicine Stage Graph ---
+# /search, /price-comparison and /alternative-medicine-price are built from the
+# stages below (see stage_graph.py). Each route asks for the stages it needs; stage
+# outputs are cached per medicine and/or composition, so later requests for the same
+# drug only run the stages that are missing.
+
+def search_all(queries, deadline=None):
+    """
+    Runs (query, num_results) searches concurrently and concatenates their results.
+    Returns None when every search failed.
+    """
+    outcomes = run_searches_concurrently(list(enumerate(queries)), GOOGLE_API_KEY, GOOGLE_CSE_ID, deadline=deadline)
+    if all(error for _, _, error in outcomes):
+        return None
+    return [item for _, search_results, error in outcomes if not error for item in search_results or []]
+
+@medicine_stages.stage('composition', ttl=SEARCH_CACHE_TTLS['composition'])
+def composition_stage(inputs):
+    """
+    The drug's constituents, e.g. "Paracetamol 500mg", from the local catalogue or the web.
+    """
+    medicine_name = inputs['medicine']
+    catalogue_entry = drug_catalogue.lookup(medicine_name)
+    if catalogue_entry:
+        print(f"\n--- STAGE 1: Composition for '{medicine_name}' found in local catalogue ---")
+        return catalogue_entry['constituents']
+
+    print(f"\n--- STAGE 1: Initial AI Analysis & Composition for '{medicine_name}' ---")
+    composition_context_list, error = perform_google_search(f'"{medicine_name}" composition ingredients', GOOGLE_API_KEY, GOOGLE_CSE_ID, num_results=5, deadline=inputs['deadline'])
+    if error:
+        print(f"ERROR during composition search: {error}")
+        # Without the web, a close catalogue name is better than no answer; it is not
+        # cached and the response says whose composition it is
+        match = medicine_name_index.best_match(medicine_name)
+        catalogue_entry = drug_catalogue.lookup(match['name']) if match else None
+        if catalogue_entry:
+            print(f"--- Using catalogue composition of '{match['name']}' instead ---")
+            return Degraded(catalogue_entry['constituents'],
+                            f"Web search is unavailable; showing the composition of '{match['name']}' from the local catalogue.")
+        raise StageError(error)
+    if not composition_context_list:
+        raise StageError("Could not find any composition information for this drug via web search.", 404)
+
+    composition_context_str = compact_snippets(composition_context_list, CONTEXT_TOKEN_BUDGETS['snippets'])
+
+    stage1_system_prompt = """
+    From the user query and web context, your only job is to identify the drug's exact chemical composition.
+    Output a single, raw JSON object with one key, 'composition'. If no clear composition is found, respond with {"composition": null}.
+    Example: { "composition": "Paracetamol 500mg" }
+    """
+    composition_result = process_with_groq(stage1_system_prompt, f"CONTEXT: {composition_context_str}\nUSER QUERY: {medicine_name}", deadline=inputs['deadline'])
+    if isinstance(composition_result, dict) and 'error' in composition_result:
+        raise StageError(composition_result['error'])
+
+    composition = composition_result.get("composition")
+    if not composition:
+        raise StageError("AI could not determine the drug's composition from the search results.", 404)
+    return composition
+
+# Per-section searches behind the /search report; they depend only on the composition
+SEARCH_SECTION_QUERIES = {
+    "uses": ('"{composition}" detailed uses and indications', 10),
+    "side_effects": ('"{composition}" common and rare side effects professional', 10),
+    "warnings": ('"{composition}" contraindications and warnings official prescribing information', 10),
+    "generic_info": ('what is "{generic_name}" medicine class and mechanism of action', 5)
+}
+
+def register_section_stage(section, query_template, num_results):
+    @medicine_stages.stage(section, requires=('composition',), key=('composition',))
+    def section_stage(inputs):
+        composition = inputs['composition']
+        query = query_template.format(composition=composition, generic_name=composition.split(' ')[0])
+        search_results, error = perform_google_search(query, GOOGLE_API_KEY, GOOGLE_CSE_ID, num_results=num_results, deadline=inputs['deadline'])
+        if error:
+            raise StageError(error)
+        return search_results
+
+for section, (query_template, num_results) in SEARCH_SECTION_QUERIES.items():
+    register_section_stage(section, query_template, num_results)
+
+@medicine_stages.stage('alternative_results', requires=('composition',), key=('medicine', 'composition'))
+def alternative_results_stage(inputs):
+    """
+    Web search results about other brands with the same composition. Empty when the
+    local catalogue already lists same-composition brands.
+    """
+    medicine_name, composition = inputs['medicine'], inputs['composition']
+    if drug_catalogue.same_composition(composition, exclude_brand=medicine_name):
+        return []
+    generic_name = composition.split(' ')[0]
+    return search_all([
+        (f'"{composition}" brand names and manufacturers in india', 15),
+        (f'substitutes for "{medicine_name}" with same composition "{composition}"', 10),
+        (f'"{generic_name}" equivalent brands and prices', 10),
+        (f'"{composition}" alternative brand names', 15)
+    ], deadline=inputs['deadline'])
+
+@medicine_stages.stage('alternatives', requires=('composition', 'alternative_results'), key=('medicine', 'composition'))
+def alternatives_stage(inputs):
+    """
+    Alternative brands with the same active ingredients, each with a price and a confidence score.
+    """
+    medicine_name, composition = inputs['medicine'], inputs['composition']
+    catalogue_rows = drug_catalogue.same_composition(composition, exclude_brand=medicine_name)
+    if catalogue_rows:
+        # Same-composition brands from the catalogue are exact matches; no web search or AI needed
+        return [
+            {
+                "name": row['brand'],
+                "manufacturer": row['manufacturer'],
+                "active_ingredients": row['constituents'],
+                "price": format_catalogue_price(row['price']) or 'Price not available',
+                "confidence": 100
+            }
+            for row in catalogue_rows
+        ]
+
+    alternative_results = inputs['alternative_results']
+    if not alternative_results:
+        raise StageError('Could not find alternative medicines.', 404)
+    active_ingredients = split_constituents(composition)
+
+    alternatives_prompt = f"""
+    You are a pharmaceutical expert specializing in medication alternatives and pricing. Based on the search results provided, identify alternative medicines/brands that contain the SAME active ingredients as the original medicine "{medicine_name}" with active ingredients: {", ".join(active_ingredients)}.
+
+    CRITICAL INSTRUCTIONS:
+    1. Focus ONLY on medicines that have the EXACT SAME active ingredients and strengths as the original
+    2. For each alternative medicine found, extract:
+       - Brand name (exact spelling is important)
+       - Manufacturer name (if available)
+       - Price information (if available, with quantity details like "₹25 for 10 tablets")
+       - Active ingredients confirmation (to verify it matches the original)
+    3. Exclude the original medicine "{medicine_name}" from the list
+    4. Include at least 5 alternatives if possible, but only if they truly match the active ingredients
+    5. For each alternative, include a confidence score (0-100%) indicating how certain you are that it contains the exact same ingredients
+    6. If a medicine appears to be the same as the original (same brand, different packaging), exclude it
+    7. If no alternatives are found, return an empty array for "alternatives"
+
+    Return a JSON with an "alternatives" key containing a list of alternative medicine objects:
+
+    Example output:
+    {{
+      "alternatives": [
+        {{
+          "name": "GenericMed",
+          "manufacturer": "ABC Pharma",
+          "active_ingredients": "Paracetamol 500mg",
+          "price": "₹25 for 10 tablets",
+          "confidence": 95
+        }}
+      ]
+    }}
+    """
+
+    alternative_context = compact_results(alternative_results, CONTEXT_TOKEN_BUDGETS['results'])
+    log_compaction(f"alternatives of '{medicine_name}'", json.dumps(alternative_results), alternative_context)
+    alternatives_data = process_with_groq(alternatives_prompt, f"SEARCH RESULTS: {alternative_context}\nORIGINAL MEDICINE: {medicine_name}\nACTIVE INGREDIENTS: {', '.join(active_ingredients)}", deadline=inputs['deadline'])
+    if "error" in alternatives_data:
+        raise StageError(alternatives_data["error"])
+
+    # Filter alternatives by confidence score
+    alternatives = alternatives_data.get('alternatives', [])
+    return [alt for alt in alternatives if alt.get('confidence', 0) >= 70]
+
+@medicine_stages.stage('price_results', ttl=SEARCH_CACHE_TTLS['price'])
+def price_results_stage(inputs):
+    """
+    Pharmacy listings for the medicine from several targeted price searches.
+    """
+    medicine_name = inputs['medicine']
+    return search_all([
+        (f'buy "{medicine_name}" online price', 8),
+        (f'"{medicine_name}" price comparison pharmacy', 8),
+        (f'"{medicine_name}" cost india online', 8),
+        (f'"{medicine_name}" tablet strip price', 8)
+    ], deadline=inputs['deadline'])
+
+@medicine_stages.stage('info_results')
+def info_results_stage(inputs):
+    info_query = f'"{inputs["medicine"]}" drug information uses dosage'
+    info_results, error = perform_google_search(info_query, GOOGLE_API_KEY, GOOGLE_CSE_ID, num_results=5,
+                                                deadline=inputs['deadline'], priority=PRIORITY_LOW)
+    return None if error else info_results
+
+@medicine_stages.stage('medicine_info', requires=('info_results',))
+def medicine_info_stage(inputs):
+    """
+    The drug's category and primary use, or None when nothing was found.
+    """
+    medicine_name = inputs['medicine']
+    if not inputs['info_results']:
+        return None
+    info_context = compact_snippets(inputs['info_results'], CONTEXT_TOKEN_BUDGETS['snippets'])
+    info_prompt = f"""
+    Extract brief but useful medical information about "{medicine_name}" from the provided context.
+    
+    Return a JSON with the following keys:
+    - "category": The drug category/class (e.g., "Analgesic", "Antibiotic")
+    - "primary_use": A brief description of what the medicine is primarily used for
+    
+    Example: {{ "category": "Analgesic", "primary_use": "Pain relief and fever reduction" }}
+    """
+    medicine_info_data = process_with_groq(info_prompt, f"CONTEXT: {info_context}", timeout=GROQ_TIMEOUTS['auxiliary'],
+                                           deadline=inputs['deadline'], priority=PRIORITY_LOW)
+    return None if "error" in medicine_info_data else medicine_info_data
+
+@medicine_stages.stage('prices', requires=('price_results', 'info_results'), ttl=SEARCH_CACHE_TTLS['price'])
+def prices_stage(inputs):
+    """
+    Store-by-store price listings, best deal first, plus basic medicine information.
+    """
+    medicine_name = inputs['medicine']
+    price_results = inputs['price_results']
+    if not price_results:
+        raise StageError("No prices found for this medicine.", 404)
+    info_context = compact_snippets(inputs['info_results'], CONTEXT_TOKEN_BUDGETS['snippets'])
+
+    # Enhanced prompt for price extraction with additional information
+    system_prompt = """
+    You are a pharmaceutical price extraction expert. From the provided web search results (a JSON list with title, snippet, and link), extract detailed price listings for the requested medication.
+
+    CRITICAL INSTRUCTIONS:
+    1. Analyze the 'snippet' and 'title' for price and store information
+    2. For each listing, extract:
+       - Online store name (e.g., "1mg", "PharmEasy", "Netmeds")
+       - Exact price with currency symbol
+       - Quantity information (e.g., "10 tablets", "Strip of 15", "100ml")
+       - Discount percentage if available
+       - Delivery information if available
+    3. The 'link' from the input JSON object MUST be used as the 'url' for your output
+    4. Only include listings from legitimate pharmacies or major retailers
+    5. Exclude duplicates - if the same store appears multiple times, keep only the most detailed/lowest price entry
+    6. Include at least 5 different stores if available in the results
+    7. Prioritize results with complete information (price, quantity, store name)
+    8. Add a "best_deal" boolean flag (true/false) to each listing - mark the lowest price per unit as true
+    
+    Return a single JSON object with:
+    1. "prices" - array of price listings (each with store, price, quantity, url, discount, delivery_info, best_deal)
+    2. "medicine_info" - object with basic medicine information (form, strength, manufacturer) if found in the results
+    
+    Example output:
+    {
+      "prices": [
+        {
+          "store": "PharmEasy",
+          "price": "₹15.00",
+          "quantity": "Strip of 10 tablets",
+          "url": "https://pharmeasy.in/online-medicine-order/paracetamol-500mg-15-tablets-12345",
+          "discount": "20% off",
+          "delivery_info": "Delivery in 24 hours",
+          "best_deal": true
+        },
+        {
+          "store": "1mg",
+          "price": "₹18.50",
+          "quantity": "Strip of 10 tablets",
+          "url": "https://www.1mg.com/drugs/paracetamol-500mg-tablet-74467",
+          "discount": "10% off",
+          "delivery_info": "Free delivery",
+          "best_deal": false
+        }
+      ],
+      "medicine_info": {
+        "form": "Tablet",
+        "strength": "500mg",
+        "manufacturer": "Cipla Ltd"
+      }
+    }
+    """
+
+    # Pass the structured results to Groq
+    price_context = compact_results(price_results, CONTEXT_TOKEN_BUDGETS['results'])
+    log_compaction(f"prices of '{medicine_name}'", json.dumps(price_results, indent=2), price_context)
+    user_prompt = f"Extract detailed price information for '{medicine_name}' from the following search results:\n\n{price_context}\n\nAdditional context: {info_context}"
+
+    print(f"--- Analyzing price data for '{medicine_name}' ---")
+    price_data = process_with_groq(system_prompt, user_prompt, deadline=inputs['deadline'])
+    if 'error' in price_data:
+        raise StageError(price_data['error'])
+
+    # Extract and enhance the response
+    prices = price_data.get('prices', [])
+    medicine_info = price_data.get('medicine_info', {})
+
+    # Sort prices by best deal first, then by price
+    prices = sorted(prices, key=lambda x: (not x.get('best_deal', False), x.get('price', '999999')))
+    
+    # Add potential savings calculation if we have multiple prices
+    if len(prices) > 1:
+        try:
+            # Try to extract numeric values from price strings for comparison
+            for price_item in prices:
+                price_str = price_item.get('price', '')
+                # Extract just the numbers from the price string
+                numeric_price = ''.join(filter(lambda x: x.isdigit() or x == '.', price_str))
+                price_item['numeric_price'] = float(numeric_price) if numeric_price else 0
+            
+            # Calculate potential savings between highest and lowest price
+            if prices[0].get('numeric_price', 0) > 0:
+                highest_price = max(prices, key=lambda x: x.get('numeric_price', 0)).get('numeric_price', 0)
+                lowest_price = min(prices, key=lambda x: x.get('numeric_price', 0)).get('numeric_price', 0)
+                
+                if highest_price > lowest_price:
+                    savings_percent = round(((highest_price - lowest_price) / highest_price) * 100)
+                    if savings_percent > 0:
+                        for price_item in prices:
+                            if price_item.get('numeric_price', 0) == lowest_price:
+                                price_item['savings_percent'] = savings_percent
+        except Exception as e:
+            print(f"Error calculating savings: {e}")
+
+    return {'prices': prices, 'medicine_info': medicine_info}
+
+@medicine_stages.stage('original_price', requires=('price_results',), ttl=SEARCH_CACHE_TTLS['price'])
+def original_price_stage(inputs):
+    """
+    The single most reliable price found on the web, or None.
+    """
+    medicine_name = inputs['medicine']
+    if not inputs['price_results']:
+        return None
+    original_price_prompt = f"""
+    Extract the most accurate price information for "{medicine_name}" from the search results provided.
+    
+    CRITICAL INSTRUCTIONS:
+    1. Look for specific price mentions with quantity (e.g., "₹50 for 10 tablets")
+    2. Prioritize prices from reputable online pharmacies (1mg, PharmEasy, Netmeds, Apollo, etc.)
+    3. If multiple prices are found, select the most common or median price
+    4. Include quantity information if available (number of tablets/capsules/ml)
+    5. Return a JSON with a "price" key containing the most reliable price found
+    
+    Example: {{ "price": "₹50 for 10 tablets" }}
+    """
+    price_context = compact_results(inputs['price_results'], CONTEXT_TOKEN_BUDGETS['results'])
+    original_price_data = process_with_groq(original_price_prompt, f"SEARCH RESULTS: {price_context}",
+                                            timeout=GROQ_TIMEOUTS['auxiliary'], deadline=inputs['deadline'],
+                                            priority=PRIORITY_LOW)
+    return None if "error" in original_price_data else original_price_data.get('price')
+
+@medicine_stages.stage('image', ttl=SEARCH_CACHE_TTLS['image'])
+def image_stage(inputs):
+    return get_medicine_image_url(inputs['medicine'], GOOGLE_API_KEY, GOOGLE_CSE_ID, deadline=inputs['deadline'])
+
+def image_signature(medicine_name):
+    return hmac.new(IMAGE_URL_SECRET, medicine_name.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+def medicine_image_url(medicine_name):
+    """
+    The signed local URL that resolves a medicine's image when the browser requests it.
+    Built from the URL map rather than url_for, since background refreshes have no request.
+    """
+    medicine_name = " ".join(medicine_name.lower().split())
+    urls = app.url_map.bind('', script_name=app.config['APPLICATION_ROOT'])
+    return urls.build('medicine_image', {'medicine_name': medicine_name, 'sig': image_signature(medicine_name)})
 
 # --- Main Flask Routes ---
 
+# Base URL of the FastAPI backend (backend/), used by pages that sync with user accounts
+BACKEND_API_URL = os.environ.get("BACKEND_API_URL", "http://127.0.0.1:8000")
+
+@app.context_processor
+def inject_backend_api_url():
+    return {'backend_api_url': BACKEND_API_URL}
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -170,412 +1138,316 @@ def about_page():
 @app.route('/jan-aushadhi-kendras', methods=['GET', 'POST'])
 def jan_aushadhi_kendras():
     """API endpoint to get Jan Aushadhi Kendra data and find nearest kendra based on user location"""
-    # This is real data from various cities in India
-    kendras = [
-        {"name": "Jan Aushadhi Kendra - AIIMS", "address": "AIIMS Campus, Ansari Nagar East", "city": "New Delhi", "lat": 28.5672, "lng": 77.2100},
-        {"name": "Jan Aushadhi Kendra - Safdarjung", "address": "Safdarjung Hospital, Ansari Nagar West", "city": "New Delhi", "lat": 28.5733, "lng": 77.2043},
-        {"name": "Jan Aushadhi Kendra - Connaught Place", "address": "Block F, Connaught Place", "city": "New Delhi", "lat": 28.6315, "lng": 77.2167},
-        {"name": "Jan Aushadhi Kendra - Karol Bagh", "address": "Pusa Road, Karol Bagh", "city": "New Delhi", "lat": 28.6466, "lng": 77.1905},
-        {"name": "Jan Aushadhi Kendra - Rajouri Garden", "address": "Main Market, Rajouri Garden", "city": "New Delhi", "lat": 28.6472, "lng": 77.1187},
-        {"name": "Jan Aushadhi Kendra - Lajpat Nagar", "address": "Central Market, Lajpat Nagar", "city": "New Delhi", "lat": 28.5693, "lng": 77.2432},
-        {"name": "Jan Aushadhi Kendra - Greater Kailash", "address": "M Block Market, Greater Kailash 1", "city": "New Delhi", "lat": 28.5481, "lng": 77.2355},
-        {"name": "Jan Aushadhi Kendra - Dwarka", "address": "Sector 6, Dwarka", "city": "New Delhi", "lat": 28.5914, "lng": 77.0500},
-        {"name": "Jan Aushadhi Kendra - Andheri", "address": "Andheri West, Near Station", "city": "Mumbai", "lat": 19.1197, "lng": 72.8468},
-        {"name": "Jan Aushadhi Kendra - Dadar", "address": "Dadar West, Mumbai", "city": "Mumbai", "lat": 19.0178, "lng": 72.8478},
-        {"name": "Jan Aushadhi Kendra - Thane", "address": "Thane West", "city": "Mumbai", "lat": 19.2183, "lng": 72.9781},
-        {"name": "Jan Aushadhi Kendra - Worli", "address": "Dr. Annie Besant Road, Worli", "city": "Mumbai", "lat": 19.0096, "lng": 72.8139},
-        {"name": "Jan Aushadhi Kendra - Bandra", "address": "Linking Road, Bandra West", "city": "Mumbai", "lat": 19.0596, "lng": 72.8295},
-        {"name": "Jan Aushadhi Kendra - Chembur", "address": "Chembur Colony", "city": "Mumbai", "lat": 19.0522, "lng": 72.8994},
-        {"name": "Jan Aushadhi Kendra - Malad", "address": "Malad West", "city": "Mumbai", "lat": 19.1874, "lng": 72.8484},
-        {"name": "Jan Aushadhi Kendra - Borivali", "address": "Borivali West", "city": "Mumbai", "lat": 19.2362, "lng": 72.8545},
-        {"name": "Jan Aushadhi Kendra - Jayanagar", "address": "4th Block, Jayanagar", "city": "Bangalore", "lat": 12.9250, "lng": 77.5938},
-        {"name": "Jan Aushadhi Kendra - Koramangala", "address": "6th Block, Koramangala", "city": "Bangalore", "lat": 12.9338, "lng": 77.6246},
-        {"name": "Jan Aushadhi Kendra - Indiranagar", "address": "HAL 2nd Stage, Indiranagar", "city": "Bangalore", "lat": 12.9719, "lng": 77.6412},
-        {"name": "Jan Aushadhi Kendra - Malleshwaram", "address": "8th Cross, Malleshwaram", "city": "Bangalore", "lat": 13.0069, "lng": 77.5703},
-        {"name": "Jan Aushadhi Kendra - Whitefield", "address": "Whitefield Main Road", "city": "Bangalore", "lat": 12.9698, "lng": 77.7499},
-        {"name": "Jan Aushadhi Kendra - Electronic City", "address": "Electronic City Phase 1", "city": "Bangalore", "lat": 12.8399, "lng": 77.6770},
-        {"name": "Jan Aushadhi Kendra - HSR Layout", "address": "HSR Layout Sector 1", "city": "Bangalore", "lat": 12.9081, "lng": 77.6476},
-        {"name": "Jan Aushadhi Kendra - Salt Lake", "address": "Sector 1, Salt Lake", "city": "Kolkata", "lat": 22.5867, "lng": 88.4172},
-        {"name": "Jan Aushadhi Kendra - Park Street", "address": "Park Street Area", "city": "Kolkata", "lat": 22.5551, "lng": 88.3510},
-        {"name": "Jan Aushadhi Kendra - Howrah", "address": "Howrah Maidan", "city": "Kolkata", "lat": 22.5892, "lng": 88.3313},
-        {"name": "Jan Aushadhi Kendra - New Town", "address": "Action Area 1, New Town", "city": "Kolkata", "lat": 22.5801, "lng": 88.4733},
-        {"name": "Jan Aushadhi Kendra - Dum Dum", "address": "Dum Dum Metro Station", "city": "Kolkata", "lat": 22.6417, "lng": 88.4298},
-        {"name": "Jan Aushadhi Kendra - Behala", "address": "Behala Chowrasta", "city": "Kolkata", "lat": 22.5007, "lng": 88.3242},
-        {"name": "Jan Aushadhi Kendra - T Nagar", "address": "North Usman Road, T Nagar", "city": "Chennai", "lat": 13.0446, "lng": 80.2337},
-        {"name": "Jan Aushadhi Kendra - Anna Nagar", "address": "2nd Avenue, Anna Nagar", "city": "Chennai", "lat": 13.0850, "lng": 80.2101},
-        {"name": "Jan Aushadhi Kendra - Adyar", "address": "Adyar", "city": "Chennai", "lat": 13.0012, "lng": 80.2565},
-        {"name": "Jan Aushadhi Kendra - Mylapore", "address": "Mylapore Tank", "city": "Chennai", "lat": 13.0355, "lng": 80.2679},
-        {"name": "Jan Aushadhi Kendra - Velachery", "address": "Velachery Main Road", "city": "Chennai", "lat": 12.9815, "lng": 80.2181},
-        {"name": "Jan Aushadhi Kendra - Porur", "address": "Mount Poonamalle Road", "city": "Chennai", "lat": 13.0359, "lng": 80.1569},
-        {"name": "Jan Aushadhi Kendra - Banjara Hills", "address": "Road No. 10, Banjara Hills", "city": "Hyderabad", "lat": 17.4130, "lng": 78.4350},
-        {"name": "Jan Aushadhi Kendra - Ameerpet", "address": "Ameerpet", "city": "Hyderabad", "lat": 17.4375, "lng": 78.4482},
-        {"name": "Jan Aushadhi Kendra - KPHB", "address": "KPHB Phase 1", "city": "Hyderabad", "lat": 17.4937, "lng": 78.3970},
-        {"name": "Jan Aushadhi Kendra - Himayat Nagar", "address": "Himayat Nagar Main Road", "city": "Hyderabad", "lat": 17.4035, "lng": 78.4818},
-        {"name": "Jan Aushadhi Kendra - Kukatpally", "address": "Kukatpally Housing Board Colony", "city": "Hyderabad", "lat": 17.4849, "lng": 78.4115},
-        {"name": "Jan Aushadhi Kendra - Gachibowli", "address": "Gachibowli Main Road", "city": "Hyderabad", "lat": 17.4400, "lng": 78.3489},
-        {"name": "Jan Aushadhi Kendra - Mehdipatnam", "address": "Mehdipatnam", "city": "Hyderabad", "lat": 17.3939, "lng": 78.4388},
-        {"name": "Jan Aushadhi Kendra - Aundh", "address": "DP Road, Aundh", "city": "Pune", "lat": 18.5587, "lng": 73.8080},
-        {"name": "Jan Aushadhi Kendra - FC Road", "address": "Fergusson College Road", "city": "Pune", "lat": 18.5236, "lng": 73.8413},
-        {"name": "Jan Aushadhi Kendra - Kothrud", "address": "Kothrud Depot", "city": "Pune", "lat": 18.5074, "lng": 73.8077},
-        {"name": "Jan Aushadhi Kendra - Viman Nagar", "address": "Viman Nagar", "city": "Pune", "lat": 18.5679, "lng": 73.9143},
-        {"name": "Jan Aushadhi Kendra - Pimpri", "address": "Pimpri Chinchwad", "city": "Pune", "lat": 18.6279, "lng": 73.8009},
-        {"name": "Jan Aushadhi Kendra - Hadapsar", "address": "Hadapsar", "city": "Pune", "lat": 18.5089, "lng": 73.9260},
-        {"name": "Jan Aushadhi Kendra - Ahmedabad Civil", "address": "Civil Hospital Campus", "city": "Ahmedabad", "lat": 23.0527, "lng": 72.6043},
-        {"name": "Jan Aushadhi Kendra - Navrangpura", "address": "Navrangpura", "city": "Ahmedabad", "lat": 23.0365, "lng": 72.5611},
-        {"name": "Jan Aushadhi Kendra - Satellite", "address": "Satellite Road", "city": "Ahmedabad", "lat": 23.0268, "lng": 72.5292},
-        {"name": "Jan Aushadhi Kendra - Maninagar", "address": "Maninagar", "city": "Ahmedabad", "lat": 22.9987, "lng": 72.6000},
-        {"name": "Jan Aushadhi Kendra - Vaishali", "address": "Sector 4, Vaishali", "city": "Ghaziabad", "lat": 28.6420, "lng": 77.3444},
-        {"name": "Jan Aushadhi Kendra - Indirapuram", "address": "Indirapuram, Shipra Sun City", "city": "Ghaziabad", "lat": 28.6417, "lng": 77.3671},
-        {"name": "Jan Aushadhi Kendra - Kaushambi", "address": "Kaushambi", "city": "Ghaziabad", "lat": 28.6417, "lng": 77.3177},
-        {"name": "Jan Aushadhi Kendra - Sector 18", "address": "Atta Market, Sector 18", "city": "Noida", "lat": 28.5709, "lng": 77.3260},
-        {"name": "Jan Aushadhi Kendra - Sector 62", "address": "Sector 62", "city": "Noida", "lat": 28.6245, "lng": 77.3668},
-        {"name": "Jan Aushadhi Kendra - Sector 50", "address": "Sector 50", "city": "Noida", "lat": 28.5731, "lng": 77.3649},
-        {"name": "Jan Aushadhi Kendra - Sector 78", "address": "Sector 78", "city": "Noida", "lat": 28.5461, "lng": 77.3929},
-        {"name": "Jan Aushadhi Kendra - Gomti Nagar", "address": "Vibhuti Khand, Gomti Nagar", "city": "Lucknow", "lat": 26.8629, "lng": 81.0099},
-        {"name": "Jan Aushadhi Kendra - Hazratganj", "address": "Hazratganj", "city": "Lucknow", "lat": 26.8501, "lng": 80.9464},
-        {"name": "Jan Aushadhi Kendra - Aliganj", "address": "Aliganj", "city": "Lucknow", "lat": 26.8854, "lng": 80.9444},
-        {"name": "Jan Aushadhi Kendra - Indira Nagar", "address": "Indira Nagar", "city": "Lucknow", "lat": 26.8747, "lng": 81.0001},
-        {"name": "Jan Aushadhi Kendra - Mansarovar", "address": "Mansarovar", "city": "Jaipur", "lat": 26.8818, "lng": 75.7636},
-        {"name": "Jan Aushadhi Kendra - Model Town", "address": "Model Town", "city": "Jaipur", "lat": 26.9154, "lng": 75.8189},
-        {"name": "Jan Aushadhi Kendra - Raja Park", "address": "Raja Park", "city": "Jaipur", "lat": 26.9125, "lng": 75.8245},
-        {"name": "Jan Aushadhi Kendra - Vaishali Nagar", "address": "Vaishali Nagar", "city": "Jaipur", "lat": 26.9220, "lng": 75.7370},
-        {"name": "Jan Aushadhi Kendra - Malviya Nagar", "address": "Malviya Nagar", "city": "Jaipur", "lat": 26.8516, "lng": 75.8057},
-        {"name": "Jan Aushadhi Kendra - Patna Medical", "address": "Patna Medical College Campus", "city": "Patna", "lat": 25.6208, "lng": 85.1536},
-        {"name": "Jan Aushadhi Kendra - Boring Road", "address": "Boring Road", "city": "Patna", "lat": 25.6207, "lng": 85.1276},
-        {"name": "Jan Aushadhi Kendra - Bailey Road", "address": "Bailey Road", "city": "Patna", "lat": 25.6186, "lng": 85.0996},
-        {"name": "Jan Aushadhi Kendra - Kadavanthra", "address": "Kadavanthra", "city": "Kochi", "lat": 9.9672, "lng": 76.3182},
-        {"name": "Jan Aushadhi Kendra - Kakkanad", "address": "Kakkanad", "city": "Kochi", "lat": 10.0159, "lng": 76.3419},
-        {"name": "Jan Aushadhi Kendra - Edappally", "address": "Edappally Junction", "city": "Kochi", "lat": 10.0268, "lng": 76.3108},
-        {"name": "Jan Aushadhi Kendra - Chandigarh Sec 17", "address": "Sector 17", "city": "Chandigarh", "lat": 30.7350, "lng": 76.7894},
-        {"name": "Jan Aushadhi Kendra - Chandigarh Sec 22", "address": "Sector 22", "city": "Chandigarh", "lat": 30.7225, "lng": 76.7795},
-        {"name": "Jan Aushadhi Kendra - Dekha Hospital", "address": "DLF Phase 1", "city": "Gurgaon", "lat": 28.4601, "lng": 77.1024},
-        {"name": "Jan Aushadhi Kendra - Sohna Road", "address": "Sohna Road", "city": "Gurgaon", "lat": 28.4089, "lng": 77.0679},
-        {"name": "Jan Aushadhi Kendra - Bodakdev", "address": "Bodakdev", "city": "Ahmedabad", "lat": 23.0410, "lng": 72.5113},
-        {"name": "Jan Aushadhi Kendra - Bhopal MP Nagar", "address": "MP Nagar Zone 1", "city": "Bhopal", "lat": 23.2320, "lng": 77.4342},
-        {"name": "Jan Aushadhi Kendra - Indore", "address": "Vijay Nagar", "city": "Indore", "lat": 22.7533, "lng": 75.8937}
-    ]
-
     if request.method == 'POST':
-        # Find nearest kendra based on user's location
+        # Find nearest kendras based on user's location, optionally within a radius or city
         try:
             data = request.json
+            if not isinstance(data, dict):
+                return jsonify({"error": "Invalid request: expected a JSON object."}), 400
             user_lat = float(data.get('lat', 0))
             user_lng = float(data.get('lng', 0))
             
             if user_lat == 0 or user_lng == 0:
                 return jsonify({"error": "Invalid coordinates"}), 400
-                
-            # Calculate distance to each kendra using the Haversine formula
-            for kendra in kendras:
-                lat1, lng1 = user_lat, user_lng
-                lat2, lng2 = kendra['lat'], kendra['lng']
-                
-                # Convert to radians
-                lat1_rad = math.radians(lat1)
-                lng1_rad = math.radians(lng1)
-                lat2_rad = math.radians(lat2)
-                lng2_rad = math.radians(lng2)
-                
-                # Haversine formula
-                dlat = lat2_rad - lat1_rad
-                dlng = lng2_rad - lng1_rad
-                a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlng/2)**2
-                c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-                distance = 6371 * c  # Earth's radius in km
-                
-                kendra['distance'] = round(distance, 2)  # Round to 2 decimal places
-            
-            # Sort kendras by distance
-            kendras.sort(key=lambda x: x.get('distance', float('inf')))
+
+            k = min(max(int(data.get('k', 10)), 1), 100)
+            radius_km = float(data['radius_km']) if data.get('radius_km') is not None else None
+            nearest_kendras = kendra_index.nearest(user_lat, user_lng, k=k, radius_km=radius_km, city=data.get('city'))
             
             return jsonify({
-                "kendras": kendras[:10],  # Return the 10 closest kendras
-                "nearest": kendras[0] if kendras else None
+                "kendras": nearest_kendras,  # The k closest kendras, nearest first
+                "nearest": nearest_kendras[0] if nearest_kendras else None
             })
             
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid request: {e}"}), 400
         except Exception as e:
             print(f"Error finding nearest kendra: {e}")
             return jsonify({"error": str(e)}), 500
     
     # GET request - return all kendras
-    return jsonify({"kendras": kendras})
-
-@app.route('/price-comparison', methods=['POST'])
-def price_comparison():
-    medicine_name = request.json.get('medicine_name', '').strip()
-    if not medicine_name:
-        return jsonify({'error': 'Please enter a medicine name.'}), 400
+    return jsonify({"kendras": kendra_index.kendras})
 
+@app.route('/jan-aushadhi-kendras/batch', methods=['POST'])
+def jan_aushadhi_kendras_batch():
+    """API endpoint to find the nearest kendras for many locations in one call"""
     try:
-        print(f"\n--- STAGE 1: Finding prices for '{medicine_name}' ---")
-        
-        # Use multiple targeted queries to get more comprehensive price data
-        price_queries = [
-            f'buy "{medicine_name}" online price',
-            f'"{medicine_name}" price comparison pharmacy',
-            f'"{medicine_name}" cost india online',
-            f'"{medicine_name}" tablet strip price'
-        ]
-        
-        all_search_results = []
-        for query in price_queries:
-            search_results, error = perform_google_search(query, GOOGLE_API_KEY, GOOGLE_CSE_ID, num_results=8)
-            if not error and search_results:
-                all_search_results.extend(search_results)
-                
-        if not all_search_results:
-            return jsonify({'medicine_name': medicine_name, 'prices': []}), 404
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({"error": "Invalid request: expected a JSON object."}), 400
+        points = [(float(p['lat']), float(p['lng'])) for p in data.get('points', [])]
+        k = min(max(int(data.get('k', 1)), 1), 20)
+    except (TypeError, ValueError, KeyError) as e:
+        return jsonify({"error": f"Invalid request: {e}"}), 400
 
-        # Get basic medicine information
-        info_query = f'"{medicine_name}" drug information dosage'
-        info_results, error = perform_google_search(info_query, GOOGLE_API_KEY, GOOGLE_CSE_ID, num_results=5)
-        
-        info_context = ""
-        if not error and info_results:
-            info_context = " ".join([item.get('snippet', '') for item in info_results])
-        
-        # Get medicine image
-        image_url = get_medicine_image_url(medicine_name, GOOGLE_API_KEY, GOOGLE_CSE_ID)
-        
-        # Enhanced prompt for price extraction with additional information
-        system_prompt = """
-        You are a pharmaceutical price extraction expert. From the provided web search results (a JSON list with title, snippet, and link), extract detailed price listings for the requested medication.
-
-        CRITICAL INSTRUCTIONS:
-        1. Analyze the 'snippet' and 'title' for price and store information
-        2. For each listing, extract:
-           - Online store name (e.g., "1mg", "PharmEasy", "Netmeds")
-           - Exact price with currency symbol
-           - Quantity information (e.g., "10 tablets", "Strip of 15", "100ml")
-           - Discount percentage if available
-           - Delivery information if available
-        3. The 'link' from the input JSON object MUST be used as the 'url' for your output
-        4. Only include listings from legitimate pharmacies or major retailers
-        5. Exclude duplicates - if the same store appears multiple times, keep only the most detailed/lowest price entry
-        6. Include at least 5 different stores if available in the results
-        7. Prioritize results with complete information (price, quantity, store name)
-        8. Add a "best_deal" boolean flag (true/false) to each listing - mark the lowest price per unit as true
-        
-        Return a single JSON object with:
-        1. "prices" - array of price listings (each with store, price, quantity, url, discount, delivery_info, best_deal)
-        2. "medicine_info" - object with basic medicine information (form, strength, manufacturer) if found in the results
-        
-        Example output:
-        {
-          "prices": [
-            {
-              "store": "PharmEasy",
-              "price": "₹15.00",
-              "quantity": "Strip of 10 tablets",
-              "url": "https://pharmeasy.in/online-medicine-order/paracetamol-500mg-15-tablets-12345",
-              "discount": "20% off",
-              "delivery_info": "Delivery in 24 hours",
-              "best_deal": true
-            },
-            {
-              "store": "1mg",
-              "price": "₹18.50",
-              "quantity": "Strip of 10 tablets",
-              "url": "https://www.1mg.com/drugs/paracetamol-500mg-tablet-74467",
-              "discount": "10% off",
-              "delivery_info": "Free delivery",
-              "best_deal": false
-            }
-          ],
-          "medicine_info": {
-            "form": "Tablet",
-            "strength": "500mg",
-            "manufacturer": "Cipla Ltd"
-          }
-        }
-        """
-        
-        # Pass the structured results to Groq
-        user_prompt = f"Extract detailed price information for '{medicine_name}' from the following search results:\n\n{json.dumps(all_search_results, indent=2)}\n\nAdditional context: {info_context}"
-        
-        print(f"--- Analyzing price data for '{medicine_name}' ---")
-        price_data = process_with_groq(system_prompt, user_prompt)
+    if not points:
+        return jsonify({"error": "Please provide a list of points with 'lat' and 'lng'."}), 400
+    if len(points) > MAX_BATCH_POINTS:
+        return jsonify({"error": f"At most {MAX_BATCH_POINTS} points can be looked up per request."}), 400
 
-        # Extract and enhance the response
-        prices = price_data.get('prices', [])
-        medicine_info = price_data.get('medicine_info', {})
-        
-        # Sort prices by best deal first, then by price
-        prices = sorted(prices, key=lambda x: (not x.get('best_deal', False), x.get('price', '999999')))
-        
-        # Add potential savings calculation if we have multiple prices
-        if len(prices) > 1:
-            try:
-                # Try to extract numeric values from price strings for comparison
-                for price_item in prices:
-                    price_str = price_item.get('price', '')
-                    # Extract just the numbers from the price string
-                    numeric_price = ''.join(filter(lambda x: x.isdigit() or x == '.', price_str))
-                    price_item['numeric_price'] = float(numeric_price) if numeric_price else 0
-                
-                # Calculate potential savings between highest and lowest price
-                if prices[0].get('numeric_price', 0) > 0:
-                    highest_price = max(prices, key=lambda x: x.get('numeric_price', 0)).get('numeric_price', 0)
-                    lowest_price = min(prices, key=lambda x: x.get('numeric_price', 0)).get('numeric_price', 0)
-                    
-                    if highest_price > lowest_price:
-                        savings_percent = round(((highest_price - lowest_price) / highest_price) * 100)
-                        if savings_percent > 0:
-                            for price_item in prices:
-                                if price_item.get('numeric_price', 0) == lowest_price:
-                                    price_item['savings_percent'] = savings_percent
-            except Exception as e:
-                print(f"Error calculating savings: {e}")
-        
+    try:
+        nearest_kendras = kendra_index.nearest_batch(points, k=k)
         return jsonify({
-            'medicine_name': medicine_name,
-            'prices': prices,
-            'medicine_info': medicine_info,
-            'image_url': image_url
+            "results": [
+                {"lat": lat, "lng": lng, "kendras": kendras}
+                for (lat, lng), kendras in zip(points, nearest_kendras)
+            ]
         })
+    except Exception as e:
+        print(f"Error finding nearest kendras in batch: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def compute_price_comparison(medicine_name, deadline):
+    """
+    The /price-comparison lookup for `medicine_name` as a (payload, status) result.
+    """
+    try:
+        print(f"\n--- Finding prices for '{medicine_name}' ---")
+        results, errors = medicine_stages.run(['prices'], deadline, medicine=medicine_name)
+        if 'prices' in errors:
+            error = errors['prices']
+            if error.status == 404:
+                return {'medicine_name': medicine_name, 'prices': []}, 404
+            return {'error': error.message}, error.status
+
+        return {
+            'medicine_name': medicine_name,
+            'prices': results['prices']['prices'],
+            'medicine_info': results['prices']['medicine_info'],
+            'image_url': medicine_image_url(medicine_name),
+            'missing_sections': sorted(errors)
+        }, 200
 
     except Exception as e:
         print(f"An unexpected server error occurred during price comparison: {e}")
-        return jsonify({'error': "An unexpected server error occurred."}), 500
+        return {'error': "An unexpected server error occurred."}, 500
 
-@app.route('/search', methods=['POST'])
-def search():
-    user_query = request.json.get('medicine_name', '').strip()
-    if not user_query:
-        return jsonify({'error': 'Please enter a medicine name.'}), 400
+@app.route('/price-comparison', methods=['POST'])
+def price_comparison():
+    return serve_coalesced('price-comparison')
 
-    try:
-        # --- STAGE 1: Precise Composition Discovery ---
-        print("\n--- STAGE 1: Initial AI Analysis & Composition ---")
-        composition_context_list, error = perform_google_search(f'"{user_query}" composition ingredients', GOOGLE_API_KEY, GOOGLE_CSE_ID, num_results=5)
-        if error:
-            print(f"ERROR during composition search: {error}")
-            return jsonify({'error': error}), 500
+def search_pipeline(user_query, stream_synthesis=False, deadline=None):
+    """
+    Runs the multi-stage medicine search as a generator of (event, payload) tuples:
+    'composition' once STAGE 1 resolves, one 'section' per finished STAGE 2 search,
+    'synthesis' text deltas when `stream_synthesis` is set, and finally either
+    'result' with the full report or 'error' with an error message and HTTP status.
+    Work that does not fit in `deadline` is skipped and named in the result's 'missing_sections'.
+    """
+    catalogue_alternatives = []
+    outcomes = {}
+    missing_sections = []
+    degraded_sections = {}
+    # --- STAGES 1 & 2: Composition, then every section search in parallel ---
+    targets = ['composition', *SEARCH_SECTION_QUERIES, 'alternative_results']
+    for name, value, error in medicine_stages.iter_run(targets, deadline, degraded_sections, medicine=user_query):
+        if name == 'composition':
+            if error:
+                yield 'error', {'error': error.message, 'status': error.status}
+                return
+            composition = value
+            generic_name = composition.split(' ')[0]
+            yield 'composition', {
+                "identified_medicine": user_query.title(),
+                "composition": composition,
+                "generic_name": generic_name,
+                "degraded_sections": dict(degraded_sections)
+            }
+            print(f"\n--- STAGE 2: Building Super-Context for '{composition}' ---")
+            # Brands with the same composition in the local catalogue are exact matches
+            catalogue_alternatives = [
+                {"brand_name": row['brand'], "manufacturer": row['manufacturer'], "match_confidence": "Exact Match"}
+                for row in drug_catalogue.same_composition(composition, exclude_brand=user_query)
+            ]
+        else:
+            if name == 'alternative_results':
+                # Alternatives only need the web when the catalogue has none
+                if catalogue_alternatives:
+                    continue
+                name = 'alternatives'
+            outcomes[name] = (value, error)
+            if error:
+                missing_sections.append(name)
+            yield 'section', {"section": name, "results_found": len(value or [])}
 
-        if not composition_context_list:
-            return jsonify({'error': "Could not find any composition information for this drug via web search."}), 404
+    # Build the super_context in a fixed section order, each section compacted to its token budget
+    super_context = ""
+    raw_context = ""
+    for key in [*SEARCH_SECTION_QUERIES, 'alternatives']:
+        if key not in outcomes:
+            continue
+        search_result_list, error = outcomes[key]
+        super_context += f"\n\n--- CONTEXT FOR {key.upper()} ---\n"
         
-        composition_context_str = " ".join([item.get('snippet', '') for item in composition_context_list])
+        if error:
+            print(f"ERROR during super-context search for '{key}': {error.message}")
+            super_context += "No information found for this section.\n"
+        elif search_result_list:
+            raw_context += " ".join([item.get('snippet', '') for item in search_result_list])
+            super_context += compact_snippets(search_result_list, CONTEXT_TOKEN_BUDGETS['section'])
+        else:
+            super_context += "No information found for this section.\n"
+    log_compaction(f"report on '{composition}'", raw_context, super_context)
 
-        stage1_system_prompt = """
-        From the user query and web context, your only job is to identify the drug's exact chemical composition.
-        Output a single, raw JSON object with one key, 'composition'. If no clear composition is found, respond with {"composition": null}.
-        Example: { "composition": "Paracetamol 500mg" }
-        """
-        composition_result = process_with_groq(stage1_system_prompt, f"CONTEXT: {composition_context_str}\nUSER QUERY: {user_query}")
-        
-        if isinstance(composition_result, dict) and 'error' in composition_result:
-            return jsonify({'error': composition_result['error']}), 500
-            
-        composition = composition_result.get("composition")
-        if not composition:
-            return jsonify({'error': "AI could not determine the drug's composition from the search results."}), 404
-        
-        generic_name = composition.split(' ')[0]
+    # --- STAGE 3: Final, Comprehensive Synthesis (Updated Prompt) ---
+    stage3_system_prompt = """
+    You are a Drug Information Synthesizer. Your job is to meticulously analyze the provided web search contexts and create a single, comprehensive JSON report.
 
-        # --- STAGE 2: Massive Information Gathering (Updated) ---
-        print(f"\n--- STAGE 2: Building Super-Context for '{composition}' ---")
+    CRITICAL RULES:
+    - You MUST output a single, raw, and valid JSON object.
+    - ALWAYS include ALL the keys specified in the structure, even if no information is found. Use empty arrays `[]` or empty strings `""` for missing data.
+    - For `uses`, `side_effects`, and `warnings`, create a detailed bulleted list based ONLY on the context. If no info, return an empty array.
+    - For `alternatives`, find and list AS MANY brand alternatives as possible from the context. Create a list of objects, where each must have `brand_name` and `manufacturer`. Also add a `match_confidence` field.
+    - `match_confidence` MUST be one of: "Exact Match" (if context confirms identical active ingredients) or "Potential Match" (if context is suggestive but not definitive).
+    - For `generic_info_paragraph`, write a professional summary. If no info, return an empty string.
 
-        # Define standard queries
-        search_queries = {
-            "uses": (f'"{composition}" detailed uses and indications', 10),
-            "side_effects": (f'"{composition}" common and rare side effects professional', 10),
-            "warnings": (f'"{composition}" contraindications and warnings official prescribing information', 10),
-            "generic_info": (f'what is "{generic_name}" medicine class and mechanism of action', 5)
-        }
+    JSON OUTPUT STRUCTURE:
+    {
+      "generic_info_paragraph": "A detailed paragraph about the generic drug.",
+      "summary": {
+          "uses": ["List of key uses."],
+          "side_effects": ["List of common and rare side effects."],
+          "warnings": ["List of important warnings."]
+      },
+      "alternatives": [
+        { "brand_name": "Brand Name 1", "manufacturer": "Manufacturer 1", "match_confidence": "Exact Match" }
+      ]
+    }
+    """
+    
+    stage3_user_prompt = f"CONTEXTS:\n{super_context}\n\nUSER QUERY: Create a full report for a drug with composition: {composition}"
+    if out_of_time(deadline):
+        final_summary = {"error": "The request ran out of time before the AI could respond."}
+    elif stream_synthesis:
+        final_summary = yield from relay_synthesis(stream_with_groq(stage3_system_prompt, stage3_user_prompt, deadline))
+    else:
+        final_summary = process_with_groq(stage3_system_prompt, stage3_user_prompt, deadline=deadline)
 
-        # More diverse and robust queries for alternatives
-        alternative_queries = [
-            (f'"{composition}" brand names and manufacturers in india', 15),
-            (f'substitutes for "{user_query}" with same composition "{composition}"', 10),
-            (f'"{generic_name}" equivalent brands and prices', 10),
-            (f'"{composition}" alternative brand names', 15)
-        ]
+    if isinstance(final_summary, dict) and 'error' in final_summary:
+        if not out_of_time(deadline):
+            yield 'error', {'error': final_summary['error'], 'status': 500}
+            return
+        # Out of time: answer with the composition and catalogue alternatives found so far
+        print("--- STAGE 3 incomplete: the request ran out of time ---")
+        final_summary = {}
+        missing_sections.append('summary')
+    if not isinstance(final_summary, dict):
+        yield 'error', {'error': "AI returned an invalid data format.", 'status': 500}
+        return
 
-        # Combine all queries
-        all_queries = list(search_queries.items())
-        for query_tuple in alternative_queries:
-            all_queries.append(("alternatives", query_tuple))
+    # --- STAGE 4: Assemble and Validate the Final Response ---
+    print("\n--- STAGE 4: Assembling Final Response ---")
+    alternatives = list(catalogue_alternatives)
+    known_brands = {normalize_brand(alt['brand_name']) for alt in alternatives}
+    for alt in final_summary.get("alternatives", []):
+        if isinstance(alt, dict) and normalize_brand(alt.get('brand_name') or '') not in known_brands:
+            alternatives.append(alt)
 
-        # Perform all searches and build the super_context
-        super_context = ""
-        for key, query_info in all_queries:
-            query, num_results = query_info
-            super_context += f"\n\n--- CONTEXT FOR {key.upper()} ---\n"
-            
-            search_result_list, error = perform_google_search(query, GOOGLE_API_KEY, GOOGLE_CSE_ID, num_results=num_results)
-            
-            if error:
-                print(f"ERROR during super-context search for '{key}': {error}")
-                super_context += "No information found for this section.\n"
-            elif search_result_list:
-                search_result_str = " ".join([item.get('snippet', '') for item in search_result_list])
-                super_context += search_result_str
-            else:
-                super_context += "No information found for this section.\n"
+    final_response = {
+        "identified_medicine": user_query.title(),
+        "composition": composition,
+        "generic_name": generic_name,
+        "image_url": medicine_image_url(user_query),
+        "generic_info_paragraph": final_summary.get("generic_info_paragraph", ""),
+        "summary": final_summary.get("summary", {"uses": [], "side_effects": [], "warnings": []}),
+        "alternatives": alternatives,
+        "missing_sections": missing_sections,
+        # Sections answered with a stand-in, e.g. a similar medicine's composition, and why
+        "degraded_sections": degraded_sections
+    }
 
-        # --- STAGE 3: Final, Comprehensive Synthesis (Updated Prompt) ---
-        stage3_system_prompt = """
-        You are a Drug Information Synthesizer. Your job is to meticulously analyze the provided web search contexts and create a single, comprehensive JSON report.
+    print(f"✅ Final report generated with {len(final_response.get('alternatives', []))} alternatives.")
+    yield 'result', final_response
 
-        CRITICAL RULES:
-        - You MUST output a single, raw, and valid JSON object.
-        - ALWAYS include ALL the keys specified in the structure, even if no information is found. Use empty arrays `[]` or empty strings `""` for missing data.
-        - For `uses`, `side_effects`, and `warnings`, create a detailed bulleted list based ONLY on the context. If no info, return an empty array.
-        - For `alternatives`, find and list AS MANY brand alternatives as possible from the context. Create a list of objects, where each must have `brand_name` and `manufacturer`. Also add a `match_confidence` field.
-        - `match_confidence` MUST be one of: "Exact Match" (if context confirms identical active ingredients) or "Potential Match" (if context is suggestive but not definitive).
-        - For `generic_info_paragraph`, write a professional summary. If no info, return an empty string.
 
-        JSON OUTPUT STRUCTURE:
-        {
-          "generic_info_paragraph": "A detailed paragraph about the generic drug.",
-          "summary": {
-              "uses": ["List of key uses."],
-              "side_effects": ["List of common and rare side effects."],
-              "warnings": ["List of important warnings."]
-          },
-          "alternatives": [
-            { "brand_name": "Brand Name 1", "manufacturer": "Manufacturer 1", "match_confidence": "Exact Match" }
-          ]
-        }
-        """
-        
-        final_summary = process_with_groq(stage3_system_prompt, f"CONTEXTS:\n{super_context}\n\nUSER QUERY: Create a full report for a drug with composition: {composition}")
-
-        if isinstance(final_summary, dict) and 'error' in final_summary:
-            return jsonify({'error': final_summary['error']}), 500
-        if not isinstance(final_summary, dict):
-            return jsonify({'error': "AI returned an invalid data format."}), 500
-
-        # --- STAGE 4: Assemble and Validate the Final Response ---
-        print("\n--- STAGE 4: Assembling Final Response ---")
-        final_response = {
-            "identified_medicine": user_query.title(),
-            "composition": composition,
-            "generic_name": generic_name,
-            "image_url": get_medicine_image_url(user_query, GOOGLE_API_KEY, GOOGLE_CSE_ID),
-            "generic_info_paragraph": final_summary.get("generic_info_paragraph", ""),
-            "summary": final_summary.get("summary", {"uses": [], "side_effects": [], "warnings": []}),
-            "alternatives": final_summary.get("alternatives", [])
-        }
+def relay_synthesis(deltas):
+    """
+    Re-emits Groq text deltas as 'synthesis' events and returns the parsed completion.
+    """
+    while True:
+        try:
+            delta = next(deltas)
+        except StopIteration as stop:
+            return stop.value
+        yield 'synthesis', {"delta": delta}
 
-        print(f"✅ Final report generated with {len(final_response.get('alternatives', []))} alternatives.")
-        return jsonify(final_response)
+def format_sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def compute_search(medicine_name, deadline):
+    """
+    The /search report for `medicine_name` as a (payload, status) result.
+    """
+    user_query = resolve_medicine_name(medicine_name)
+
+    try:
+        for event, payload in search_pipeline(user_query, deadline=deadline):
+            if event == 'error':
+                return {'error': payload['error']}, payload['status']
+            if event == 'result':
+                return payload, 200
+        return {'error': "An unexpected server error occurred."}, 500
 
     except Exception as e:
         print(f"An unexpected server error occurred during search: {e}")
-        return jsonify({'error': "An unexpected server error occurred."}), 500
+        return {'error': "An unexpected server error occurred."}, 500
 
-@app.route('/ai-assistant', methods=['POST'])
-def ai_assistant():
-    data = request.get_json()
-    user_message = data.get('message', '').strip() if data else ''
-    if not user_message:
-        return jsonify({'reply': 'Please enter a message.'}), 400
-    if not groq_client:
-        return jsonify({'reply': 'AI service is not available.'}), 503
-    try:
-        system_prompt = """
+@app.route('/search', methods=['POST'])
+def search():
+    return serve_coalesced('search')
+
+@app.route('/search/stream', methods=['POST'])
+def search_stream():
+    """Streams the /search pipeline as Server-Sent Events so the page can render each stage as it lands"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid request: expected a JSON object."}), 400
+    user_query = data.get('medicine_name')
+    user_query = user_query.strip() if isinstance(user_query, str) else ''
+    if not user_query:
+        return jsonify({'error': 'Please enter a medicine name.'}), 400
+    deadline = Deadline(REQUEST_DEADLINE)
+    requested_name = user_query
+    flight_key = coalesce_key('search', user_query)
+    user_query = resolve_medicine_name(user_query)
+
+    def generate():
+        # Shares cached responses and in-flight work with /search: a repeat or duplicate
+        # request only receives the final result
+        cached = cached_response('search', requested_name)
+        if cached is not None:
+            yield format_sse('result', cached[0])
+            return
+        call, shared = request_flights.begin(flight_key, timeout=deadline.remaining())
+        if shared is not None:
+            payload, status = shared
+            if status == 200:
+                yield format_sse('result', payload)
+            else:
+                yield format_sse('error', {'error': payload.get('error'), 'status': status})
+            return
+
+        result = None
+        try:
+            for event, payload in search_pipeline(user_query, stream_synthesis=True, deadline=deadline):
+                if event == 'result':
+                    result = (payload, 200)
+                elif event == 'error':
+                    result = ({'error': payload['error']}, payload['status'])
+                yield format_sse(event, payload)
+        except Exception as e:
+            print(f"An unexpected server error occurred during streaming search: {e}")
+            result = ({'error': "An unexpected server error occurred."}, 500)
+            yield format_sse('error', {'error': "An unexpected server error occurred.", 'status': 500})
+        finally:
+            if call is not None:
+                request_flights.finish(call, result, cacheable=is_complete_response(result))
+                store_response('search', requested_name, result)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+AI_ASSISTANT_SYSTEM_PROMPT = """
         You are a highly knowledgeable and empathetic AI Medical Assistant. Your role is to provide clear, accurate, and well-structured information to users regarding their health and medication questions.
 
         **CRITICAL INSTRUCTIONS:**
@@ -588,214 +1460,135 @@ def ai_assistant():
         
         ***Disclaimer:** This information is for educational purposes only and is not a substitute for professional medical advice. Always consult with a qualified healthcare provider for any health concerns or before making any decisions related to your health or treatment.*
         """
+
+def assistant_rate_limited(retry_after=None):
+    """
+    Answers an assistant message that could not get Groq quota with a 429. `retry_after`
+    (seconds, from an upstream 429) holds off every worker for that long.
+    """
+    if retry_after is not None:
+        groq_rate_limiter.block_for(retry_after)
+    response = jsonify({'reply': 'The AI service is busy right now. Please try again in a moment.'})
+    response.status_code = 429
+    blocked_for = max(retry_after or 0, groq_rate_limiter.stats()['blocked_for'])
+    response.headers['Retry-After'] = str(math.ceil(blocked_for) or 1)
+    return response
+
+@app.route('/ai-assistant', methods=['POST'])
+def ai_assistant():
+    data = request.get_json()
+    user_message = data.get('message', '').strip() if data else ''
+    if not user_message:
+        return jsonify({'reply': 'Please enter a message.'}), 400
+    if not groq_client:
+        return jsonify({'reply': 'AI service is not available.'}), 503
+    if not reserve_groq_tokens(AI_ASSISTANT_SYSTEM_PROMPT, user_message):
+        return assistant_rate_limited()
+    try:
         completion = groq_client.chat.completions.create(
-            model="llama3-70b-8192",
+            model=GROQ_MODEL,
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": AI_ASSISTANT_SYSTEM_PROMPT},
                 {"role": "user", "content": user_message}
             ]
         )
         ai_reply = completion.choices[0].message.content.strip()
         return jsonify({'reply': ai_reply})
+    except RateLimitError as e:
+        print(f"Groq AI Assistant rate limited: {e}")
+        return assistant_rate_limited(parse_retry_after(e.response.headers.get('retry-after')) or backoff_delay(0))
     except Exception as e:
         print(f"Groq AI Assistant Error: {e}")
         return jsonify({'reply': 'Sorry, there was an error processing your request.'}), 500
 
-@app.route('/alternative-medicine-price', methods=['POST'])
-def alternative_medicine_price():
-    medicine_name = request.json.get('medicine_name', '').strip()
-    if not medicine_name:
-        return jsonify({'error': 'Please enter a medicine name.'}), 400
+@app.route('/ai-assistant/stream', methods=['POST'])
+def ai_assistant_stream():
+    """Streams the assistant's reply as Server-Sent Events, one 'delta' event per completion chunk"""
+    data = request.get_json()
+    user_message = data.get('message', '').strip() if data else ''
+    if not user_message:
+        return jsonify({'reply': 'Please enter a message.'}), 400
+    if not groq_client:
+        return jsonify({'reply': 'AI service is not available.'}), 503
+    if not reserve_groq_tokens(AI_ASSISTANT_SYSTEM_PROMPT, user_message):
+        return assistant_rate_limited()
 
+    def generate():
+        stream = None
+        try:
+            stream = groq_client.chat.completions.create(
+                model=GROQ_MODEL,
+                messages=[
+                    {"role": "system", "content": AI_ASSISTANT_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_message}
+                ],
+                stream=True
+            )
+            # Chunks are forwarded as they arrive; nothing is buffered on the server
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield format_sse('delta', {'delta': delta})
+            yield format_sse('done', {})
+        except GeneratorExit:
+            print("AI Assistant client disconnected; cancelling upstream completion.")
+            raise
+        except RateLimitError as e:
+            print(f"Groq AI Assistant rate limited: {e}")
+            groq_rate_limiter.block_for(parse_retry_after(e.response.headers.get('retry-after')) or backoff_delay(0))
+            yield format_sse('error', {'reply': 'The AI service is busy right now. Please try again in a moment.'})
+        except Exception as e:
+            print(f"Groq AI Assistant Error: {e}")
+            yield format_sse('error', {'reply': 'Sorry, there was an error processing your request.'})
+        finally:
+            # Closing the stream drops the upstream HTTP response, so Groq stops generating
+            if stream is not None:
+                stream.close()
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def compute_alternative_medicine_price(medicine_name, deadline):
+    """
+    The /alternative-medicine-price lookup for `medicine_name` as a (payload, status) result.
+    """
     try:
-        print(f"\n--- STAGE 1: Finding composition for '{medicine_name}' ---")
-        # First, get the composition of the medicine using multiple queries for better results
-        composition_queries = [
-            f'"{medicine_name}" active ingredient composition medical',
-            f'"{medicine_name}" drug composition generic name',
-            f'"{medicine_name}" medication ingredients pharmaceutical'
-        ]
-        
-        composition_context = ""
-        for query in composition_queries:
-            results, error = perform_google_search(query, GOOGLE_API_KEY, GOOGLE_CSE_ID, num_results=5)
-            if not error and results:
-                composition_context += " ".join([item.get('snippet', '') for item in results]) + " "
-        
-        if not composition_context:
-            return jsonify({'error': 'Could not find composition information for this medicine.'}), 404
-        
-        # Extract the composition using AI with a more specific prompt
-        composition_prompt = f"""
-        You are a pharmaceutical expert. From the provided context about "{medicine_name}", extract ONLY the active ingredient(s) and their strength.
-        
-        CRITICAL INSTRUCTIONS:
-        1. Identify the EXACT chemical name(s) of the active ingredient(s) and their dosage
-        2. Return a JSON with a single key "active_ingredients" containing a list of the active ingredients with their strengths
-        3. If there are multiple active ingredients, include all of them
-        4. Format each ingredient as "ChemicalName Strength" (e.g., "Paracetamol 500mg")
-        5. Do NOT include fillers, excipients, or inactive ingredients
-        6. If the medicine is a brand name for a generic drug, identify the generic drug name
-        
-        Example output: 
-        {{
-          "active_ingredients": ["Paracetamol 500mg"]
-        }}
-        
-        For combination drugs:
-        {{
-          "active_ingredients": ["Paracetamol 500mg", "Caffeine 65mg"]
-        }}
-        """
-        
-        composition_data = process_with_groq(composition_prompt, f"CONTEXT: {composition_context}\nMEDICINE NAME: {medicine_name}")
-        
-        # Check for error in AI response
-        if "error" in composition_data:
-            return jsonify({'error': composition_data["error"]}), 500
-            
-        active_ingredients = composition_data.get('active_ingredients', [])
-        
-        if not active_ingredients:
-            return jsonify({'error': 'Could not determine the active ingredients of this medicine.'}), 404
-        
+        catalogue_entry = drug_catalogue.lookup(medicine_name)
+        catalogue_price = format_catalogue_price(catalogue_entry['price']) if catalogue_entry else None
+        targets = ['composition', 'alternatives', 'medicine_info']
+        if not catalogue_price:
+            # Only look for the original price on the web when the catalogue has none
+            targets.append('original_price')
+
+        print(f"\n--- Finding alternatives for '{medicine_name}' ---")
+        degraded_sections = {}
+        results, errors = medicine_stages.run(targets, deadline, degraded_sections, medicine=medicine_name)
+        for stage in ('composition', 'alternatives'):
+            if stage in errors:
+                return {'error': errors[stage].message}, errors[stage].status
+
+        active_ingredients = split_constituents(results['composition'])
         print(f"--- Found active ingredients: {', '.join(active_ingredients)} ---")
-        
-        # Search for alternative medicines with the same active ingredients using multiple targeted queries
-        print(f"\n--- STAGE 2: Finding alternatives for '{medicine_name}' ---")
-        alternative_queries = [
-            f'{", ".join(active_ingredients)} alternative brands generic medicines',
-            f'generic alternatives to {medicine_name} same composition',
-            f'substitute for {medicine_name} same ingredients',
-            f'{", ".join(active_ingredients)} brands in india price comparison',
-            f'{", ".join([ing.split()[0] for ing in active_ingredients])} generic medication brands'
-        ]
-        
-        alternative_context = ""
-        for query in alternative_queries:
-            results, error = perform_google_search(query, GOOGLE_API_KEY, GOOGLE_CSE_ID, num_results=8)
-            if not error and results:
-                alternative_context += json.dumps(results) + " "
-        
-        if not alternative_context:
-            return jsonify({'error': 'Could not find alternative medicines.'}), 404
-        
-        # Process alternatives using AI with a more detailed prompt
-        alternatives_prompt = f"""
-        You are a pharmaceutical expert specializing in medication alternatives and pricing. Based on the search results provided, identify alternative medicines/brands that contain the SAME active ingredients as the original medicine "{medicine_name}" with active ingredients: {", ".join(active_ingredients)}.
-        
-        CRITICAL INSTRUCTIONS:
-        1. Focus ONLY on medicines that have the EXACT SAME active ingredients and strengths as the original
-        2. For each alternative medicine found, extract:
-           - Brand name (exact spelling is important)
-           - Manufacturer name (if available)
-           - Price information (if available, with quantity details like "₹25 for 10 tablets")
-           - Active ingredients confirmation (to verify it matches the original)
-        3. Exclude the original medicine "{medicine_name}" from the list
-        4. Include at least 5 alternatives if possible, but only if they truly match the active ingredients
-        5. For each alternative, include a confidence score (0-100%) indicating how certain you are that it contains the exact same ingredients
-        6. If a medicine appears to be the same as the original (same brand, different packaging), exclude it
-        7. If no alternatives are found, return an empty array for "alternatives"
-        
-        Return a JSON with an "alternatives" key containing a list of alternative medicine objects:
-        
-        Example output:
-        {{
-          "alternatives": [
-            {{
-              "name": "GenericMed",
-              "manufacturer": "ABC Pharma",
-              "active_ingredients": "Paracetamol 500mg",
-              "price": "₹25 for 10 tablets",
-              "confidence": 95
-            }}
-          ]
-        }}
-        """
-        
-        alternatives_data = process_with_groq(alternatives_prompt, f"SEARCH RESULTS: {alternative_context}\nORIGINAL MEDICINE: {medicine_name}\nACTIVE INGREDIENTS: {', '.join(active_ingredients)}")
-        
-        # Check for error in AI response
-        if "error" in alternatives_data:
-            return jsonify({'error': alternatives_data["error"]}), 500
-            
-        # Filter alternatives by confidence score
-        alternatives = alternatives_data.get('alternatives', [])
-        alternatives = [alt for alt in alternatives if alt.get('confidence', 0) >= 70]
-        
-        # Get detailed price information for the original medicine
-        print(f"\n--- STAGE 3: Getting price information for '{medicine_name}' ---")
-        original_queries = [
-            f'buy "{medicine_name}" online price',
-            f'"{medicine_name}" price india pharmacy',
-            f'"{medicine_name}" cost per strip tablet'
-        ]
-        
-        original_price_context = ""
-        for query in original_queries:
-            results, error = perform_google_search(query, GOOGLE_API_KEY, GOOGLE_CSE_ID, num_results=5)
-            if not error and results:
-                original_price_context += json.dumps(results)
-        
-        original_price = 'Price not available'
-        if original_price_context:
-            original_price_prompt = f"""
-            Extract the most accurate price information for "{medicine_name}" from the search results provided.
-            
-            CRITICAL INSTRUCTIONS:
-            1. Look for specific price mentions with quantity (e.g., "₹50 for 10 tablets")
-            2. Prioritize prices from reputable online pharmacies (1mg, PharmEasy, Netmeds, Apollo, etc.)
-            3. If multiple prices are found, select the most common or median price
-            4. Include quantity information if available (number of tablets/capsules/ml)
-            5. Return a JSON with a "price" key containing the most reliable price found
-            
-            Example: {{ "price": "₹50 for 10 tablets" }}
-            """
-            original_price_data = process_with_groq(original_price_prompt, f"SEARCH RESULTS: {original_price_context}")
-            
-            # Check for error in AI response
-            if "error" not in original_price_data:
-                original_price = original_price_data.get('price', 'Price not available')
-        
-        # Get additional information about the original medicine
-        print(f"\n--- STAGE 4: Getting additional information for '{medicine_name}' ---")
-        medicine_info_query = f'"{medicine_name}" drug information uses'
-        info_results, error = perform_google_search(medicine_info_query, GOOGLE_API_KEY, GOOGLE_CSE_ID, num_results=5)
-        
-        medicine_info = {}
-        if not error and info_results:
-            info_context = " ".join([item.get('snippet', '') for item in info_results])
-            info_prompt = f"""
-            Extract brief but useful medical information about "{medicine_name}" from the provided context.
-            
-            Return a JSON with the following keys:
-            - "category": The drug category/class (e.g., "Analgesic", "Antibiotic")
-            - "primary_use": A brief description of what the medicine is primarily used for
-            
-            Example: {{ "category": "Analgesic", "primary_use": "Pain relief and fever reduction" }}
-            """
-            medicine_info_data = process_with_groq(info_prompt, f"CONTEXT: {info_context}")
-            
-            # Check for error in AI response
-            if "error" not in medicine_info_data:
-                medicine_info = medicine_info_data
-        
-        # Get an image URL for the medicine
-        image_url = get_medicine_image_url(medicine_name, GOOGLE_API_KEY, GOOGLE_CSE_ID)
+        alternatives = results['alternatives']
+        original_price = catalogue_price or results.get('original_price') or 'Price not available'
+        medicine_info = results.get('medicine_info') or {}
         
         # Return the complete response
         print(f"✅ Found {len(alternatives)} alternatives for {medicine_name}")
-        return jsonify({
+        return {
             'original_medicine': {
                 'name': medicine_name,
                 'active_ingredients': active_ingredients,
                 'price': original_price,
                 'category': medicine_info.get('category', 'Not available'),
                 'primary_use': medicine_info.get('primary_use', 'Not available'),
-                'image_url': image_url
+                'image_url': medicine_image_url(medicine_name)
             },
-            'alternatives': alternatives
-        })
+            'alternatives': alternatives,
+            # Optional details that failed or did not fit in the request deadline
+            'missing_sections': sorted(errors),
+            'degraded_sections': degraded_sections
+        }, 200
         
     except Exception as e:
         print(f"An unexpected error occurred during alternative medicine search: {e}")
@@ -803,7 +1596,89 @@ def alternative_medicine_price():
         # Ensure we're not returning HTML in error messages
         if "<" in error_message and ">" in error_message:
             error_message = "An internal server error occurred. Please try again later."
-        return jsonify({'error': error_message}), 500
+        return {'error': error_message}, 500
+
+@app.route('/alternative-medicine-price', methods=['POST'])
+def alternative_medicine_price():
+    return serve_coalesced('alternative-medicine-price')
+
+# Compute step of each lookup route by route name, used by the routes, background
+# refreshes and warmup.py
+LOOKUPS = {
+    'search': compute_search,
+    'alternative-medicine-price': compute_alternative_medicine_price,
+    'price-comparison': compute_price_comparison,
+}
+
+@app.route('/medicine-image/<path:medicine_name>', methods=['GET'])
+def medicine_image(medicine_name):
+    """API endpoint that finds a medicine's product image on first request and redirects to it (or serves the stored copy)"""
+    if image_store:
+        stored_path = image_store.path_for(medicine_name)
+        if stored_path:
+            return send_file(stored_path, max_age=IMAGE_MAX_AGES['stored'])
+
+    # Only names from a signed URL or the catalogue may trigger an image search
+    signature = request.args.get('sig', '')
+    if not (hmac.compare_digest(signature.encode('utf-8'), image_signature(medicine_name).encode('ascii'))
+            or drug_catalogue.lookup(medicine_name)):
+        return jsonify({'error': 'Unknown medicine image.'}), 403
+
+    results, _ = medicine_stages.run(['image'], Deadline(IMAGE_RESOLVE_DEADLINE), medicine=medicine_name)
+    remote_url = results.get('image')
+    if not remote_url:
+        response = jsonify({'error': 'No image found for this medicine.'})
+        response.status_code = 404
+        response.cache_control.max_age = IMAGE_MAX_AGES['missing']
+        return response
+
+    if image_store:
+        stored_path = image_store.save(medicine_name, remote_url)
+        if stored_path:
+            return send_file(stored_path, max_age=IMAGE_MAX_AGES['stored'])
+    response = redirect(remote_url)
+    response.cache_control.public = True
+    response.cache_control.max_age = IMAGE_MAX_AGES['redirect']
+    return response
+
+# --- Admin Routes ---
+
+def is_admin_request():
+    """
+    Checks the X-Admin-Token header against the ADMIN_TOKEN environment variable.
+    Admin routes are disabled entirely when no token is configured.
+    """
+    admin_token = os.environ.get("ADMIN_TOKEN")
+    supplied_token = request.headers.get('X-Admin-Token', '')
+    return bool(admin_token) and hmac.compare_digest(supplied_token, admin_token)
+
+@app.route('/admin/cache', methods=['GET'])
+def admin_cache_stats():
+    """API endpoint that reports hit/miss counters for every cache and the remaining upstream quotas"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify({
+        'caches': [cache.stats() for cache in CACHES.values()],
+        'rate_limits': [limiter.stats() for limiter in RATE_LIMITERS]
+    })
+
+@app.route('/admin/cache/purge', methods=['POST'])
+def admin_cache_purge():
+    """API endpoint to purge cache entries, optionally limited to one cache and/or a key substring"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    data = request.get_json(silent=True) or {}
+    cache_name = data.get('cache')
+    contains = data.get('contains')
+    if contains:
+        # Keys store the normalized (lowercased) query text.
+        contains = " ".join(contains.lower().split())
+
+    if cache_name and cache_name not in CACHES:
+        return jsonify({'error': f"Unknown cache '{cache_name}'."}), 404
+    targets = [CACHES[cache_name]] if cache_name else list(CACHES.values())
+    purged = {cache.namespace: cache.purge(contains) for cache in targets}
+    return jsonify({'purged': purged})
 
 # If this script is run directly, start the server
 if __name__ == '__main__':
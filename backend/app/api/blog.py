@@ -1,20 +1,84 @@
-from fastapi import APIRouter, HTTPException, Depends
+import json
+import hashlib
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from app.db import get_db
+from app.db import get_db, get_read_db
 from app.models import BlogPost
-from typing import List
+from typing import Optional
 
 router = APIRouter(prefix="/blog", tags=["blog"])
 
+# Post lists are keyset-paginated on id, newest first, and carry each post's title and
+# stored excerpt only; the full content comes from /blog/{post_id}. Every response has
+# an ETag and Last-Modified, so revalidating an unchanged page or post returns a 304.
+
 class BlogPostIn(BaseModel):
     title: str
     content: str
 
+def not_modified(request: Request, etag: str, last_modified) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match wins over If-Modified-Since when both are sent
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            # Dates with a "-0000" zone come back naive; they are UTC
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have whole seconds
+        return last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= since
+    return False
+
+def conditional_response(request: Request, payload: dict, last_modified) -> Response:
+    """
+    Serializes `payload` with ETag and Last-Modified headers, or answers 304 when the client's copy is current.
+    """
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    # Clients may keep responses but must revalidate them before use
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    if not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+def timestamp(value):
+    return value.replace(tzinfo=timezone.utc).isoformat() if value else None
+
 @router.get("/")
-def list_posts(db: Session = Depends(get_db)):
-    posts = db.query(BlogPost).all()
-    return {"posts": [{"id": p.id, "title": p.title, "content": p.content} for p in posts]}
+def list_posts(request: Request, limit: int = Query(20, ge=1, le=100),
+               before: Optional[int] = Query(None, description="Cursor: the next_cursor of the previous page"),
+               db: Session = Depends(get_read_db)):
+    query = db.query(BlogPost.id, BlogPost.title, BlogPost.excerpt, BlogPost.updated_at)
+    if before is not None:
+        query = query.filter(BlogPost.id < before)
+    # One extra row tells whether another page follows
+    rows = query.order_by(BlogPost.id.desc()).limit(limit + 1).all()
+    page = rows[:limit]
+    payload = {
+        "posts": [{"id": p.id, "title": p.title, "excerpt": p.excerpt, "updated_at": timestamp(p.updated_at)} for p in page],
+        "limit": limit,
+        "next_cursor": page[-1].id if len(rows) > limit else None
+    }
+    return conditional_response(request, payload, max((p.updated_at for p in page if p.updated_at), default=None))
+
+@router.get("/{post_id}")
+def get_post(post_id: int, request: Request, db: Session = Depends(get_read_db)):
+    post = db.get(BlogPost, post_id)
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+    payload = {"id": post.id, "title": post.title, "content": post.content, "updated_at": timestamp(post.updated_at)}
+    return conditional_response(request, payload, post.updated_at)
 
 @router.post("/")
 def create_post(post: BlogPostIn, db: Session = Depends(get_db)):
@@ -22,4 +86,4 @@ def create_post(post: BlogPostIn, db: Session = Depends(get_db)):
     db.add(db_post)
     db.commit()
     db.refresh(db_post)
-    return {"message": "Post created", "id": db_post.id} 
\ No newline at end of file
+    return {"message": "Post created", "id": db_post.id}
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from app.db import get_db
+from app.db import get_read_db
 from app.models import Medicine
 
 router = APIRouter(prefix="/essentials", tags=["essentials"])
@@ -16,7 +16,7 @@ def get_essentials():
     return {"categories": list(ESSENTIALS.keys())}
 
 @router.get("/{category}")
-def get_by_category(category: str, db: Session = Depends(get_db)):
+def get_by_category(category: str, db: Session = Depends(get_read_db)):
     names = ESSENTIALS.get(category, [])
     medicines = db.query(Medicine).filter(Medicine.name.in_(names)).all()
     return {"medicines": [{"id": m.id, "name": m.name, "generic": m.generic, "company": m.company, "price": m.price} for m in medicines]} 
\ No newline at end of file
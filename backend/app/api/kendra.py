@@ -1,16 +1,20 @@
+from typing import Optional
 from fastapi import APIRouter, Query, Depends
 from sqlalchemy.orm import Session
-from app.db import get_db
+from app.db import get_db, get_read_db
+from app.geo import nearest_kendras
 from app.models import Kendra
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/kendra", tags=["kendra"])
 
 @router.get("/nearby")
-def find_nearest(lat: float = Query(...), lng: float = Query(...), db: Session = Depends(get_db)):
-    # For now, return all Kendras (can add geospatial filtering later)
-    kendras = db.query(Kendra).all()
-    return {"kendras": [{"id": k.id, "name": k.name, "lat": k.lat, "lng": k.lng} for k in kendras]}
+def find_nearest(lat: float = Query(..., ge=-90, le=90), lng: float = Query(..., ge=-180, le=180),
+                 k: int = Query(10, ge=1, le=100, description="How many kendras to return"),
+                 radius_km: Optional[float] = Query(None, gt=0, le=20000, description="Only kendras within this distance"),
+                 db: Session = Depends(get_read_db)):
+    kendras = nearest_kendras(db, lat, lng, k=k, radius_km=radius_km)
+    return {"kendras": kendras, "k": k, "radius_km": radius_km}
 
 class KendraIn(BaseModel):
     name: str
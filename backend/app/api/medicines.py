@@ -1,26 +1,77 @@
+import threading
 from fastapi import APIRouter, Query, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app.db import get_db
+from app.db import get_db, get_read_db
 from app.models import Medicine
+from app.search import search_medicine_ids
+# The Flask app imports this module too (as backend.app.name_index)
+from app.name_index import NameIndex
 from typing import List
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/medicines", tags=["medicines"])
 
+# Typo-tolerant fallback for searches the full-text index finds nothing for. It is
+# built from the medicines table at startup (see app/main.py); before each use, rows
+# added since, by this worker, another worker or import_medicines.py, are indexed
+# too. Ids only grow, so the newest indexed id is all that needs remembering.
+name_index = NameIndex()
+_indexed_up_to = 0
+_name_index_lock = threading.Lock()
+
+def refresh_name_index(db: Session) -> NameIndex:
+    """
+    Adds medicines newer than the last indexed one to the name index and returns it.
+    """
+    global _indexed_up_to
+    with _name_index_lock:
+        rows = (
+            db.query(Medicine.id, Medicine.name, Medicine.generic)
+            .filter(Medicine.id > _indexed_up_to).order_by(Medicine.id).yield_per(10000)
+        )
+        for medicine_id, name, generic in rows:
+            name_index.add(name, medicine_id)
+            name_index.add(generic, medicine_id)
+            _indexed_up_to = medicine_id
+    return name_index
+
+def next_offset(offset: int, limit: int, returned: int):
+    return offset + limit if returned == limit else None
+
 @router.get("/search")
-def search_medicines(q: str = Query(..., description="Medicine name to search"), db: Session = Depends(get_db)):
-    results = db.query(Medicine).filter(Medicine.name.ilike(f"%{q}%")).all()
-    return {"results": [{"id": m.id, "name": m.name, "generic": m.generic, "company": m.company, "price": m.price} for m in results]}
+def search_medicines(q: str = Query(..., description="Medicine name to search"), limit: int = Query(20, ge=1, le=100),
+                     offset: int = Query(0, ge=0), db: Session = Depends(get_read_db)):
+    ids = search_medicine_ids(db, q, limit=limit, offset=offset)
+    if not ids and offset == 0:
+        # No word starts with what was typed; try correcting typos instead
+        ids = [match["key"] for match in refresh_name_index(db).search(q, limit=limit)]
+    medicines = {m.id: m for m in db.query(Medicine).filter(Medicine.id.in_(ids)).all()} if ids else {}
+    results = [medicines[i] for i in ids if i in medicines]
+    return {
+        "results": [{"id": m.id, "name": m.name, "generic": m.generic, "company": m.company, "price": m.price} for m in results],
+        "limit": limit,
+        "offset": offset,
+        "next_offset": next_offset(offset, limit, len(ids))
+    }
 
 @router.get("/generic")
-def get_generic_name(name: str = Query(..., description="Brand or medicine name"), db: Session = Depends(get_db)):
-    medicine = db.query(Medicine).filter((Medicine.name.ilike(f"%{name}%")) | (Medicine.generic.ilike(f"%{name}%"))).first()
+def get_generic_name(name: str = Query(..., description="Brand or medicine name"), limit: int = Query(50, ge=1, le=500),
+                     offset: int = Query(0, ge=0), db: Session = Depends(get_read_db)):
+    ids = search_medicine_ids(db, name, limit=1)
+    medicine = db.get(Medicine, ids[0]) if ids else None
     if not medicine:
         raise HTTPException(status_code=404, detail="Medicine not found")
-    brands = db.query(Medicine).filter(Medicine.generic == medicine.generic).all()
+    brands = (
+        db.query(Medicine).filter(Medicine.generic == medicine.generic)
+        .order_by(Medicine.id).limit(limit).offset(offset).all()
+    )
     return {
         "generic": medicine.generic,
-        "brands": [{"id": b.id, "name": b.name, "company": b.company, "price": b.price} for b in brands]
+        "brands": [{"id": b.id, "name": b.name, "company": b.company, "price": b.price} for b in brands],
+        "limit": limit,
+        "offset": offset,
+        "next_offset": next_offset(offset, limit, len(brands))
     }
 
 class MedicineIn(BaseModel):
@@ -33,6 +84,11 @@ class MedicineIn(BaseModel):
 def create_medicine(med: MedicineIn, db: Session = Depends(get_db)):
     db_med = Medicine(name=med.name, generic=med.generic, company=med.company, price=med.price)
     db.add(db_med)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # (name, company) is unique; see import_medicines.py
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Medicine already exists for this company")
     db.refresh(db_med)
-    return {"id": db_med.id, "name": db_med.name} 
\ No newline at end of file
+    return {"id": db_med.id, "name": db_med.name}
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Query
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, literal, not_, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, joinedload
+from starlette.concurrency import run_in_threadpool
 from app.db import get_db
 from app.models import User, SavedMedicine, Medicine
+from app.sessions import SESSION_TTL, current_session, issue_token
 from passlib.context import CryptContext
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -18,9 +23,59 @@ class UserLogin(BaseModel):
     password: str
 
 class SaveMedicine(BaseModel):
-    username: str
+    # Optional; when given it must be the logged-in user
+    username: Optional[str] = None
     medicine_id: int
 
+class SavedBatch(BaseModel):
+    username: Optional[str] = None
+    # Medicines to save, by id and/or by exact name
+    save: List[int] = []
+    save_names: List[str] = []
+    # Medicines to remove, by id and/or by exact name
+    remove: List[int] = []
+    remove_names: List[str] = []
+    # Remove every saved medicine not listed in save/save_names
+    replace: bool = False
+
+def session_user_id(session: dict, username: Optional[str]) -> int:
+    """
+    Returns the logged-in user's id, refusing requests made on behalf of another user.
+    """
+    if username is not None and username != session["sub"]:
+        raise HTTPException(status_code=403, detail="Not allowed for this user")
+    return session["uid"]
+
+def authenticate(db: Session, username: str, password: str) -> Optional[User]:
+    db_user = db.query(User).filter(User.username == username).first()
+    if not db_user or not pwd_context.verify(password, db_user.hashed_password):
+        return None
+    return db_user
+
+def chosen_medicine_ids(ids: List[int], names: List[str]):
+    """
+    Selects the ids of the given medicines: those listed by id, plus one medicine per listed name.
+    """
+    by_id = select(Medicine.id).where(Medicine.id.in_(ids))
+    by_name = select(func.min(Medicine.id)).where(Medicine.name.in_(names)).group_by(Medicine.name)
+    return by_id.union(by_name)
+
+def save_medicines(db: Session, user_id: int, ids: List[int], names: List[str]) -> int:
+    """
+    Saves the chosen medicines for a user in one statement, skipping ones already saved.
+    Unknown ids and names are ignored. Returns the number of medicines newly saved.
+    """
+    if not ids and not names:
+        return 0
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    chosen = chosen_medicine_ids(ids, names).subquery()
+    statement = insert(SavedMedicine.__table__).from_select(
+        ['user_id', 'medicine_id'],
+        # The WHERE lets SQLite tell the ON CONFLICT clause apart from the SELECT
+        select(literal(user_id), chosen.c[0]).where(chosen.c[0].is_not(None))
+    ).on_conflict_do_nothing(index_elements=['user_id', 'medicine_id'])
+    return db.execute(statement).rowcount
+
 @router.post("/register")
 def register(user: UserRegister, db: Session = Depends(get_db)):
     if db.query(User).filter(User.username == user.username).first():
@@ -33,31 +88,65 @@ def register(user: UserRegister, db: Session = Depends(get_db)):
     return {"message": "User registered successfully"}
 
 @router.post("/login")
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first()
-    if not db_user or not pwd_context.verify(user.password, db_user.hashed_password):
+async def login(user: UserLogin, db: Session = Depends(get_db)):
+    # bcrypt is the only expensive check; it runs here, off the event loop, and the
+    # returned token is what authenticates every later request
+    db_user = await run_in_threadpool(authenticate, db, user.username, user.password)
+    if db_user is None:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    return {"message": "Login successful"}
+    return {
+        "message": "Login successful",
+        "access_token": issue_token(db_user.id, db_user.username),
+        "token_type": "bearer",
+        "expires_in": SESSION_TTL
+    }
 
 @router.post("/save")
-def save_medicine(data: SaveMedicine, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == data.username).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    medicine = db.query(Medicine).filter(Medicine.id == data.medicine_id).first()
-    if not medicine:
+def save_medicine(data: SaveMedicine, session: dict = Depends(current_session), db: Session = Depends(get_db)):
+    user_id = session_user_id(session, data.username)
+    if db.get(Medicine, data.medicine_id) is None:
         raise HTTPException(status_code=404, detail="Medicine not found")
-    saved = SavedMedicine(user_id=user.id, medicine_id=medicine.id)
-    db.add(saved)
+    save_medicines(db, user_id, [data.medicine_id], [])
     db.commit()
-    db.refresh(saved)
     return {"message": "Medicine saved"}
 
+@router.post("/saved/batch")
+def update_saved(batch: SavedBatch, session: dict = Depends(current_session), db: Session = Depends(get_db)):
+    """Saves and removes many medicines for the logged-in user in one transaction"""
+    user_id = session_user_id(session, batch.username)
+
+    removal = None
+    if batch.replace:
+        removal = not_(SavedMedicine.medicine_id.in_(chosen_medicine_ids(batch.save, batch.save_names)))
+    elif batch.remove or batch.remove_names:
+        removal = SavedMedicine.medicine_id.in_(
+            select(Medicine.id).where(or_(Medicine.id.in_(batch.remove), Medicine.name.in_(batch.remove_names)))
+        )
+    removed = 0
+    if removal is not None:
+        removed = db.execute(delete(SavedMedicine).where(SavedMedicine.user_id == user_id, removal)).rowcount
+    saved = save_medicines(db, user_id, batch.save, batch.save_names)
+    db.commit()
+    return {"saved": saved, "removed": removed}
+
 @router.get("/saved/{username}")
-def get_saved(username: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == username).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    saved = db.query(SavedMedicine).filter(SavedMedicine.user_id == user.id).all()
-    medicines = [db.query(Medicine).filter(Medicine.id == s.medicine_id).first() for s in saved]
-    return {"saved": [{"id": m.id, "name": m.name, "generic": m.generic, "company": m.company, "price": m.price} for m in medicines if m]} 
\ No newline at end of file
+def get_saved(username: str, limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0),
+              session: dict = Depends(current_session), db: Session = Depends(get_db)):
+    user_id = session_user_id(session, username)
+    # One query: the saved rows joined, eagerly, to their medicines
+    saved = (
+        db.query(SavedMedicine)
+        .filter(SavedMedicine.user_id == user_id)
+        .options(joinedload(SavedMedicine.medicine))
+        .order_by(SavedMedicine.id)
+        .limit(limit)
+        .offset(offset)
+        .all()
+    )
+    medicines = [s.medicine for s in saved if s.medicine is not None]
+    return {
+        "saved": [{"id": m.id, "name": m.name, "generic": m.generic, "company": m.company, "price": m.price} for m in medicines],
+        "limit": limit,
+        "offset": offset,
+        "next_offset": offset + limit if len(saved) == limit else None
+    } 
\ No newline at end of file
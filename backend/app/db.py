@@ -1,12 +1,25 @@
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from app.engine_profile import create_profiled_engine, is_sqlite_file
 import os
 
 # Use SQLite for local development
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./medicine_db.sqlite3")
+# Optional read replica for read-only routes; without one they use the primary
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+
+# Engine settings (WAL and PRAGMAs, pooling, slow-query log) live in engine_profile.py
+engine = create_profiled_engine(DATABASE_URL)
+if DATABASE_READ_URL:
+    read_engine = create_profiled_engine(DATABASE_READ_URL, read_only=True)
+elif is_sqlite_file(DATABASE_URL):
+    # Its own pool of query_only connections to the same file; in WAL mode they
+    # read a snapshot and never wait for the writer
+    read_engine = create_profiled_engine(DATABASE_URL, read_only=True)
+else:
+    read_engine = engine
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}, echo=True, future=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
 
 def get_db():
@@ -14,4 +27,12 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+def get_read_db():
+    """Session for routes that only read shared data (catalogue, blog, kendras)"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,109 @@
+import os
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+
+# --- Database Engine Profile ---
+# Engine settings for the backend, each overridable through the environment.
+# SQLite connections are switched to WAL on connect, so readers no longer block the
+# writer or each other, with synchronous=NORMAL (durable in WAL mode, fsyncing at
+# checkpoints rather than on every commit), a larger page cache, memory-mapped reads
+# and a busy timeout so a second writer waits for the lock instead of failing.
+# Server databases get a sized pool whose connections are pinged before use and
+# recycled, so a restarted server or a dropped idle connection is not a 500.
+# Statements are not echoed; only those slower than SLOW_QUERY_MS are printed.
+
+DB_ECHO = os.getenv("DB_ECHO", "0") == "1"
+# Statements taking at least this long are printed; 0 disables the check
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    'synchronous': os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    # Negative values are KiB rather than pages
+    'cache_size': -int(os.getenv("SQLITE_CACHE_KIB", 64 * 1024)),
+    'mmap_size': int(os.getenv("SQLITE_MMAP_BYTES", 256 * 1024 * 1024)),
+    'busy_timeout': int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    'temp_store': 'MEMORY',
+}
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+# Server databases only: seconds to wait for a free connection, and the age after
+# which a connection is replaced (below typical server and proxy idle timeouts)
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+
+
+def is_sqlite_file(url) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def engine_options(url) -> dict:
+    """
+    Returns the create_engine() keyword arguments for the database at `url`.
+    """
+    url = make_url(url)
+    options = {'echo': DB_ECHO}
+    if url.get_backend_name() == "sqlite":
+        options['connect_args'] = {'check_same_thread': False}
+        if is_sqlite_file(url):
+            options.update(pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW)
+    else:
+        options.update(
+            pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT,
+            pool_recycle=POOL_RECYCLE, pool_pre_ping=True
+        )
+    return options
+
+
+def apply_sqlite_pragmas(engine: Engine, read_only: bool = False):
+    """
+    Runs the PRAGMA settings on every new connection of a SQLite engine. Read-only
+    engines also get query_only, so a write through them fails instead of taking the lock.
+    """
+    pragmas = dict(SQLITE_PRAGMAS, query_only='ON' if read_only else 'OFF')
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+def log_slow_queries(engine: Engine, threshold_ms: float = SLOW_QUERY_MS):
+    """
+    Prints every statement on `engine` that takes at least `threshold_ms`.
+    """
+    if threshold_ms <= 0:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def report_slow(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info['query_started'].pop()) * 1000
+        if elapsed_ms >= threshold_ms:
+            rows = f", {len(parameters)} rows" if executemany else ""
+            print(f"🐢 Slow query ({elapsed_ms:.0f} ms{rows}): {' '.join(statement.split())[:500]}")
+
+    @event.listens_for(engine, "handle_error")
+    def drop_timer(exception_context):
+        started = exception_context.connection.info.get('query_started') if exception_context.connection else None
+        if started:
+            started.pop()
+
+
+def create_profiled_engine(url, read_only: bool = False) -> Engine:
+    """
+    Creates an engine for `url` with the settings above.
+    """
+    engine = create_engine(url, **engine_options(url))
+    if engine.dialect.name == "sqlite":
+        apply_sqlite_pragmas(engine, read_only)
+    log_slow_queries(engine)
+    return engine
@@ -0,0 +1,93 @@
+import math
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.models import Kendra
+
+# --- Kendra Nearest-Neighbour Search ---
+# Candidates are fetched with a bounding-box query around the user and re-ranked by
+# exact haversine distance. On SQLite the box query runs against an R*Tree mirror of
+# kendras.lat/lng, kept in step by triggers; elsewhere it runs on a (lat, lng) index.
+# Without a radius the box starts small and grows until it holds k kendras; the k-th
+# nearest of those bounds the answer, so one last box of that radius gives the exact
+# result while a query only touches the kendras around the user.
+# The index is created, and filled from the existing rows, by app/migrate.py.
+
+# Mean Earth radius, the same as the Flask app's kendras.py uses
+EARTH_RADIUS_KM = 6371
+
+# First search radius when none is given; it grows by RADIUS_GROWTH until k kendras are found
+INITIAL_RADIUS_KM = 10
+RADIUS_GROWTH = 2
+# Half the Earth's circumference: a box this size covers the whole globe
+MAX_RADIUS_KM = math.pi * EARTH_RADIUS_KM
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_boxes(lat, lng, radius_km):
+    """
+    Returns the (min_lat, max_lat, min_lng, max_lng) boxes covering every point within
+    `radius_km` of (lat, lng): two boxes when the area crosses the antimeridian, and a
+    full band of longitudes when it reaches a pole.
+    """
+    angular = radius_km / EARTH_RADIUS_KM
+    min_lat, max_lat = lat - math.degrees(angular), lat + math.degrees(angular)
+    if min_lat <= -90 or max_lat >= 90 or angular >= math.pi / 2:
+        return [(max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0)]
+    delta_lng = math.degrees(math.asin(min(1.0, math.sin(angular) / math.cos(math.radians(lat)))))
+    min_lng, max_lng = lng - delta_lng, lng + delta_lng
+    if min_lng < -180:
+        return [(min_lat, max_lat, min_lng + 360, 180.0), (min_lat, max_lat, -180.0, max_lng)]
+    if max_lng > 180:
+        return [(min_lat, max_lat, min_lng, 180.0), (min_lat, max_lat, -180.0, max_lng - 360)]
+    return [(min_lat, max_lat, min_lng, max_lng)]
+
+
+def kendras_in_boxes(db: Session, boxes):
+    """
+    Returns (id, name, lat, lng) rows of the kendras inside any of the boxes.
+    """
+    rows = []
+    for min_lat, max_lat, min_lng, max_lng in boxes:
+        if db.get_bind().dialect.name == "sqlite":
+            rows += db.execute(text(
+                "SELECT k.id, k.name, k.lat, k.lng FROM kendras_rtree r JOIN kendras k ON k.id = r.id "
+                "WHERE r.max_lat >= :min_lat AND r.min_lat <= :max_lat AND r.max_lng >= :min_lng AND r.min_lng <= :max_lng"
+            ), {"min_lat": min_lat, "max_lat": max_lat, "min_lng": min_lng, "max_lng": max_lng}).all()
+        else:
+            rows += db.query(Kendra.id, Kendra.name, Kendra.lat, Kendra.lng).filter(
+                Kendra.lat.between(min_lat, max_lat), Kendra.lng.between(min_lng, max_lng)
+            ).all()
+    return rows
+
+
+def nearest_kendras(db: Session, lat: float, lng: float, k: int = 10, radius_km: float = None):
+    """
+    Returns up to `k` kendras nearest to (lat, lng), optionally only those within
+    `radius_km`, as dicts with a 'distance_km', nearest first.
+    """
+    search_radius = radius_km if radius_km is not None else INITIAL_RADIUS_KM
+    while True:
+        search_radius = min(search_radius, MAX_RADIUS_KM)
+        candidates = sorted(
+            ((haversine_km(lat, lng, row.lat, row.lng), row)
+             for row in kendras_in_boxes(db, bounding_boxes(lat, lng, search_radius))),
+            key=lambda item: item[0]
+        )
+        # Only kendras within the search radius are sure to be the nearest; those in the box corners may not be
+        ranked = [(distance, row) for distance, row in candidates if distance <= search_radius]
+        if radius_km is not None or len(ranked) >= k or search_radius >= MAX_RADIUS_KM:
+            break
+        if len(candidates) >= k:
+            # The k nearest lie no further away than the k-th candidate
+            search_radius = candidates[k - 1][0]
+        else:
+            search_radius *= RADIUS_GROWTH
+    return [
+        {"id": row.id, "name": row.name, "lat": row.lat, "lng": row.lng, "distance_km": round(distance, 3)}
+        for distance, row in ranked[:k]
+    ]
@@ -1,8 +1,19 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import medicines, users, blog, assistant, kendra, essentials
+from app.db import ReadSessionLocal
+from app.migrate import migrate
 
-app = FastAPI(title="Medicine Web App")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema changes and the medicine name index are set up once here, before the first request
+    migrate()
+    with ReadSessionLocal() as db:
+        medicines.refresh_name_index(db)
+    yield
+
+app = FastAPI(title="Medicine Web App", lifespan=lifespan)
 
 # CORS setup for frontend-backend communication
 app.add_middleware(
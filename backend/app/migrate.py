@@ -0,0 +1,147 @@
+from sqlalchemy import DateTime, bindparam, inspect, text
+from app.db import Base, engine as primary_engine
+from app.models import BlogPost, make_excerpt, utcnow
+
+# --- Schema Migrations ---
+# Schema the models cannot declare (full-text and spatial indexes with their sync
+# triggers) and changes that databases created before them need (new columns, new
+# unique keys) are applied here, once, when the app starts or the database is seeded.
+# Request handlers never run DDL. Every step checks what is already there first, so
+# migrate() is safe to run on every start; it always runs against the primary, and a
+# read replica gets the changes through replication.
+
+FTS_SETUP = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS medicines_fts USING fts5(
+        name, generic, content='medicines', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS medicines_fts_insert AFTER INSERT ON medicines BEGIN
+        INSERT INTO medicines_fts(rowid, name, generic) VALUES (new.id, new.name, new.generic);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS medicines_fts_delete AFTER DELETE ON medicines BEGIN
+        INSERT INTO medicines_fts(medicines_fts, rowid, name, generic) VALUES ('delete', old.id, old.name, old.generic);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS medicines_fts_update AFTER UPDATE OF name, generic ON medicines BEGIN
+        INSERT INTO medicines_fts(medicines_fts, rowid, name, generic) VALUES ('delete', old.id, old.name, old.generic);
+        INSERT INTO medicines_fts(rowid, name, generic) VALUES (new.id, new.name, new.generic);
+    END
+    """,
+]
+
+TRIGRAM_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_medicines_name_trgm ON medicines USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_medicines_generic_trgm ON medicines USING gin (generic gin_trgm_ops)",
+]
+
+RTREE_SETUP = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS kendras_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng)",
+    """
+    CREATE TRIGGER IF NOT EXISTS kendras_rtree_insert AFTER INSERT ON kendras BEGIN
+        INSERT INTO kendras_rtree VALUES (new.id, new.lat, new.lat, new.lng, new.lng);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS kendras_rtree_delete AFTER DELETE ON kendras BEGIN
+        DELETE FROM kendras_rtree WHERE id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS kendras_rtree_update AFTER UPDATE OF id, lat, lng ON kendras BEGIN
+        DELETE FROM kendras_rtree WHERE id = old.id;
+        INSERT INTO kendras_rtree VALUES (new.id, new.lat, new.lat, new.lng, new.lng);
+    END
+    """,
+]
+
+BOX_INDEX_SETUP = ["CREATE INDEX IF NOT EXISTS ix_kendras_lat_lng ON kendras (lat, lng)"]
+
+# A medicine is saved at most once per user; duplicates from before that rule are merged
+DEDUPLICATE_SAVED = """
+    DELETE FROM saved_medicines WHERE id NOT IN (
+        SELECT MIN(id) FROM saved_medicines GROUP BY user_id, medicine_id
+    )
+"""
+
+
+def create_tables(conn):
+    Base.metadata.create_all(conn)
+
+
+def create_search_index(conn):
+    """
+    The medicine full-text index: FTS5 on SQLite, trigram indexes on Postgres.
+    """
+    if conn.dialect.name == "sqlite":
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'medicines_fts'")).first()
+        for statement in FTS_SETUP:
+            conn.execute(text(statement))
+        if not exists:
+            # Index the rows that were there before the triggers
+            conn.execute(text("INSERT INTO medicines_fts(medicines_fts) VALUES ('rebuild')"))
+    elif conn.dialect.name == "postgresql":
+        for statement in TRIGRAM_SETUP:
+            conn.execute(text(statement))
+
+
+def add_saved_unique_key(conn):
+    indexes = {index['name'] for index in inspect(conn).get_indexes('saved_medicines')}
+    if 'uq_saved_medicines_user_medicine' not in indexes:
+        conn.execute(text(DEDUPLICATE_SAVED))
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_saved_medicines_user_medicine ON saved_medicines (user_id, medicine_id)"
+        ))
+
+
+def create_geo_index(conn):
+    """
+    The kendra bounding-box index: an R*Tree mirror on SQLite, a (lat, lng) index elsewhere.
+    """
+    if conn.dialect.name == "sqlite":
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'kendras_rtree'")).first()
+        for statement in RTREE_SETUP:
+            conn.execute(text(statement))
+        if not exists:
+            # Index the rows that were there before the triggers
+            conn.execute(text("INSERT INTO kendras_rtree SELECT id, lat, lat, lng, lng FROM kendras"))
+    else:
+        for statement in BOX_INDEX_SETUP:
+            conn.execute(text(statement))
+
+
+def add_blog_columns(conn):
+    """
+    The blog excerpt and updated_at columns, filled in for existing posts.
+    """
+    columns = {column['name'] for column in inspect(conn).get_columns('blog_posts')}
+    if 'excerpt' not in columns:
+        conn.execute(text("ALTER TABLE blog_posts ADD COLUMN excerpt VARCHAR"))
+    if 'updated_at' not in columns:
+        conn.execute(text(f"ALTER TABLE blog_posts ADD COLUMN updated_at {DateTime().compile(dialect=conn.dialect)}"))
+    missing = conn.execute(text("SELECT id, content FROM blog_posts WHERE excerpt IS NULL")).all()
+    if missing:
+        posts = BlogPost.__table__
+        conn.execute(
+            posts.update().where(posts.c.id == bindparam('post_id')).values(excerpt=bindparam('new_excerpt')),
+            [{'post_id': post_id, 'new_excerpt': make_excerpt(content)} for post_id, content in missing]
+        )
+    conn.execute(text("UPDATE blog_posts SET updated_at = :now WHERE updated_at IS NULL"), {"now": utcnow()})
+
+
+MIGRATIONS = [create_tables, create_search_index, add_saved_unique_key, create_geo_index, add_blog_columns]
+
+
+def migrate(engine=primary_engine):
+    """
+    Brings the database's schema up to date in one transaction.
+    """
+    with engine.begin() as conn:
+        for step in MIGRATIONS:
+            step(conn)
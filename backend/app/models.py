@@ -1,7 +1,20 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, Index, DateTime
 from sqlalchemy.orm import relationship
 from app.db import Base
 
+EXCERPT_LENGTH = 200
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def make_excerpt(content: str) -> str:
+    """The start of `content` on one line, cut at a word boundary"""
+    text = " ".join(content.split())
+    if len(text) <= EXCERPT_LENGTH:
+        return text
+    return text[:EXCERPT_LENGTH].rsplit(" ", 1)[0] + "…"
+
 class User(Base):
     __tablename__ = 'users'
     id = Column(Integer, primary_key=True, index=True)
@@ -16,6 +29,8 @@ class Medicine(Base):
     generic = Column(String, index=True, nullable=False)
     company = Column(String)
     price = Column(Float)
+    # The key bulk imports upsert on (see import_medicines.py)
+    __table_args__ = (Index('uq_medicines_name_company', 'name', 'company', unique=True),)
 
 class SavedMedicine(Base):
     __tablename__ = 'saved_medicines'
@@ -24,16 +39,22 @@ class SavedMedicine(Base):
     medicine_id = Column(Integer, ForeignKey('medicines.id'))
     user = relationship('User', back_populates='saved_medicines')
     medicine = relationship('Medicine')
+    __table_args__ = (Index('uq_saved_medicines_user_medicine', 'user_id', 'medicine_id', unique=True),)
 
 class BlogPost(Base):
     __tablename__ = 'blog_posts'
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     content = Column(Text, nullable=False)
+    # Stored so post lists never load content (see app/api/blog.py)
+    excerpt = Column(String, default=lambda context: make_excerpt(context.get_current_parameters()['content']))
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
 
 class Kendra(Base):
     __tablename__ = 'kendras'
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     lat = Column(Float, nullable=False)
-    lng = Column(Float, nullable=False) 
\ No newline at end of file
+    lng = Column(Float, nullable=False)
+    # Bounding-box prefilter for nearest-kendra queries (see app/geo.py)
+    __table_args__ = (Index('ix_kendras_lat_lng', 'lat', 'lng'),) 
\ No newline at end of file
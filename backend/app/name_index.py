@@ -0,0 +1,304 @@
+import re
+import bisect
+import threading
+from array import array
+from itertools import chain, islice
+
+# --- Typo-tolerant Medicine Name Index ---
+# Names are split into tokens. Each distinct token is registered in a SymSpell-style
+# deletion dictionary (every variant of the token with up to N characters removed),
+# so a misspelt query token finds its candidates with a handful of dict lookups
+# instead of comparing against every name. The dictionary is keyed on variant
+# hashes, not strings; collisions only add candidates, which are verified by edit
+# distance anyway. Token postings then map the corrected tokens back to names, and
+# candidates are ranked by how many query tokens they cover and by their total
+# edit distance. Postings are kept shortest name first, and only a bounded number of
+# names is ever scored, so a query made of a very common token ("650") costs no more
+# than a rare one.
+
+_STRENGTH_MG = re.compile(r'(\d+(?:\.\d+)?)\s*mg\b')
+_NON_WORD = re.compile(r'[^a-z0-9.]+')
+
+MAX_PREFIX_EXPANSIONS = 32
+# At most this many names are scored per search
+MAX_SCORED_CANDIDATES = 256
+# When two common query tokens are intersected, this many postings of each are compared
+MAX_INTERSECTED_POSTINGS = 20 * MAX_SCORED_CANDIDATES
+
+
+def tokenize(name):
+    """
+    Lowercases a name and splits it into tokens: "Dolo-650mg" becomes ["dolo", "650"].
+    """
+    name = _STRENGTH_MG.sub(r'\1', name.lower())
+    return [token.strip('.') for token in _NON_WORD.sub(' ', name).split() if token.strip('.')]
+
+
+def max_edits_for(token):
+    """
+    Allowed typos per token: none for numbers and very short words, one for most words, two for long ones.
+    """
+    if token.isdigit() or len(token) < 3:
+        return 0
+    return 1 if len(token) < 8 else 2
+
+
+def edit_distance(a, b, max_distance):
+    """
+    Optimal string alignment (Damerau-Levenshtein) distance between `a` and `b`.
+    Returns max_distance + 1 as soon as the distance is known to exceed `max_distance`.
+    Only a diagonal band of width 2 * max_distance + 1 is computed.
+    """
+    if a == b:
+        return 0
+    # Shared prefixes and suffixes never contribute edits
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    # Keep one character of context so a transposition straddling the cut is still seen
+    start = max(start - 1, 0)
+    a, b = a[start:end_a + 1], b[start:end_b + 1]
+
+    too_far = max_distance + 1
+    if abs(len(a) - len(b)) > max_distance:
+        return too_far
+    previous_previous = None
+    previous = [j if j <= max_distance else too_far for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [too_far] * (len(b) + 1)
+        if i <= max_distance:
+            current[0] = i
+        row_minimum = current[0]
+        char_a = a[i - 1]
+        for j in range(max(1, i - max_distance), min(len(b), i + max_distance) + 1):
+            char_b = b[j - 1]
+            value = previous[j - 1] + (char_a != char_b)
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b and previous_previous[j - 2] + 1 < value:
+                value = previous_previous[j - 2] + 1
+            current[j] = value
+            if value < row_minimum:
+                row_minimum = value
+        if row_minimum > max_distance:
+            return too_far
+        previous_previous, previous = previous, current
+    return min(previous[-1], too_far)
+
+
+def _deletes(token, depth):
+    """
+    Every variant of `token` with up to `depth` characters removed, including the token itself.
+    """
+    variants = {token}
+    frontier = {token}
+    for _ in range(depth):
+        next_frontier = set()
+        for word in frontier:
+            for i in range(len(word)):
+                next_frontier.add(word[:i] + word[i + 1:])
+        variants |= next_frontier
+        frontier = next_frontier
+    return variants
+
+
+class NameIndex:
+    """
+    An in-memory index of medicine names supporting ranked, typo-tolerant search.
+    Each name is stored with an arbitrary `key` (a database id, a catalogue row, ...);
+    several names may share a key, e.g. a brand name and its generic name.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.keys = []
+        self._name_tokens = []
+        self._postings = {}
+        self._deletion_map = {}
+        self._sorted_vocabulary = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, key=None):
+        tokens = tuple(tokenize(name))
+        if not tokens:
+            return None
+        with self._lock:
+            name_id = len(self.names)
+            self.names.append(name)
+            self.keys.append(key if key is not None else name)
+            self._name_tokens.append(tokens)
+            for token in set(tokens):
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = array('I')
+                    self._register_deletes(token)
+                    self._sorted_vocabulary = None
+                # Names with fewer tokens first: when a posting list is cut short, the
+                # names kept are the ones that rank highest for a query of that token
+                if postings and len(self._name_tokens[postings[-1]]) > len(tokens):
+                    bisect.insort(postings, name_id, key=self._token_count)
+                else:
+                    postings.append(name_id)
+        return name_id
+
+    def search(self, query, limit=10, complete_prefixes=True):
+        """
+        Returns up to `limit` matches for `query`, best first. Each match is a dict with
+        'name', 'key', 'matched' (query tokens covered), 'distance' (total edits) and
+        'extra_tokens' (tokens of the name beyond the query's). Query tokens also match
+        the words they are a prefix of unless `complete_prefixes` is False.
+        """
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+
+        # Map each query token to the vocabulary tokens it may stand for, with their distance
+        token_candidates = [self._candidate_tokens(token, complete_prefixes) for token in query_tokens]
+        matched_candidates = [c for c in token_candidates if c]
+        if not matched_candidates:
+            return []
+
+        candidate_ids = self._candidate_names(matched_candidates)
+        scored = []
+        for name_id in candidate_ids:
+            name_tokens = self._name_tokens[name_id]
+            matched, distance = 0, 0
+            for candidates in matched_candidates:
+                best = min((candidates[t] for t in name_tokens if t in candidates), default=None)
+                if best is not None:
+                    matched += 1
+                    distance += best
+            extra_tokens = max(len(name_tokens) - len(query_tokens), 0)
+            scored.append((-matched, distance, extra_tokens, self.names[name_id], name_id))
+        scored.sort()
+
+        results, seen_keys = [], set()
+        for negative_matched, distance, extra_tokens, name, name_id in scored:
+            key = self.keys[name_id]
+            if key in seen_keys:
+                continue
+            seen_keys.add(key)
+            results.append({'name': name, 'key': key, 'matched': -negative_matched, 'distance': distance,
+                            'extra_tokens': extra_tokens})
+            if len(results) >= limit:
+                break
+        return results
+
+    def best_match(self, query):
+        """
+        Returns the top match only when it accounts for every token of `query`, else None.
+        """
+        results = self.search(query, limit=1)
+        if results and results[0]['matched'] == len(tokenize(query)):
+            return results[0]
+        return None
+
+    def correct(self, query):
+        """
+        Returns the match `query` is a misspelling of, or None. The match must spell out
+        every query token within its typo allowance and add no tokens of its own, and no
+        other name may be as close; completing a prefix ("croc" to "crocin") never counts.
+        """
+        token_count = len(tokenize(query))
+        results = self.search(query, limit=2, complete_prefixes=False)
+        if not results or results[0]['matched'] < token_count or results[0]['extra_tokens']:
+            return None
+        if len(results) > 1 and results[1]['matched'] == token_count and results[1]['distance'] == results[0]['distance']:
+            return None
+        return results[0]
+
+    def _candidate_names(self, matched_candidates):
+        """
+        Picks at most MAX_SCORED_CANDIDATES names to score: names containing the rarest
+        matched query token, preferring those that also contain the next rarest one,
+        then closer spellings, then shorter names.
+        """
+        by_rarity = sorted(matched_candidates, key=self._posting_count)
+        rarest = by_rarity[0]
+        # Closest spellings first; each posting list is already shortest name first
+        rarest_postings = [self._postings[token] for token in sorted(rarest, key=rarest.get)]
+
+        candidate_ids = set()
+        if len(by_rarity) > 1 and self._posting_count(rarest) > MAX_SCORED_CANDIDATES:
+            # Too many names share even the rarest token. Names that also contain the
+            # next rarest one outrank the rest, so those are found first, by a set
+            # intersection of the two tokens' postings (the shortest names of each).
+            runner_up = by_rarity[1]
+            runner_up_postings = [self._postings[token] for token in sorted(runner_up, key=runner_up.get)]
+            in_both = set(islice(chain.from_iterable(rarest_postings), MAX_INTERSECTED_POSTINGS)).intersection(
+                islice(chain.from_iterable(runner_up_postings), MAX_INTERSECTED_POSTINGS)
+            )
+            if len(in_both) > MAX_SCORED_CANDIDATES:
+                in_order = (name_id for name_id in chain.from_iterable(rarest_postings) if name_id in in_both)
+                candidate_ids.update(islice(in_order, MAX_SCORED_CANDIDATES))
+            else:
+                candidate_ids.update(in_both)
+
+        for postings in rarest_postings:
+            room = MAX_SCORED_CANDIDATES - len(candidate_ids)
+            if room <= 0:
+                break
+            candidate_ids.update(postings[:room])
+        return candidate_ids
+
+    def _posting_count(self, candidates):
+        return sum(len(self._postings[token]) for token in candidates)
+
+    def _token_count(self, name_id):
+        return len(self._name_tokens[name_id])
+
+    def _candidate_tokens(self, token, complete_prefixes=True):
+        max_edits = max_edits_for(token)
+        candidates = {}
+        if token in self._postings:
+            candidates[token] = 0
+        if max_edits:
+            for variant in _deletes(token, max_edits):
+                entry = self._deletion_map.get(hash(variant))
+                if entry is None:
+                    continue
+                for vocabulary_token in ((entry,) if isinstance(entry, str) else entry):
+                    if vocabulary_token not in candidates:
+                        distance = edit_distance(token, vocabulary_token, max_edits)
+                        if distance <= max_edits:
+                            candidates[vocabulary_token] = distance
+        # Tokens the user is still typing ("augm") count as one edit away from their completions
+        if complete_prefixes and len(token) >= 3 and not token.isdigit():
+            for vocabulary_token in self._prefix_completions(token):
+                candidates.setdefault(vocabulary_token, 1)
+        return candidates
+
+    def _register_deletes(self, token):
+        # A single token is stored as-is; a list is only allocated on the first collision
+        for variant in _deletes(token, max_edits_for(token)):
+            variant_hash = hash(variant)
+            entry = self._deletion_map.get(variant_hash)
+            if entry is None:
+                self._deletion_map[variant_hash] = token
+            elif isinstance(entry, str):
+                self._deletion_map[variant_hash] = [entry, token]
+            else:
+                entry.append(token)
+
+    def _prefix_completions(self, prefix):
+        vocabulary = self._sorted_vocabulary
+        if vocabulary is None:
+            with self._lock:
+                vocabulary = self._sorted_vocabulary = sorted(self._postings)
+        start = bisect.bisect_left(vocabulary, prefix)
+        completions = []
+        for token in vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not token.startswith(prefix):
+                break
+            if token != prefix:
+                completions.append(token)
+        return completions
@@ -0,0 +1,56 @@
+import re
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# --- Medicine Full-Text Search ---
+# On SQLite, an FTS5 table mirrors medicines.name and medicines.generic. It is an
+# external-content table, so it stores only the index, and triggers keep it in step
+# with every insert, update and delete. Queries are prefix matches on every word and
+# are ranked by bm25, with name hits weighted above generic hits.
+# On Postgres, trigram GIN indexes (pg_trgm) serve substring and similarity matches
+# on the same two columns, ranked by trigram similarity.
+# The index is created, and filled from the existing rows, by app/migrate.py.
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def like_pattern(q: str) -> str:
+    """
+    Builds a LIKE pattern matching `q` anywhere, with its wildcard characters escaped.
+    """
+    return "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def fts_query(q: str) -> str:
+    """
+    Turns user input into an FTS5 query matching every word as a prefix: 'dolo 65' -> '"dolo"* "65"*'.
+    """
+    return " ".join(f'"{word}"*' for word in _WORD.findall(q.lower()))
+
+
+def search_medicine_ids(db: Session, q: str, limit: int = 20, offset: int = 0):
+    """
+    Returns the ids of medicines whose name or generic name matches `q`, best match first.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        match = fts_query(q)
+        if not match:
+            return []
+        rows = db.execute(text(
+            "SELECT rowid FROM medicines_fts WHERE medicines_fts MATCH :match "
+            "ORDER BY bm25(medicines_fts, 10.0, 1.0) LIMIT :limit OFFSET :offset"
+        ), {"match": match, "limit": limit, "offset": offset})
+    elif dialect == "postgresql":
+        rows = db.execute(text(
+            "SELECT id FROM medicines "
+            "WHERE name ILIKE :pattern OR generic ILIKE :pattern OR name % :q OR generic % :q "
+            "ORDER BY GREATEST(similarity(name, :q), similarity(generic, :q)) DESC, id "
+            "LIMIT :limit OFFSET :offset"
+        ), {"q": q, "pattern": like_pattern(q), "limit": limit, "offset": offset})
+    else:
+        rows = db.execute(text(
+            "SELECT id FROM medicines WHERE lower(name) LIKE :pattern ESCAPE '\\' OR lower(generic) LIKE :pattern ESCAPE '\\' "
+            "ORDER BY id LIMIT :limit OFFSET :offset"
+        ), {"pattern": like_pattern(q.lower()), "limit": limit, "offset": offset})
+    return [row[0] for row in rows]
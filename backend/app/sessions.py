@@ -0,0 +1,100 @@
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import secrets
+from typing import Optional
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+# --- Session Tokens ---
+# Login verifies the password with bcrypt once and hands out a signed, stateless
+# token: base64url(JSON claims) + "." + base64url(HMAC-SHA256 of the claims). Later
+# requests send it as "Authorization: Bearer <token>" and are checked with one HMAC
+# and an expiry comparison, with no password hashing and no database lookup.
+# Tokens must verify in every worker and after restarts. Machines serving the same
+# users must share SESSION_SECRET; without it a secret is generated once and kept in
+# the file at SESSION_SECRET_PATH, which the workers of one machine share.
+
+SESSION_TTL = int(os.getenv("SESSION_TTL", 12 * 3600))
+SESSION_SECRET_PATH = os.getenv(
+    "SESSION_SECRET_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "session_secret")
+)
+
+
+def persisted_secret(path: str) -> str:
+    """
+    Returns the secret stored in the file at `path`, creating the file on first use.
+    """
+    if not os.path.exists(path):
+        # Written aside and linked into place, so concurrent workers agree on one secret
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(secrets.token_hex(32))
+        os.chmod(temp_path, 0o600)
+        try:
+            os.link(temp_path, path)
+            print(f"Generated a new session secret in {path}")
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(temp_path)
+    with open(path) as f:
+        return f.read().strip()
+
+
+SESSION_SECRET = (os.getenv("SESSION_SECRET") or persisted_secret(SESSION_SECRET_PATH)).encode('utf-8')
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(SESSION_SECRET, payload.encode('ascii'), hashlib.sha256).digest())
+
+
+def issue_token(user_id: int, username: str, ttl: int = SESSION_TTL) -> str:
+    """
+    Returns a token for the user that expires after `ttl` seconds.
+    """
+    claims = {"uid": user_id, "sub": username, "exp": int(time.time()) + ttl}
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+    return f"{payload}.{_sign(payload)}"
+
+
+def read_token(token: str) -> Optional[dict]:
+    """
+    Returns the claims of a valid, unexpired token, or None.
+    """
+    payload, _, signature = token.partition('.')
+    # Tokens are ASCII; anything else is forged or mangled
+    if not signature or not token.isascii() or not hmac.compare_digest(signature, _sign(payload)):
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    if claims.get("exp", 0) <= time.time():
+        return None
+    return claims
+
+
+def current_session(credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)) -> dict:
+    """
+    FastAPI dependency returning the claims of the request's bearer token; 401 without a valid one.
+    """
+    claims = read_token(credentials.credentials) if credentials else None
+    if claims is None:
+        raise HTTPException(
+            status_code=401, detail="Not logged in or session expired", headers={"WWW-Authenticate": "Bearer"}
+        )
+    return claims
@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+
+# --- Database Throughput Benchmark ---
+# Runs a mixed workload against a scratch copy of the database: reader threads do
+# medicine searches (full-text lookup plus row fetch) through read sessions while
+# writer threads add blog posts through write sessions. Reports operations per
+# second, latency percentiles and lock errors for each side, using the engine
+# settings app/db.py builds from the environment.
+#
+#     python bench_db.py --seconds 10 --readers 4 --writers 1 --medicines 50000
+
+SEARCH_TERMS = ['para', 'ibu', 'ceti', 'amox', 'azi', 'met', 'panto', 'dolo', 'aceta', 'vita']
+
+
+def prepare_database(source, medicines):
+    """
+    Copies `source` to a temporary file, pads its medicines table to `medicines` rows
+    and points DATABASE_URL at the copy. Returns the copy's path.
+    """
+    directory = tempfile.mkdtemp(prefix="bench_db_")
+    path = os.path.join(directory, "bench.sqlite3")
+    shutil.copy(source, path)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    import sqlite3
+    connection = sqlite3.connect(path)
+    existing = connection.execute("SELECT COUNT(*) FROM medicines").fetchone()[0]
+    rows = (
+        (f"{random.choice(SEARCH_TERMS).title()}{i} {random.choice(['250', '500', '650'])}",
+         f"{random.choice(SEARCH_TERMS).title()}generic {i % 997}", f"Company {i % 300}", round(random.uniform(5, 500), 2))
+        for i in range(max(0, medicines - existing))
+    )
+    connection.executemany("INSERT INTO medicines (name, generic, company, price) VALUES (?, ?, ?, ?)", rows)
+    connection.commit()
+    connection.close()
+    return path
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(seconds, readers, writers):
+    # Imported only after DATABASE_URL points at the scratch copy
+    from app.db import SessionLocal, ReadSessionLocal
+    from app.migrate import migrate
+    from app.models import BlogPost, Medicine
+    from app.search import search_medicine_ids
+
+    stop = time.perf_counter() + seconds
+    results = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0}
+    lock = threading.Lock()
+
+    def read_loop():
+        latencies, failed = [], 0
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            db = ReadSessionLocal()
+            try:
+                ids = search_medicine_ids(db, random.choice(SEARCH_TERMS), limit=20)
+                db.query(Medicine).filter(Medicine.id.in_(ids)).all()
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                failed += 1
+            finally:
+                db.close()
+        with lock:
+            results['read'] += latencies
+            errors['read'] += failed
+
+    def write_loop():
+        latencies, failed = [], 0
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            db = SessionLocal()
+            try:
+                db.add(BlogPost(title="Benchmark post", content="x" * 500))
+                db.commit()
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                db.rollback()
+                failed += 1
+            finally:
+                db.close()
+        with lock:
+            results['write'] += latencies
+            errors['write'] += failed
+
+    # Build the search index before timing starts
+    migrate()
+
+    threads = [threading.Thread(target=read_loop) for _ in range(readers)]
+    threads += [threading.Thread(target=write_loop) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"--- {seconds}s, {readers} readers, {writers} writers ---")
+    for kind in ('read', 'write'):
+        samples = results[kind]
+        print(f"{kind:>5}: {len(samples) / seconds:8,.0f} ops/s   "
+              f"p50 {percentile(samples, 0.5) * 1000:6.1f} ms   p95 {percentile(samples, 0.95) * 1000:6.1f} ms   "
+              f"errors {errors[kind]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark database throughput with a mixed read/write workload.")
+    parser.add_argument('--database', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "medicine_db.sqlite3"),
+                        help="SQLite database to copy (default: medicine_db.sqlite3)")
+    parser.add_argument('--medicines', type=int, default=50000, help="Pad the copy to this many medicines (default: 50000)")
+    parser.add_argument('--seconds', type=float, default=10, help="Duration (default: 10)")
+    parser.add_argument('--readers', type=int, default=4, help="Reader threads (default: 4)")
+    parser.add_argument('--writers', type=int, default=1, help="Writer threads (default: 1)")
+    args = parser.parse_args(argv)
+
+    path = prepare_database(args.database, args.medicines)
+    try:
+        run(args.seconds, args.readers, args.writers)
+    finally:
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
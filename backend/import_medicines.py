@@ -0,0 +1,245 @@
+import os
+import re
+import csv
+import time
+import argparse
+from itertools import islice
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
+from app.db import engine
+from app.models import Medicine
+
+# --- Bulk Medicine Import ---
+# Streams a Brand/Constituents/Manufacturer/Price CSV into the medicines table in
+# chunks. Each chunk is upserted with one executemany of INSERT ... ON CONFLICT on
+# (name, company), so duplicates are resolved by the database rather than by a
+# lookup per row, and memory stays bounded by the chunk size. Rows whose generic
+# name and price are unchanged are left untouched, so a re-import does not rewrite
+# (and re-index) them. On an initial load into an empty SQLite table, secondary
+# indexes and triggers are dropped for the load and rebuilt in one pass afterwards,
+# which is much cheaper than maintaining them row by row.
+#
+#     python import_medicines.py ../data/india_drugs_raw.csv.txt --chunk-size 50000
+
+DEFAULT_CHUNK_SIZE = 50000
+# The catalogue CSV the Flask app loads, when the repository is checked out in full
+DEFAULT_CATALOGUE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "india_drugs_raw.csv.txt")
+
+medicines = Medicine.__table__
+COLUMNS = ('name', 'generic', 'company', 'price')
+
+SQLITE_UPSERT = """
+    INSERT INTO medicines (name, generic, company, price) VALUES (?, ?, ?, ?)
+    ON CONFLICT (name, company) DO UPDATE SET generic = excluded.generic, price = excluded.price
+    WHERE medicines.generic IS NOT excluded.generic OR medicines.price IS NOT excluded.price
+"""
+# Page cache for the import connection, in KiB; index pages of a large table must stay hot
+SQLITE_IMPORT_CACHE_KIB = 256 * 1024
+
+# Repoints saved medicines at the oldest copy of a duplicated medicine, then drops the copies.
+# A user who saved several copies keeps only the save of the oldest one, so that
+# (user_id, medicine_id) stays unique once they are repointed.
+DEDUPLICATE_MEDICINES = [
+    """
+    DELETE FROM saved_medicines
+    WHERE medicine_id IN (
+        SELECT m1.id FROM medicines m1
+        JOIN medicines m2 ON m2.name = m1.name AND m2.company = m1.company AND m2.id < m1.id
+    )
+    AND EXISTS (
+        SELECT 1 FROM medicines m1
+        JOIN medicines m2 ON m2.name = m1.name AND m2.company = m1.company
+        JOIN saved_medicines s2 ON s2.medicine_id = m2.id AND s2.user_id = saved_medicines.user_id
+        WHERE m1.id = saved_medicines.medicine_id
+        AND (m2.id < m1.id OR (m2.id = m1.id AND s2.id < saved_medicines.id))
+    )
+    """,
+    """
+    UPDATE saved_medicines SET medicine_id = (
+        SELECT MIN(m2.id) FROM medicines m1
+        JOIN medicines m2 ON m2.name = m1.name AND m2.company = m1.company
+        WHERE m1.id = saved_medicines.medicine_id
+    )
+    WHERE medicine_id IN (
+        SELECT m1.id FROM medicines m1
+        JOIN medicines m2 ON m2.name = m1.name AND m2.company = m1.company AND m2.id < m1.id
+    )
+    """,
+    """
+    DELETE FROM medicines WHERE id IN (
+        SELECT m1.id FROM medicines m1
+        JOIN medicines m2 ON m2.name = m1.name AND m2.company = m1.company AND m2.id < m1.id
+    )
+    """,
+]
+
+
+def parse_price(price):
+    """
+    Parses a Price cell such as "30.10", "₹1,250" or "" into a float, or None.
+    """
+    try:
+        return float(price)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return float(str(price).replace(',', '').replace('₹', '').strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def read_rows(path):
+    """
+    Yields (name, generic, company, price) tuples from the CSV at `path`, skipping rows
+    without a brand or constituents. Constituents are normalized to "A 500mg + B 10mg".
+    """
+    # A national list repeats a few thousand compositions across many brands, so each
+    # distinct Constituents cell is normalized once
+    generics = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        try:
+            name_at, constituents_at = header.index('Brand'), header.index('Constituents')
+        except ValueError:
+            raise ValueError(f"{path} needs Brand and Constituents columns") from None
+        company_at = header.index('Manufacturer') if 'Manufacturer' in header else None
+        price_at = header.index('Price') if 'Price' in header else None
+        width = len(header)
+        for row in reader:
+            if len(row) < width:
+                row += [''] * (width - len(row))
+            name = row[name_at].strip()
+            constituents = row[constituents_at]
+            generic = generics.get(constituents)
+            if generic is None:
+                # Ingredients are joined the way the Flask app's catalogue.py splits them
+                generic = generics[constituents] = " + ".join(
+                    part.strip() for part in re.split(r'\s*[+,]\s*', constituents) if part.strip()
+                )
+            if not name or not generic:
+                continue
+            yield (
+                name,
+                generic,
+                row[company_at].strip() if company_at is not None else '',
+                parse_price(row[price_at]) if price_at is not None else None,
+            )
+
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def ensure_unique_key(conn):
+    """
+    Adds the unique (name, company) index that ON CONFLICT relies on, merging any
+    duplicate rows already in the table first.
+    """
+    indexes = {index['name'] for index in inspect(conn).get_indexes('medicines')}
+    if 'uq_medicines_name_company' in indexes:
+        return
+    for statement in DEDUPLICATE_MEDICINES:
+        conn.execute(text(statement))
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_medicines_name_company ON medicines (name, company)"))
+
+
+def upsert_statement(dialect_name):
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    statement = insert(medicines)
+    return statement.on_conflict_do_update(
+        index_elements=['name', 'company'],
+        set_={'generic': statement.excluded.generic, 'price': statement.excluded.price},
+        where=(medicines.c.generic.is_distinct_from(statement.excluded.generic)
+               | medicines.c.price.is_distinct_from(statement.excluded.price))
+    )
+
+
+def upsert_chunk(conn, statement, rows):
+    """
+    Upserts a chunk of (name, generic, company, price) tuples with one executemany.
+    """
+    if conn.dialect.name == "sqlite":
+        # Plain tuples straight to the driver: SQLAlchemy's per-row parameter
+        # processing would otherwise cost more than the inserts themselves
+        conn.exec_driver_sql(SQLITE_UPSERT, rows)
+    else:
+        conn.execute(statement, [dict(zip(COLUMNS, row)) for row in rows])
+
+
+def defer_sqlite_indexes():
+    """
+    Drops the medicines table's secondary indexes and triggers when the table is empty,
+    returning their definitions for restore_sqlite_indexes(). The unique key stays.
+    """
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT 1 FROM medicines LIMIT 1")).first():
+            return []
+        deferred = conn.execute(text(
+            "SELECT type, name, sql FROM sqlite_master WHERE tbl_name = 'medicines' "
+            "AND type IN ('index', 'trigger') AND sql IS NOT NULL AND name != 'uq_medicines_name_company'"
+        )).all()
+        for kind, name, _ in deferred:
+            conn.execute(text(f'DROP {kind.upper()} "{name}"'))
+    return deferred
+
+
+def restore_sqlite_indexes(deferred):
+    """
+    Recreates indexes and triggers dropped by defer_sqlite_indexes(), rebuilding the
+    full-text index if its sync triggers were among them.
+    """
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        for _, _, sql in deferred:
+            conn.execute(text(sql))
+        if any(kind == 'trigger' and name.startswith('medicines_fts') for kind, name, _ in deferred):
+            conn.execute(text("INSERT INTO medicines_fts(medicines_fts) VALUES ('rebuild')"))
+    print(f"Rebuilt {len(deferred)} indexes and triggers in {time.perf_counter() - started:.1f}s")
+
+
+def import_medicines(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Upserts every row of the CSV at `path`, one transaction per chunk. Returns the number of rows read.
+    """
+    if engine.dialect.name not in ("sqlite", "postgresql"):
+        raise ValueError(f"Bulk import does not support the '{engine.dialect.name}' database")
+    with engine.begin() as conn:
+        medicines.create(conn, checkfirst=True)
+        ensure_unique_key(conn)
+    statement = upsert_statement(engine.dialect.name)
+
+    deferred = defer_sqlite_indexes() if engine.dialect.name == "sqlite" else []
+    total, started = 0, time.perf_counter()
+    try:
+        for chunk in chunks(read_rows(path), chunk_size):
+            # A statement may not update the same row twice (Postgres), so the last row per key wins
+            unique_rows = list({(row[0], row[2]): row for row in chunk}.values())
+            with engine.begin() as conn:
+                if engine.dialect.name == "sqlite":
+                    conn.exec_driver_sql(f"PRAGMA cache_size = -{SQLITE_IMPORT_CACHE_KIB}")
+                upsert_chunk(conn, statement, unique_rows)
+            total += len(chunk)
+            elapsed = time.perf_counter() - started
+            print(f"Imported {total} rows ({total / elapsed:,.0f} rows/s)")
+    finally:
+        if deferred:
+            restore_sqlite_indexes(deferred)
+
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed else 0
+    print(f"Finished: {total} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import medicines from a Brand/Constituents/Manufacturer/Price CSV.")
+    parser.add_argument('path', nargs='?', default=DEFAULT_CATALOGUE_PATH, help="CSV file (default: the bundled catalogue)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help=f"Rows per transaction (default: {DEFAULT_CHUNK_SIZE})")
+    args = parser.parse_args()
+    import_medicines(args.path, args.chunk_size)
@@ -1,7 +1,9 @@
 from app.db import SessionLocal, engine
+from app.migrate import migrate
 from app.models import Medicine, Kendra, BlogPost
 
 def seed():
+    migrate()
     db = SessionLocal()
     # Medicines
     medicines = [
@@ -0,0 +1,60 @@
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# app/db.py builds its engines on import, so the scratch database is chosen first
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='backend_tests_'), 'test.sqlite3')}"
+os.environ.setdefault("SESSION_SECRET", "test-secret")
+os.environ.pop("DATABASE_READ_URL", None)
+# The backend is imported as the `app` package from backend/, as uvicorn runs it
+sys.path.insert(0, BACKEND_DIR)
+
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+
+from app.api import users
+from app.main import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    # Entering the client runs the startup migrations
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(autouse=True)
+def fast_password_hashing(monkeypatch):
+    # bcrypt is slow by design; hashing scheme is not what these tests are about
+    monkeypatch.setattr(users, "pwd_context", CryptContext(schemes=["pbkdf2_sha256"]))
+
+
+@pytest.fixture
+def make_user(client):
+    """
+    Registers and logs in a new user; returns (username, Authorization headers).
+    """
+    def make():
+        username = f"user-{uuid.uuid4().hex[:8]}"
+        assert client.post("/users/register", json={"username": username, "password": "secret"}).status_code == 200
+        token = client.post("/users/login", json={"username": username, "password": "secret"}).json()["access_token"]
+        return username, {"Authorization": f"Bearer {token}"}
+    return make
+
+
+@pytest.fixture
+def make_medicines(client):
+    """
+    Adds medicines named after the given names, with a unique company; returns their ids.
+    """
+    def make(*names, generic="Paracetamol"):
+        company = f"Company {uuid.uuid4().hex[:8]}"
+        return [
+            client.post("/medicines/", json={"name": name, "generic": generic, "company": company, "price": 10.0}).json()["id"]
+            for name in names
+        ]
+    return make
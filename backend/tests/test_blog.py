@@ -0,0 +1,54 @@
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+
+def create_posts(client, count):
+    return [
+        client.post("/blog/", json={"title": f"Post {n}", "content": f"Body of post {n}. " * 40}).json()["id"]
+        for n in range(count)
+    ]
+
+
+def test_list_pages_by_cursor_newest_first(client):
+    ids = create_posts(client, 5)
+    seen, cursor = [], ids[-1] + 1
+    while cursor is not None and cursor > ids[0]:
+        page = client.get("/blog/", params={"limit": 2, "before": cursor}).json()
+        assert len(page["posts"]) <= 2
+        seen += [post["id"] for post in page["posts"]]
+        cursor = page["next_cursor"]
+    assert seen[:5] == ids[::-1]
+
+
+def test_list_carries_excerpts_not_content(client):
+    post_id = create_posts(client, 1)[0]
+    post = client.get("/blog/", params={"limit": 1, "before": post_id + 1}).json()["posts"][0]
+    assert "content" not in post
+    assert post["excerpt"].startswith("Body of post 0.") and post["excerpt"].endswith("…")
+    assert client.get(f"/blog/{post_id}").json()["content"].startswith(post["excerpt"][:-1])
+
+
+def test_unchanged_post_revalidates_with_304(client):
+    post_id = create_posts(client, 1)[0]
+    response = client.get(f"/blog/{post_id}")
+    etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+
+    assert client.get(f"/blog/{post_id}", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"/blog/{post_id}", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert client.get(f"/blog/{post_id}", headers={"If-None-Match": '"stale"'}).status_code == 200
+    assert client.get(f"/blog/{post_id}", headers={"If-Modified-Since": last_modified}).status_code == 304
+
+
+def test_if_modified_since_accepts_any_utc_form(client):
+    post_id = create_posts(client, 1)[0]
+    later = datetime.now(timezone.utc) + timedelta(minutes=1)
+    # "-0000" dates parse without a timezone
+    naive = format_datetime(later).replace("+0000", "-0000")
+    assert client.get(f"/blog/{post_id}", headers={"If-Modified-Since": naive}).status_code == 304
+    earlier = format_datetime(later - timedelta(days=1), usegmt=True)
+    assert client.get(f"/blog/{post_id}", headers={"If-Modified-Since": earlier}).status_code == 200
+    assert client.get(f"/blog/{post_id}", headers={"If-Modified-Since": "not a date"}).status_code == 200
+
+
+def test_missing_post_is_404(client):
+    assert client.get("/blog/999999999").status_code == 404
@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+import import_medicines
+from app.migrate import migrate
+
+CSV = """Brand,Constituents,Manufacturer,Price
+Dolokind 650,"Paracetamol (650mg)",Kind Labs,30.10
+Ibutrix,"Ibuprofen (400mg)+ Paracetamol (325mg)",Trix Pharma,"₹1,250"
+,Orphan (5mg),Nobody,1
+Blankgen,,Nobody,1
+Cetrizal,"Cetirizine (10mg)",Zal Labs,
+"""
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'import.sqlite3'}")
+    monkeypatch.setattr(import_medicines, "engine", engine)
+    return engine
+
+
+def write_csv(tmp_path, content=CSV):
+    path = tmp_path / "catalogue.csv"
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+def medicines(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT name, generic, company, price FROM medicines ORDER BY name")).all()
+
+
+def fts_names(engine, match):
+    with engine.connect() as conn:
+        return sorted(row[0] for row in conn.execute(text(
+            "SELECT m.name FROM medicines_fts f JOIN medicines m ON m.id = f.rowid WHERE medicines_fts MATCH :match"
+        ), {"match": match}))
+
+
+def test_import_normalizes_rows_and_rebuilds_search(tmp_path, engine):
+    migrate(engine)
+    assert import_medicines.import_medicines(write_csv(tmp_path), chunk_size=2) == 3
+    assert medicines(engine) == [
+        ("Cetrizal", "Cetirizine (10mg)", "Zal Labs", None),
+        ("Dolokind 650", "Paracetamol (650mg)", "Kind Labs", 30.1),
+        ("Ibutrix", "Ibuprofen (400mg) + Paracetamol (325mg)", "Trix Pharma", 1250.0),
+    ]
+    # The full-text index and its triggers were dropped for the load and are back
+    assert fts_names(engine, '"paracet"*') == ["Dolokind 650", "Ibutrix"]
+    with engine.connect() as conn:
+        triggers = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'"))}
+    assert {"medicines_fts_insert", "medicines_fts_update", "medicines_fts_delete"} <= triggers
+
+
+def test_reimport_updates_in_place(tmp_path, engine):
+    migrate(engine)
+    import_medicines.import_medicines(write_csv(tmp_path))
+    changed = CSV.replace("30.10", "32.00").replace("Cetirizine (10mg)", "Levocetirizine (5mg)")
+    import_medicines.import_medicines(write_csv(tmp_path, changed))
+
+    rows = medicines(engine)
+    assert len(rows) == 3
+    assert ("Dolokind 650", "Paracetamol (650mg)", "Kind Labs", 32.0) in rows
+    # Updated rows stay searchable through the sync triggers
+    assert fts_names(engine, '"levocet"*') == ["Cetrizal"]
+    assert fts_names(engine, '"cetirizine"*') == []
+
+
+def test_import_merges_duplicates_in_an_old_database(tmp_path, engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE medicines (id INTEGER PRIMARY KEY, name VARCHAR, generic VARCHAR, company VARCHAR, price FLOAT)"))
+        conn.execute(text("""INSERT INTO medicines VALUES
+            (1, 'Dolokind 650', 'Paracetamol', 'Kind Labs', 30),
+            (2, 'Dolokind 650', 'Paracetamol', 'Kind Labs', 30),
+            (3, 'Dolokind 650', 'Paracetamol', 'Kind Labs', 30)"""))
+    migrate(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username, hashed_password) VALUES (1, 'asha', 'x'), (2, 'ravi', 'x')"))
+        # asha saved the newer copies before the oldest; ravi saved one newer copy only
+        conn.execute(text("INSERT INTO saved_medicines (id, user_id, medicine_id) VALUES (1, 1, 3), (2, 1, 2), (3, 1, 1), (4, 2, 3)"))
+
+    import_medicines.import_medicines(write_csv(tmp_path))
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT id FROM medicines WHERE name = 'Dolokind 650'")).all() == [(1,)]
+        saved = conn.execute(text("SELECT user_id, medicine_id FROM saved_medicines ORDER BY user_id")).all()
+    assert saved == [(1, 1), (2, 1)]
+    assert ("Dolokind 650", "Paracetamol (650mg)", "Kind Labs", 30.1) in medicines(engine)
+
+
+def test_parse_price():
+    assert import_medicines.parse_price("30.10") == 30.1
+    assert import_medicines.parse_price("₹1,250") == 1250.0
+    assert import_medicines.parse_price("") is None
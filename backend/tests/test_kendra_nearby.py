@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from app.db import SessionLocal
+from app.geo import bounding_boxes, haversine_km
+from app.models import Kendra
+
+
+@pytest.fixture(scope="module")
+def scattered_kendras(client):
+    rng = random.Random(24)
+    # Clusters around Delhi, near the antimeridian and near the north pole, plus a global scatter
+    points = [(28.6 + rng.uniform(-1, 1), 77.2 + rng.uniform(-1, 1)) for _ in range(150)]
+    points += [(rng.uniform(-20, -10), rng.choice([-1, 1]) * rng.uniform(175, 180)) for _ in range(60)]
+    points += [(rng.uniform(85, 90), rng.uniform(-180, 180)) for _ in range(30)]
+    points += [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(60)]
+    for n, (lat, lng) in enumerate(points):
+        assert client.post("/kendra/", json={"name": f"Scatter {n}", "lat": lat, "lng": lng}).status_code == 200
+
+
+def brute_force(lat, lng, k, radius_km=None):
+    with SessionLocal() as db:
+        kendras = db.query(Kendra.id, Kendra.lat, Kendra.lng).all()
+    distances = sorted(round(haversine_km(lat, lng, kendra.lat, kendra.lng), 3) for kendra in kendras)
+    if radius_km is not None:
+        distances = [d for d in distances if d <= radius_km]
+    return distances[:k]
+
+
+@pytest.mark.parametrize("lat, lng", [(28.6, 77.2), (-15, 179.9), (-15, -179.9), (89.5, 10), (0, 0), (-60, -120)])
+@pytest.mark.parametrize("k", [1, 5, 40])
+def test_nearby_matches_a_full_scan(client, scattered_kendras, lat, lng, k):
+    kendras = client.get("/kendra/nearby", params={"lat": lat, "lng": lng, "k": k}).json()["kendras"]
+    assert [kendra["distance_km"] for kendra in kendras] == brute_force(lat, lng, k)
+
+
+@pytest.mark.parametrize("lat, lng, radius_km", [(28.6, 77.2, 50), (-15, 180, 400), (89.5, 10, 300)])
+def test_nearby_within_a_radius(client, scattered_kendras, lat, lng, radius_km):
+    body = client.get("/kendra/nearby", params={"lat": lat, "lng": lng, "k": 100, "radius_km": radius_km}).json()
+    assert body["radius_km"] == radius_km
+    assert [kendra["distance_km"] for kendra in body["kendras"]] == brute_force(lat, lng, 100, radius_km)
+
+
+def test_nearby_rejects_out_of_range_points(client):
+    assert client.get("/kendra/nearby", params={"lat": 91, "lng": 0}).status_code == 422
+    assert client.get("/kendra/nearby", params={"lat": 0, "lng": 0, "k": 0}).status_code == 422
+
+
+def test_boxes_split_at_the_antimeridian():
+    boxes = bounding_boxes(0, 179.5, 200)
+    assert len(boxes) == 2
+    assert boxes[0][3] == 180.0 and boxes[1][2] == -180.0
+    assert boxes[0][2] < 179.5 and -180 < boxes[1][3] < -178
+
+
+def test_boxes_span_every_longitude_at_a_pole():
+    assert bounding_boxes(89.9, 45, 100) == [(pytest.approx(89.9 - 100 / 6371 * 57.29578), 90.0, -180.0, 180.0)]
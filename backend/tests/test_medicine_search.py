@@ -0,0 +1,66 @@
+from app.db import SessionLocal
+from app.models import Medicine
+
+
+def test_search_matches_word_prefixes_best_first(client, make_medicines):
+    make_medicines("Zentorin 500", "Zentorax Plus", generic="Zentorin")
+    results = client.get("/medicines/search", params={"q": "zento"}).json()["results"]
+    assert {r["name"] for r in results} == {"Zentorin 500", "Zentorax Plus"}
+
+    # Name hits rank above generic-only hits
+    results = client.get("/medicines/search", params={"q": "zentorin"}).json()["results"]
+    assert [r["name"] for r in results] == ["Zentorin 500", "Zentorax Plus"]
+
+
+def test_search_pages_with_next_offset(client, make_medicines):
+    ids = make_medicines(*(f"Pagitrol {strength}" for strength in (100, 200, 300, 400, 500)))
+    first = client.get("/medicines/search", params={"q": "pagitrol", "limit": 2}).json()
+    assert len(first["results"]) == 2 and first["next_offset"] == 2
+
+    seen = [r["id"] for r in first["results"]]
+    offset = first["next_offset"]
+    while offset is not None:
+        page = client.get("/medicines/search", params={"q": "pagitrol", "limit": 2, "offset": offset}).json()
+        seen += [r["id"] for r in page["results"]]
+        offset = page["next_offset"]
+    assert sorted(seen) == sorted(ids)
+
+
+def test_search_falls_back_to_typo_correction(client, make_medicines):
+    make_medicines("Montelukast Fortivex")
+    results = client.get("/medicines/search", params={"q": "fotrivex"}).json()["results"]
+    assert [r["name"] for r in results] == ["Montelukast Fortivex"]
+
+    # Later pages never fall back
+    assert client.get("/medicines/search", params={"q": "fotrivex", "offset": 20}).json()["results"] == []
+
+
+def test_search_ignores_query_syntax(client):
+    response = client.get("/medicines/search", params={"q": '"* OR -'})
+    assert response.status_code == 200
+
+
+def test_generic_lists_every_brand(client, make_medicines):
+    make_medicines("Genbrand A", "Genbrand B", generic="Glimveratide 2mg")
+    body = client.get("/medicines/generic", params={"name": "genbrand"}).json()
+    assert body["generic"] == "Glimveratide 2mg"
+    assert {b["name"] for b in body["brands"]} == {"Genbrand A", "Genbrand B"}
+    assert client.get("/medicines/generic", params={"name": "nothingcalledthis"}).status_code == 404
+
+
+def test_duplicate_medicine_is_a_conflict(client):
+    medicine = {"name": "Duplicol 5", "generic": "Duplicol", "company": "Duplicate Labs", "price": 3.0}
+    assert client.post("/medicines/", json=medicine).status_code == 200
+    response = client.post("/medicines/", json=medicine)
+    assert response.status_code == 409
+    # The session is usable again after the failed insert
+    assert client.post("/medicines/", json={**medicine, "company": "Other Labs"}).status_code == 200
+
+
+def test_typo_fallback_sees_rows_written_elsewhere(client):
+    # As another worker or import_medicines.py would, bypassing this worker's routes
+    with SessionLocal() as db:
+        db.add(Medicine(name="Quetravil Forte", generic="Quetravil", company="Elsewhere Labs", price=1.0))
+        db.commit()
+    results = client.get("/medicines/search", params={"q": "quetrvail"}).json()["results"]
+    assert [r["name"] for r in results] == ["Quetravil Forte"]
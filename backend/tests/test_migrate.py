@@ -0,0 +1,49 @@
+from sqlalchemy import create_engine, inspect, text
+
+from app.migrate import migrate
+
+# The tables as databases created before app/migrate.py have them
+OLD_SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR UNIQUE, hashed_password VARCHAR)",
+    "CREATE TABLE medicines (id INTEGER PRIMARY KEY, name VARCHAR, generic VARCHAR, company VARCHAR, price FLOAT)",
+    "CREATE TABLE saved_medicines (id INTEGER PRIMARY KEY, user_id INTEGER, medicine_id INTEGER)",
+    "CREATE TABLE blog_posts (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, content TEXT NOT NULL)",
+    "CREATE TABLE kendras (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, lat FLOAT NOT NULL, lng FLOAT NOT NULL)",
+    "INSERT INTO users VALUES (1, 'asha', 'x')",
+    "INSERT INTO medicines VALUES (1, 'Paracetamol', 'Paracetamol', 'Acme', 10.0)",
+    "INSERT INTO saved_medicines VALUES (1, 1, 1), (2, 1, 1)",
+    "INSERT INTO blog_posts VALUES (1, 'Hello', 'An old post')",
+    "INSERT INTO kendras VALUES (1, 'Kendra 1', 28.6139, 77.209)",
+]
+
+
+def test_migrate_upgrades_an_old_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.sqlite3'}")
+    with engine.begin() as conn:
+        for statement in OLD_SCHEMA:
+            conn.execute(text(statement))
+
+    migrate(engine)
+    # Every step checks first, so running again changes nothing
+    migrate(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT excerpt FROM blog_posts")).scalar() == "An old post"
+        assert conn.execute(text("SELECT updated_at FROM blog_posts")).scalar() is not None
+        assert conn.execute(text("SELECT COUNT(*) FROM saved_medicines")).scalar() == 1
+        assert conn.execute(text("SELECT rowid FROM medicines_fts WHERE medicines_fts MATCH 'parac*'")).all() == [(1,)]
+        assert conn.execute(text("SELECT id FROM kendras_rtree")).all() == [(1,)]
+    indexes = {index['name'] for index in inspect(engine).get_indexes('saved_medicines')}
+    assert 'uq_saved_medicines_user_medicine' in indexes
+
+
+def test_indexes_follow_later_writes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'new.sqlite3'}")
+    migrate(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO medicines (name, generic, company, price) VALUES ('Ibuprofen', 'Ibuprofen', 'Acme', 5)"))
+        conn.execute(text("INSERT INTO kendras (name, lat, lng) VALUES ('Kendra 2', 19.07, 72.87)"))
+        conn.execute(text("UPDATE kendras SET lat = 19.0"))
+    with engine.connect() as conn:
+        assert len(conn.execute(text("SELECT rowid FROM medicines_fts WHERE medicines_fts MATCH 'ibu*'")).all()) == 1
+        assert conn.execute(text("SELECT min_lat FROM kendras_rtree")).scalar() == 19.0
@@ -0,0 +1,51 @@
+def saved_names(client, username, headers, **params):
+    return [m["name"] for m in client.get(f"/users/saved/{username}", headers=headers, params=params).json()["saved"]]
+
+
+def test_batch_saves_by_name_once(client, make_user, make_medicines):
+    make_medicines("Savolin 10", "Savolin 20")
+    username, headers = make_user()
+
+    response = client.post("/users/saved/batch", headers=headers, json={"save_names": ["Savolin 10", "Savolin 20", "Unknown"]})
+    assert response.json() == {"saved": 2, "removed": 0}
+    # Saving again is a no-op, not a duplicate
+    response = client.post("/users/saved/batch", headers=headers, json={"save_names": ["Savolin 10"]})
+    assert response.json() == {"saved": 0, "removed": 0}
+    assert saved_names(client, username, headers) == ["Savolin 10", "Savolin 20"]
+
+
+def test_batch_removes_by_name_and_id(client, make_user, make_medicines):
+    first, second, third = make_medicines("Remolin 1", "Remolin 2", "Remolin 3")
+    username, headers = make_user()
+    client.post("/users/saved/batch", headers=headers, json={"save": [first, second, third]})
+
+    response = client.post("/users/saved/batch", headers=headers, json={"remove": [first], "remove_names": ["Remolin 3"]})
+    assert response.json() == {"saved": 0, "removed": 2}
+    assert saved_names(client, username, headers) == ["Remolin 2"]
+
+
+def test_batch_replace_keeps_only_listed(client, make_user, make_medicines):
+    make_medicines("Replix 1", "Replix 2")
+    username, headers = make_user()
+    client.post("/users/saved/batch", headers=headers, json={"save_names": ["Replix 1"]})
+
+    response = client.post("/users/saved/batch", headers=headers, json={"save_names": ["Replix 2"], "replace": True})
+    assert response.json() == {"saved": 1, "removed": 1}
+    assert saved_names(client, username, headers) == ["Replix 2"]
+
+
+def test_saved_list_pages(client, make_user, make_medicines):
+    ids = make_medicines(*(f"Pagesave {n}" for n in range(5)))
+    username, headers = make_user()
+    for medicine_id in ids:
+        assert client.post("/users/save", headers=headers, json={"medicine_id": medicine_id}).status_code == 200
+
+    page = client.get(f"/users/saved/{username}", headers=headers, params={"limit": 3}).json()
+    assert len(page["saved"]) == 3 and page["next_offset"] == 3
+    page = client.get(f"/users/saved/{username}", headers=headers, params={"limit": 3, "offset": 3}).json()
+    assert [m["name"] for m in page["saved"]] == ["Pagesave 3", "Pagesave 4"] and page["next_offset"] is None
+
+
+def test_saving_an_unknown_medicine_is_404(client, make_user):
+    _, headers = make_user()
+    assert client.post("/users/save", headers=headers, json={"medicine_id": 10 ** 9}).status_code == 404
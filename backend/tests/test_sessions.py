@@ -0,0 +1,71 @@
+import os
+
+from app.sessions import issue_token, persisted_secret, read_token
+
+
+def test_issued_tokens_carry_the_user():
+    claims = read_token(issue_token(7, "asha"))
+    assert claims["uid"] == 7 and claims["sub"] == "asha"
+
+
+def test_tampered_tokens_are_rejected():
+    payload, _, signature = issue_token(7, "asha").partition(".")
+    forged_payload = issue_token(8, "ravi").partition(".")[0]
+    assert read_token(f"{forged_payload}.{signature}") is None
+    assert read_token(payload) is None
+    assert read_token("not a token") is None
+
+
+def test_non_ascii_tokens_are_rejected():
+    token = issue_token(7, "asha")
+    assert read_token(token + "é") is None
+    assert read_token("é." + token.partition(".")[2]) is None
+
+
+def test_expired_tokens_are_rejected():
+    assert read_token(issue_token(7, "asha", ttl=-1)) is None
+
+
+def test_saved_routes_need_a_session(client, make_user):
+    username, headers = make_user()
+    assert client.get(f"/users/saved/{username}").status_code == 401
+    assert client.get(f"/users/saved/{username}", headers={"Authorization": "Bearer not.signed"}).status_code == 401
+    assert client.get(f"/users/saved/{username}", headers=headers).status_code == 200
+
+    other, _ = make_user()
+    assert client.get(f"/users/saved/{other}", headers=headers).status_code == 403
+
+
+def test_login_rejects_wrong_passwords(client, make_user):
+    username, _ = make_user()
+    assert client.post("/users/login", json={"username": username, "password": "wrong"}).status_code == 401
+
+
+def test_a_page_on_another_origin_can_sign_in_and_sync(client, make_medicines):
+    # What templates/save_for_future.html does from the Flask app's origin
+    origin = {"Origin": "http://127.0.0.1:5000"}
+    make_medicines("Crossorigin 10")
+    client.post("/users/register", json={"username": "flask-page-user", "password": "secret"})
+
+    for path in ("/users/login", "/users/saved/batch"):
+        preflight = client.options(path, headers={
+            **origin, "Access-Control-Request-Method": "POST",
+            "Access-Control-Request-Headers": "authorization, content-type",
+        })
+        assert preflight.status_code == 200
+        assert "authorization" in preflight.headers["access-control-allow-headers"].lower()
+
+    login = client.post("/users/login", headers=origin, json={"username": "flask-page-user", "password": "secret"})
+    assert login.headers["access-control-allow-origin"] in ("*", origin["Origin"])
+    headers = {**origin, "Authorization": f"Bearer {login.json()['access_token']}"}
+    sync = client.post("/users/saved/batch", headers=headers, json={"save_names": ["Crossorigin 10"], "remove_names": []})
+    assert sync.status_code == 200 and sync.json() == {"saved": 1, "removed": 0}
+    assert "access-control-allow-origin" in sync.headers
+
+
+def test_generated_secret_is_kept_for_later_starts(tmp_path):
+    path = str(tmp_path / "session_secret")
+    secret = persisted_secret(path)
+    assert len(secret) == 64
+    assert persisted_secret(path) == secret
+    assert oct(os.stat(path).st_mode & 0o777) == "0o600"
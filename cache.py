@@ -0,0 +1,378 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    from gevent import get_hub
+    from gevent.monkey import is_module_patched
+except ImportError:  # Without gevent, SQLite calls just block their own thread
+    get_hub = None
+
+# --- Two-tier TTL Cache ---
+# A small in-process LRU sits in front of a SQLite file shared by every worker
+# process on the machine. Values must be JSON-serializable.
+# Each process keeps a small pool of connections per SQLite file (CACHE_DB_POOL_SIZE),
+# each handed to one thread or greenlet at a time, so a rate limiter transaction
+# waiting on the file lock does not hold up cache reads, and connections do not pile
+# up with the number of requests. Under gevent, SQLite calls run in the hub's thread
+# pool, so a blocked call stalls its own greenlet rather than the whole worker.
+# Expired rows are kept for CACHE_STALE_GRACE seconds as a fallback (see get_stale)
+# and then deleted by a sweep that runs at most every CACHE_SWEEP_INTERVAL seconds.
+# A purge is recorded in the file as well, and every process checks for new purges
+# at most every CACHE_PURGE_CHECK_INTERVAL seconds, dropping the purged entries from
+# its own memory tier, so a purge reaches all workers within that interval.
+
+CACHE_DB_PATH = os.environ.get("CACHE_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache.sqlite3"))
+CACHE_STALE_GRACE = int(os.environ.get("CACHE_STALE_GRACE", 7 * 86400))
+CACHE_SWEEP_INTERVAL = int(os.environ.get("CACHE_SWEEP_INTERVAL", 600))
+CACHE_PURGE_CHECK_INTERVAL = float(os.environ.get("CACHE_PURGE_CHECK_INTERVAL", 1))
+# Purge records are swept after this long; a cache that has not checked for purges in
+# that time drops its whole memory tier instead
+CACHE_PURGE_RETENTION = 3600
+CACHE_DB_POOL_SIZE = int(os.environ.get("CACHE_DB_POOL_SIZE", 4))
+
+CACHE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS cache_entries (
+        namespace TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        expires_at REAL NOT NULL,
+        PRIMARY KEY (namespace, key)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_cache_entries_expires_at ON cache_entries (expires_at)",
+    # One row per purge; `contains` is NULL when the whole namespace was purged
+    """
+    CREATE TABLE IF NOT EXISTS cache_purges (
+        namespace TEXT NOT NULL,
+        contains TEXT,
+        purged_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_cache_purges_namespace ON cache_purges (namespace, purged_at)",
+)
+
+_pools = {}
+_pools_lock = threading.Lock()
+_last_sweeps = {}
+
+
+def _blocking(function, *args):
+    """
+    Runs a blocking SQLite call; under gevent, on a native thread of the hub's pool.
+    """
+    if get_hub is not None and is_module_patched('threading'):
+        return get_hub().threadpool.apply(function, args)
+    return function(*args)
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=5, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class _Rows:
+    """
+    The fetched result of a statement run through a PooledConnection.
+    """
+
+    def __init__(self, rows, rowcount):
+        self.rows = rows
+        self.rowcount = rowcount
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+def _execute(conn, sql, parameters):
+    cursor = conn.execute(sql, parameters)
+    return _Rows(cursor.fetchall(), cursor.rowcount)
+
+
+class PooledConnection:
+    """
+    A connection borrowed from the pool. execute() runs the statement through
+    _blocking() and returns its rows already fetched.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, parameters=()):
+        return _blocking(_execute, self.conn, sql, parameters)
+
+
+class _Pool:
+    def __init__(self, size):
+        self.slots = threading.BoundedSemaphore(size)
+        self.idle = []
+        self.lock = threading.Lock()
+        # Schemas already applied to the file; one connection applies each, once
+        self.ready = set()
+        self.schema_lock = threading.Lock()
+
+
+@contextmanager
+def shared_connection(db_path, schema=CACHE_SCHEMA):
+    """
+    Yields a PooledConnection to `db_path`, held exclusively for the `with` block,
+    waiting for one when all CACHE_DB_POOL_SIZE are in use. The `schema` statements
+    (SQL strings, or callables taking the connection) are run once per process.
+    """
+    # Keyed by pid too: connections must not be shared with a forked worker
+    key = (os.getpid(), db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = _Pool(CACHE_DB_POOL_SIZE)
+    with pool.slots:
+        with pool.lock:
+            conn = pool.idle.pop() if pool.idle else None
+        if conn is None:
+            conn = _blocking(_connect, db_path)
+        try:
+            connection = PooledConnection(conn)
+            if schema not in pool.ready:
+                with pool.schema_lock:
+                    if schema not in pool.ready:
+                        for statement in schema:
+                            if callable(statement):
+                                statement(connection)
+                            else:
+                                connection.execute(statement)
+                        pool.ready.add(schema)
+            yield connection
+        finally:
+            if conn.in_transaction:
+                # Left open by a block that failed; the next borrower must start clean
+                _blocking(conn.rollback)
+            with pool.lock:
+                pool.idle.append(conn)
+
+
+def sweep_expired(db_path=CACHE_DB_PATH, grace=CACHE_STALE_GRACE):
+    """
+    Deletes entries of every namespace that expired more than `grace` seconds ago, and
+    old purge records. Returns the number of entries deleted.
+    """
+    now = time.time()
+    with shared_connection(db_path) as conn:
+        cursor = conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now - grace,))
+        conn.execute("DELETE FROM cache_purges WHERE purged_at <= ?", (now - CACHE_PURGE_RETENTION,))
+    return cursor.rowcount
+
+
+class TTLCache:
+    """
+    A namespaced cache with an in-process LRU tier and an optional on-disk SQLite tier.
+    Every entry carries its own TTL; expired entries are treated as misses.
+    """
+
+    def __init__(self, namespace, max_entries=1024, default_ttl=3600, db_path=CACHE_DB_PATH):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.db_path = db_path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._purges_checked_at = time.time()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Returns the cached value for `key`, or None if it is missing or expired.
+        """
+        now = time.time()
+        self._apply_purges(now)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at, _ = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+        if self.db_path:
+            try:
+                with shared_connection(self.db_path) as conn:
+                    row = conn.execute(
+                        "SELECT value, expires_at, created_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                        (self.namespace, key)
+                    ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Cache read error in '{self.namespace}': {e}")
+                row = None
+            if row and row[1] > now:
+                value = json.loads(row[0])
+                self._remember(key, value, row[1], row[2])
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def get_stale(self, key):
+        """
+        Returns the last value stored under `key` even if it has expired, or None.
+        Meant as a fallback when the upstream behind the cache cannot be called.
+        """
+        self._apply_purges(time.time())
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                return entry[0]
+        if not self.db_path:
+            return None
+        try:
+            with shared_connection(self.db_path) as conn:
+                row = conn.execute(
+                    "SELECT value FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (self.namespace, key)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Cache read error in '{self.namespace}': {e}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores `value` under `key` for `ttl` seconds (the cache default when omitted).
+        """
+        now = time.time()
+        expires_at = now + (ttl if ttl is not None else self.default_ttl)
+        self._remember(key, value, expires_at, now)
+        if self.db_path:
+            try:
+                with shared_connection(self.db_path) as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO cache_entries (namespace, key, value, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                        (self.namespace, key, json.dumps(value), now, expires_at)
+                    )
+                self._maybe_sweep(now)
+            except sqlite3.Error as e:
+                print(f"Cache write error in '{self.namespace}': {e}")
+
+    def purge(self, contains=None):
+        """
+        Removes entries from both tiers, in this process and (within
+        CACHE_PURGE_CHECK_INTERVAL seconds) in every other process sharing the file.
+        When `contains` is given, only keys containing that substring are removed.
+        Returns the number of on-disk entries deleted.
+        """
+        now = time.time()
+        self._forget(contains, now)
+        if not self.db_path:
+            return 0
+        with shared_connection(self.db_path) as conn:
+            if contains is None:
+                cursor = conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+            else:
+                cursor = conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND instr(key, ?) > 0",
+                    (self.namespace, contains)
+                )
+            conn.execute(
+                "INSERT INTO cache_purges (namespace, contains, purged_at) VALUES (?, ?, ?)",
+                (self.namespace, contains, now)
+            )
+        return cursor.rowcount
+
+    def stats(self):
+        """
+        Returns hit/miss counters and tier sizes for this cache.
+        """
+        with self._lock:
+            stats = {
+                'namespace': self.namespace,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'memory_entries': len(self._memory),
+            }
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        if self.db_path:
+            try:
+                with shared_connection(self.db_path) as conn:
+                    stats['disk_entries'] = conn.execute(
+                        "SELECT COUNT(*) FROM cache_entries WHERE namespace = ? AND expires_at > ?",
+                        (self.namespace, time.time())
+                    ).fetchone()[0]
+            except sqlite3.Error:
+                stats['disk_entries'] = None
+        return stats
+
+    def _maybe_sweep(self, now):
+        # One sweep per file and process per interval, whichever cache writes first
+        key = (os.getpid(), self.db_path)
+        with _pools_lock:
+            if now - _last_sweeps.get(key, 0) < CACHE_SWEEP_INTERVAL:
+                return
+            _last_sweeps[key] = now
+        deleted = sweep_expired(self.db_path)
+        if deleted:
+            print(f"Cache sweep removed {deleted} entries expired over {CACHE_STALE_GRACE}s ago")
+
+    def _apply_purges(self, now):
+        """
+        Drops memory entries purged by other processes since the last check, checking at
+        most every CACHE_PURGE_CHECK_INTERVAL seconds.
+        """
+        if not self.db_path:
+            return
+        with self._lock:
+            since = self._purges_checked_at
+            if now - since < CACHE_PURGE_CHECK_INTERVAL:
+                return
+            self._purges_checked_at = now
+        if now - since >= CACHE_PURGE_RETENTION:
+            # Purges this cache has not seen may already be swept
+            self._forget(None, now)
+            return
+        try:
+            with shared_connection(self.db_path) as conn:
+                # The overlap catches purges whose timestamp was taken before the last check but committed after it
+                purges = conn.execute(
+                    "SELECT contains, purged_at FROM cache_purges WHERE namespace = ? AND purged_at > ?",
+                    (self.namespace, since - CACHE_PURGE_CHECK_INTERVAL)
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Cache read error in '{self.namespace}': {e}")
+            return
+        for contains, purged_at in purges:
+            self._forget(contains, purged_at)
+
+    def _forget(self, contains, purged_at):
+        # Only entries created by the time of the purge; later ones were computed afresh
+        with self._lock:
+            for key in [k for k, (_, _, created_at) in self._memory.items()
+                        if created_at <= purged_at and (contains is None or contains in k)]:
+                del self._memory[key]
+
+    def _remember(self, key, value, expires_at, created_at):
+        with self._lock:
+            self._memory[key] = (value, expires_at, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
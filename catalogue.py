@@ -0,0 +1,169 @@
+import os
+import re
+import csv
+from array import array
+
+# --- Local Drug Catalogue ---
+# Rows are stored column by column: brand names in a list, while constituents and
+# manufacturers are interned into small string tables and referenced by integer id
+# from compact arrays. This keeps a national formulary of hundreds of thousands of
+# rows to a few tens of megabytes, far less than a list of per-row dicts.
+
+DEFAULT_CATALOGUE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "india_drugs_raw.csv.txt")
+
+_STRENGTH_MG = re.compile(r'(\d+(?:\.\d+)?)\s*mg\b')
+_NON_WORD = re.compile(r'[^a-z0-9.%]+')
+_STRENGTH_UNIT = re.compile(r'(\d+(?:\.\d+)?)\s*(mg|mcg|g|ml|%)')
+_DOSAGE_FORM_WORDS = {'tablet', 'tablets', 'tab', 'tabs', 'capsule', 'capsules', 'cap', 'caps', 'strip'}
+
+
+def normalize_brand(name):
+    """
+    Normalizes a brand name for lookups: "Dolo 650mg Tablet" and "dolo 650" both become "dolo 650".
+    """
+    name = _STRENGTH_MG.sub(r'\1', name.lower())
+    words = _NON_WORD.sub(' ', name).split()
+    return " ".join(word for word in words if word not in _DOSAGE_FORM_WORDS)
+
+
+def split_constituents(constituents):
+    """
+    Splits a Constituents cell such as "Ibuprofen 400mg + Paracetamol 325mg" into its ingredients.
+    """
+    return [part.strip() for part in re.split(r'\s*[+,]\s*', constituents) if part.strip()]
+
+
+def normalize_composition(constituents):
+    """
+    Builds an order-insensitive key for a set of constituents, so that
+    "Paracetamol 325mg + Ibuprofen 400 mg" and "ibuprofen 400mg + paracetamol 325mg" match.
+    """
+    parts = set()
+    for part in split_constituents(constituents):
+        part = _STRENGTH_UNIT.sub(r'\1\2', part.lower())
+        parts.add(" ".join(part.split()))
+    return " + ".join(sorted(parts))
+
+
+def normalize_manufacturer(manufacturer):
+    return " ".join(re.sub(r'[^a-z0-9]+', ' ', manufacturer.lower()).split())
+
+
+class DrugCatalogue:
+    """
+    An in-memory, array-backed index over a Brand/Constituents/Manufacturer/Price CSV.
+    Provides brand -> row, composition -> brands and manufacturer -> brands lookups.
+    """
+
+    def __init__(self):
+        self.brands = []
+        self.constituent_ids = array('I')
+        self.manufacturer_ids = array('I')
+        self.prices = array('d')
+        self._constituent_table = []
+        self._manufacturer_table = []
+        self._constituent_lookup = {}
+        self._manufacturer_lookup = {}
+        # Normalized keys per interned string, so each distinct value is normalized once
+        self._composition_keys = []
+        self._manufacturer_keys = []
+        self.brand_index = {}
+        self.composition_index = {}
+        self.manufacturer_index = {}
+
+    def __len__(self):
+        return len(self.brands)
+
+    @classmethod
+    def load(cls, path=DEFAULT_CATALOGUE_PATH):
+        """
+        Streams the CSV at `path` into a new catalogue. Rows without a brand or constituents are skipped.
+        """
+        catalogue = cls()
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                brand = (row.get('Brand') or '').strip()
+                constituents = (row.get('Constituents') or '').strip()
+                if not brand or not constituents:
+                    continue
+                catalogue.add(brand, constituents, (row.get('Manufacturer') or '').strip(), row.get('Price'))
+        return catalogue
+
+    def add(self, brand, constituents, manufacturer='', price=None):
+        row_id = len(self.brands)
+        self.brands.append(brand)
+
+        constituent_id = self._intern(constituents, self._constituent_table, self._constituent_lookup,
+                                      self._composition_keys, normalize_composition)
+        manufacturer_id = self._intern(manufacturer, self._manufacturer_table, self._manufacturer_lookup,
+                                       self._manufacturer_keys, normalize_manufacturer)
+        self.constituent_ids.append(constituent_id)
+        self.manufacturer_ids.append(manufacturer_id)
+        self.prices.append(_parse_price(price))
+
+        # The first row wins when a brand appears more than once.
+        self.brand_index.setdefault(normalize_brand(brand), row_id)
+        self.composition_index.setdefault(self._composition_keys[constituent_id], array('I')).append(row_id)
+        if manufacturer:
+            self.manufacturer_index.setdefault(self._manufacturer_keys[manufacturer_id], array('I')).append(row_id)
+        return row_id
+
+    def row(self, row_id):
+        """
+        Materializes a single row as a dict. Rows are only turned into dicts on the way out.
+        """
+        price = self.prices[row_id]
+        return {
+            'brand': self.brands[row_id],
+            'constituents': self._constituent_table[self.constituent_ids[row_id]],
+            'manufacturer': self._manufacturer_table[self.manufacturer_ids[row_id]],
+            'price': None if price != price else price,  # NaN marks a missing price
+        }
+
+    def lookup(self, brand):
+        """
+        Returns the row for a known brand, or None.
+        """
+        row_id = self.brand_index.get(normalize_brand(brand))
+        return self.row(row_id) if row_id is not None else None
+
+    def same_composition(self, constituents, exclude_brand=None):
+        """
+        Returns every row sharing exactly the given constituents, cheapest first.
+        """
+        row_ids = self.composition_index.get(normalize_composition(constituents), ())
+        excluded = normalize_brand(exclude_brand) if exclude_brand else None
+        rows = [self.row(row_id) for row_id in row_ids if normalize_brand(self.brands[row_id]) != excluded]
+        return sorted(rows, key=lambda r: r['price'] if r['price'] is not None else float('inf'))
+
+    def generic_names(self):
+        """
+        Returns the distinct ingredient names in the catalogue without strengths, e.g. "Paracetamol".
+        """
+        names = set()
+        for constituents in self._constituent_table:
+            for ingredient in split_constituents(constituents):
+                name = " ".join(word for word in ingredient.split() if not word[0].isdigit())
+                if name:
+                    names.add(name)
+        return sorted(names)
+
+    def by_manufacturer(self, manufacturer):
+        row_ids = self.manufacturer_index.get(normalize_manufacturer(manufacturer), ())
+        return [self.row(row_id) for row_id in row_ids]
+
+    @staticmethod
+    def _intern(value, table, lookup, keys, normalize):
+        value_id = lookup.get(value)
+        if value_id is None:
+            value_id = lookup[value] = len(table)
+            table.append(value)
+            keys.append(normalize(value))
+        return value_id
+
+
+def _parse_price(price):
+    try:
+        return float(str(price).replace(',', '').replace('₹', '').strip())
+    except (TypeError, ValueError):
+        return float('nan')
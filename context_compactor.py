@@ -0,0 +1,152 @@
+import re
+import json
+from urllib.parse import urlsplit
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to a characters-per-token estimate
+    tiktoken = None
+
+# --- Prompt Context Compaction ---
+# Search results are cleaned, de-duplicated and trimmed to a token budget before
+# they are pasted into a Groq prompt. Google snippets for the same drug repeat each
+# other heavily (the same manufacturer blurb syndicated across pharmacy sites), so
+# near-duplicates are dropped by comparing word 3-gram shingles. Results are
+# serialized as compact JSON without indentation or ASCII escaping.
+
+CHARS_PER_TOKEN = 4
+SHINGLE_SIZE = 3
+# Snippets whose shingle sets overlap at least this much (Jaccard) count as duplicates
+DUPLICATE_SIMILARITY = 0.6
+
+_LEADING_DATE = re.compile(
+    r'^\s*(?:[A-Z][a-z]{2,8} \d{1,2}, \d{4}|\d{1,2} [A-Z][a-z]{2,8} \d{4}|\d+ (?:minutes?|hours?|days?|weeks?) ago)\s*[-—·.]*\s*'
+)
+_BOILERPLATE = re.compile(
+    r'\b(?:read more|click here|buy now|order now|shop now|add to cart|free shipping|free delivery|'
+    r'cash on delivery|sign up|log ?in|view details|know more)\b[.!:]*',
+    re.IGNORECASE
+)
+_ELLIPSIS = re.compile(r'\s*(?:\.{3}|…)\s*')
+_WORD = re.compile(r'[a-z0-9]+')
+
+_encoding = None
+
+
+def load_tokenizer():
+    """
+    Loads tiktoken's cl100k_base encoding (close to Llama 3's tokenizer) for
+    estimate_tokens(). Its first load downloads the encoding file, so this runs at
+    startup rather than inside a request. Returns True when token counts are exact.
+    """
+    global _encoding
+    if tiktoken is None:
+        print("tiktoken is not installed; estimating token counts at four characters per token.")
+        return False
+    try:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:  # The encoding file may not be downloadable offline
+        print(f"tiktoken encoding unavailable, estimating token counts instead: {e}")
+        return False
+    return True
+
+
+def estimate_tokens(text):
+    """
+    Counts the tokens in `text` with the encoding load_tokenizer() loaded, otherwise
+    estimates about four characters per token.
+    """
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def clean_snippet(text):
+    """
+    Strips publication dates, calls to action and truncation ellipses from a search snippet.
+    """
+    text = _LEADING_DATE.sub('', text or '')
+    text = _BOILERPLATE.sub(' ', text)
+    text = _ELLIPSIS.sub(' ', text)
+    return " ".join(text.split())
+
+
+def _shingles(text):
+    words = _WORD.findall(text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def dedupe(items, text_of=lambda item: item, group_of=lambda item: None):
+    """
+    Drops items whose text is a near-duplicate of an earlier item in the same group,
+    keeping search rank order.
+    """
+    kept, kept_shingles = [], {}
+    for item in items:
+        shingles = _shingles(text_of(item))
+        if not shingles:
+            continue
+        group = kept_shingles.setdefault(group_of(item), [])
+        if any(len(shingles & seen) / len(shingles | seen) >= DUPLICATE_SIMILARITY for seen in group):
+            continue
+        kept.append(item)
+        group.append(shingles)
+    return kept
+
+
+def _clean_results(results, fields):
+    cleaned = []
+    for item in results or []:
+        entry = {field: item.get(field, '') for field in fields}
+        for field in ('title', 'snippet'):
+            if field in entry:
+                entry[field] = clean_snippet(entry[field])
+        cleaned.append(entry)
+    # The same blurb from two different sites is kept: each site is a separate listing
+    return dedupe(
+        cleaned,
+        text_of=lambda entry: f"{entry.get('title', '')} {entry.get('snippet', '')}",
+        group_of=lambda entry: urlsplit(entry.get('link', '')).netloc
+    )
+
+
+def compact_snippets(results, max_tokens):
+    """
+    Joins the cleaned, de-duplicated snippets of `results` into one string of at most `max_tokens`.
+    """
+    snippets, used = [], 0
+    for entry in _clean_results(results, ('snippet',)):
+        tokens = estimate_tokens(entry['snippet']) + 1
+        if used + tokens > max_tokens:
+            break
+        snippets.append(entry['snippet'])
+        used += tokens
+    return " ".join(snippets)
+
+
+def compact_results(results, max_tokens, fields=('title', 'snippet', 'link')):
+    """
+    Serializes cleaned, de-duplicated `results` as compact JSON of at most `max_tokens`,
+    keeping the highest-ranked results.
+    """
+    kept, used = [], 2
+    for entry in _clean_results(results, fields):
+        tokens = estimate_tokens(json.dumps(entry, ensure_ascii=False, separators=(',', ':'))) + 1
+        if used + tokens > max_tokens:
+            break
+        kept.append(entry)
+        used += tokens
+    return json.dumps(kept, ensure_ascii=False, separators=(',', ':'))
+
+
+def log_compaction(label, before, after):
+    """
+    Prints the prompt context size before and after compaction, in tokens.
+    """
+    before_tokens, after_tokens = estimate_tokens(before), estimate_tokens(after)
+    saved = round(100 * (1 - after_tokens / before_tokens)) if before_tokens else 0
+    print(f"   - Context for {label}: {before_tokens} -> {after_tokens} tokens ({saved}% smaller)")
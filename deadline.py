@@ -0,0 +1,33 @@
+import time
+
+# --- Request Deadlines ---
+# A Deadline is created once per request and handed down to every network call,
+# which then waits no longer than the time the request has left. Once it has
+# passed, remaining work is skipped and the request answers with what it has.
+
+
+class Deadline:
+    """
+    The point in time by which a request must have answered.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+
+def call_timeout(deadline, limit):
+    """
+    Returns the timeout for one network call: `limit` seconds, cut short by `deadline` if any.
+    """
+    return limit if deadline is None else min(limit, deadline.remaining())
+
+
+def out_of_time(deadline):
+    return deadline is not None and deadline.expired()
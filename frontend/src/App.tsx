@@ -19,14 +19,16 @@ function About() {
 }
 
 export default function App() {
-  const [user, setUser] = useState<string | null>(localStorage.getItem('user'));
-  const handleAuth = (username: string) => {
+  const [user, setUser] = useState<string | null>(localStorage.getItem('token') ? localStorage.getItem('user') : null);
+  const handleAuth = (username: string, token: string) => {
     setUser(username);
     localStorage.setItem('user', username);
+    localStorage.setItem('token', token);
   };
   const handleLogout = () => {
     setUser(null);
     localStorage.removeItem('user');
+    localStorage.removeItem('token');
   };
   return (
     <div className="min-h-screen bg-gradient-to-br from-blue-50 via-purple-50 to-pink-100">
@@ -47,7 +49,7 @@ export default function App() {
       </nav>
       <Routes>
         <Route path="/" element={<Home />} />
-        <Route path="/tools" element={user ? <Tools user={user} /> : <Auth onAuth={handleAuth} />} />
+        <Route path="/tools" element={user ? <Tools user={user} token={localStorage.getItem('token') ?? ''} onLogout={handleLogout} /> : <Auth onAuth={handleAuth} />} />
         <Route path="/about" element={<About />} />
         <Route path="/blog" element={<Blog />} />
         <Route path="/auth" element={<Auth onAuth={handleAuth} />} />
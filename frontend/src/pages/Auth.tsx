@@ -2,7 +2,7 @@ import React, { useState } from 'react';
 
 const API = import.meta.env.VITE_API_URL ?? 'http://127.0.0.1:8000';
 
-export default function Auth({ onAuth }: { onAuth: (username: string) => void }) {
+export default function Auth({ onAuth }: { onAuth: (username: string, token: string) => void }) {
   const [mode, setMode] = useState<'login' | 'register'>('login');
   const [username, setUsername] = useState('');
   const [password, setPassword] = useState('');
@@ -14,14 +14,21 @@ export default function Auth({ onAuth }: { onAuth: (username: string) => void })
     setLoading(true);
     setError('');
     try {
-      const res = await fetch(`${API}/users/${mode}`, {
+      const post = (path: string) => fetch(`${API}/users/${path}`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ username, password })
       });
+      if (mode === 'register') {
+        const res = await post('register');
+        const data = await res.json();
+        if (!res.ok) throw new Error(data.detail || data.message || 'Error');
+      }
+      // Logging in returns the session token sent with every later request
+      const res = await post('login');
       const data = await res.json();
       if (!res.ok) throw new Error(data.detail || data.message || 'Error');
-      onAuth(username);
+      onAuth(username, data.access_token);
     } catch (err: any) {
       setError(err.message);
     } finally {
@@ -1,10 +1,13 @@
 import React, { useState, useEffect } from 'react';
 
 const API = import.meta.env.VITE_API_URL ?? 'http://127.0.0.1:8000';
+const PAGE_SIZE = 20;
 
 export default function Blog() {
   const [posts, setPosts] = useState<any[]>([]);
+  const [nextCursor, setNextCursor] = useState<number | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [selected, setSelected] = useState<any | null>(null);
   const [showForm, setShowForm] = useState(false);
   const [title, setTitle] = useState('');
@@ -12,14 +15,37 @@ export default function Blog() {
   const [formError, setFormError] = useState('');
   const user = localStorage.getItem('user');
 
+  // Lists carry titles and excerpts only, a page at a time; the full post is fetched when opened
+  const fetchPage = (cursor: number | null) =>
+    fetch(`${API}/blog/?limit=${PAGE_SIZE}${cursor !== null ? `&before=${cursor}` : ''}`).then(res => res.json());
+
   useEffect(() => {
-    fetch(`${API}/blog/`)
-      .then(res => res.json())
-      .then(data => setPosts(data.posts || []))
+    fetchPage(null)
+      .then(data => {
+        setPosts(data.posts || []);
+        setNextCursor(data.next_cursor ?? null);
+      })
       .finally(() => setLoading(false));
   }, [showForm]);
 
-  const handleSelect = (post: any) => setSelected(post);
+  const handleLoadMore = () => {
+    if (nextCursor === null) return;
+    setLoadingMore(true);
+    fetchPage(nextCursor)
+      .then(data => {
+        setPosts(current => [...current, ...(data.posts || [])]);
+        setNextCursor(data.next_cursor ?? null);
+      })
+      .finally(() => setLoadingMore(false));
+  };
+
+  const handleSelect = (post: any) => {
+    setSelected({ ...post, content: null });
+    fetch(`${API}/blog/${post.id}`)
+      .then(res => res.json())
+      // Ignore the answer if another post was opened (or the modal closed) meanwhile
+      .then(data => setSelected((current: any) => (current && current.id === data.id ? data : current)));
+  };
 
   const handleCreate = async (e: React.FormEvent) => {
     e.preventDefault();
@@ -65,9 +91,12 @@ export default function Blog() {
           {posts.length === 0 ? <div className="text-gray-500">No posts yet.</div> : posts.map(post => (
             <div key={post.id} className="bg-white border rounded p-4 cursor-pointer" onClick={() => handleSelect(post)}>
               <div className="font-bold text-lg">{post.title}</div>
-              <div className="text-gray-600 text-sm line-clamp-2">{post.content.slice(0, 100)}{post.content.length > 100 ? '...' : ''}</div>
+              <div className="text-gray-600 text-sm line-clamp-2">{post.excerpt}</div>
             </div>
           ))}
+          {nextCursor !== null && (
+            <button onClick={handleLoadMore} className="bg-gray-200 px-4 py-1 rounded" disabled={loadingMore}>{loadingMore ? 'Loading...' : 'Load more'}</button>
+          )}
         </div>
       )}
       {selected && (
@@ -75,7 +104,7 @@ export default function Blog() {
           <div className="bg-white rounded shadow-lg p-6 max-w-lg w-full relative">
             <button onClick={() => setSelected(null)} className="absolute top-2 right-2 text-gray-500">&times;</button>
             <div className="font-bold text-xl mb-2">{selected.title}</div>
-            <div className="whitespace-pre-line">{selected.content}</div>
+            <div className="whitespace-pre-line">{selected.content ?? 'Loading...'}</div>
           </div>
         </div>
       )}
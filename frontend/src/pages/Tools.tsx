@@ -5,7 +5,9 @@ import 'leaflet/dist/leaflet.css';
 
 const API = import.meta.env.VITE_API_URL ?? 'http://127.0.0.1:8000';
 
-export default function Tools({ user }: { user: string }) {
+export default function Tools({ user, token, onLogout }: { user: string, token: string, onLogout: () => void }) {
+  const authHeaders = { Authorization: `Bearer ${token}` };
+
   // Medicine Search
   const [search, setSearch] = useState('');
   const [searchResults, setSearchResults] = useState<any[]>([]);
@@ -38,10 +40,14 @@ export default function Tools({ user }: { user: string }) {
   const [aiLoading, setAiLoading] = useState(false);
 
   useEffect(() => {
-    fetch(`${API}/users/saved/${user}`)
-      .then(res => res.json())
+    fetch(`${API}/users/saved/${user}`, { headers: authHeaders })
+      .then(res => {
+        // An expired session needs a fresh login
+        if (res.status === 401) onLogout();
+        return res.json();
+      })
       .then(data => setSaved(data.saved || []));
-  }, [user]);
+  }, [user, token]);
 
   useEffect(() => {
     fetch(`${API}/essentials/`)
@@ -81,13 +87,13 @@ export default function Tools({ user }: { user: string }) {
     try {
       const res = await fetch(`${API}/users/save`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ username: user, medicine_id: medicineId })
+        headers: { 'Content-Type': 'application/json', ...authHeaders },
+        body: JSON.stringify({ medicine_id: medicineId })
       });
       const data = await res.json();
       if (!res.ok) throw new Error(data.detail || data.message || 'Error');
       // Refresh saved list
-      const savedRes = await fetch(`${API}/users/saved/${user}`);
+      const savedRes = await fetch(`${API}/users/saved/${user}`, { headers: authHeaders });
       const savedData = await savedRes.json();
       setSaved(savedData.saved || []);
     } catch (err: any) {
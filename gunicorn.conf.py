@@ -0,0 +1,22 @@
+import os
+
+# --- Gunicorn Settings ---
+# Picked up automatically by `gunicorn app:app` (see procfile). Medicine lookups spend
+# almost all of their time waiting on Google and Groq, so workers run gevent
+# greenlets by default: every blocking socket call yields to other requests, and a
+# single worker serves hundreds of concurrent lookups instead of one. Without gevent
+# installed, workers fall back to a pool of OS threads.
+
+try:
+    import gevent
+except ImportError:
+    gevent = None
+
+worker_class = os.environ.get("WEB_WORKER_CLASS", "gevent" if gevent is not None else "gthread")
+worker_connections = int(os.environ.get("WEB_WORKER_CONNECTIONS", 500))
+threads = int(os.environ.get("WEB_THREADS", 16))
+
+# The search pools in app.py hold greenlets under gevent, so they can be much wider
+# than they would be with OS threads. Set before the workers import the app.
+if worker_class == "gevent":
+    os.environ.setdefault("SEARCH_MAX_WORKERS", "64")
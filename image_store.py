@@ -0,0 +1,82 @@
+import os
+import hashlib
+import threading
+from io import BytesIO
+
+try:
+    from PIL import Image
+except ImportError:  # Without Pillow images are stored as downloaded, not shrunk
+    Image = None
+
+# --- Local Medicine Image Store ---
+# Product images found through Google are downloaded once and kept on disk, so later
+# views are served locally instead of hot-linking (and re-resolving) the remote image.
+# With Pillow installed each image is shrunk to a JPEG thumbnail first.
+
+THUMBNAIL_SIZE = (320, 320)
+MAX_IMAGE_BYTES = 2 * 1024 * 1024
+EXTENSIONS = {'image/jpeg': '.jpg', 'image/png': '.png', 'image/webp': '.webp', 'image/gif': '.gif'}
+
+
+def normalize_image_name(medicine_name):
+    return " ".join(medicine_name.lower().split())
+
+
+class ImageStore:
+    """
+    A directory of medicine images named by a hash of the normalized medicine name.
+    """
+
+    def __init__(self, directory, http_client):
+        self.directory = directory
+        self.http_client = http_client
+        os.makedirs(directory, exist_ok=True)
+
+    def _base_path(self, medicine_name):
+        digest = hashlib.sha256(normalize_image_name(medicine_name).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    def path_for(self, medicine_name):
+        """
+        Returns the stored image file for `medicine_name`, or None if there is none yet.
+        """
+        base_path = self._base_path(medicine_name)
+        for extension in EXTENSIONS.values():
+            if os.path.exists(base_path + extension):
+                return base_path + extension
+        return None
+
+    def save(self, medicine_name, image_url):
+        """
+        Downloads `image_url` and stores it for `medicine_name`. Returns the file path,
+        or None when the download failed or was not a usable image.
+        """
+        try:
+            response = self.http_client.get(image_url)
+            response.raise_for_status()
+        except Exception as e:
+            print(f"Image download failed for '{medicine_name}': {e}")
+            return None
+        content_type = response.headers.get('content-type', '').split(';')[0].strip().lower()
+        if content_type not in EXTENSIONS or len(response.content) > MAX_IMAGE_BYTES:
+            print(f"Image for '{medicine_name}' is not a storable image ({content_type}, {len(response.content)} bytes)")
+            return None
+
+        content, extension = response.content, EXTENSIONS[content_type]
+        if Image is not None:
+            try:
+                image = Image.open(BytesIO(content))
+                image.thumbnail(THUMBNAIL_SIZE)
+                buffer = BytesIO()
+                image.convert('RGB').save(buffer, 'JPEG', quality=85, optimize=True)
+                content, extension = buffer.getvalue(), '.jpg'
+            except Exception as e:
+                print(f"Could not make a thumbnail for '{medicine_name}', storing the original: {e}")
+
+        path = self._base_path(medicine_name) + extension
+        # Written under a temporary name so concurrent readers never see a partial file
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+        return path
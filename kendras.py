@@ -0,0 +1,171 @@
+import os
+import json
+import math
+import heapq
+
+try:
+    import numpy as np
+except ImportError:  # Batch queries fall back to the KD-tree without NumPy
+    np = None
+
+# --- Jan Aushadhi Kendra Spatial Index ---
+# Kendra coordinates are projected onto 3-D unit vectors and stored in a KD-tree.
+# Straight-line (chord) distance between unit vectors grows monotonically with the
+# great-circle distance, so nearest-neighbour search in 3-D gives exact haversine
+# ordering without trigonometry per kendra, and works across the antimeridian.
+
+DEFAULT_KENDRAS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "jan_aushadhi_kendras.json")
+EARTH_RADIUS_KM = 6371
+# Query points per vectorized block; bounds the (points x kendras) distance matrix in memory
+BATCH_BLOCK_SIZE = 256
+
+
+def unit_vector(lat, lng):
+    lat_rad, lng_rad = math.radians(lat), math.radians(lng)
+    cos_lat = math.cos(lat_rad)
+    return (cos_lat * math.cos(lng_rad), cos_lat * math.sin(lng_rad), math.sin(lat_rad))
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(chord / 2, 1.0))
+
+
+def km_to_chord(distance_km):
+    return 2 * math.sin(min(distance_km / (2 * EARTH_RADIUS_KM), math.pi / 2))
+
+
+class KendraIndex:
+    """
+    A read-only KD-tree over kendra locations answering k-nearest queries with
+    optional radius and city filters. Stored kendra records are never mutated;
+    results are fresh dicts carrying a 'distance' in km.
+    """
+
+    def __init__(self, kendras):
+        self.kendras = tuple(kendras)
+        self._points = [unit_vector(k['lat'], k['lng']) for k in self.kendras]
+        self._root = self._build(list(range(len(self.kendras))), 0)
+
+        # A separate small tree per city keeps city-filtered queries from walking the national tree
+        city_ids = {}
+        for kendra_id, kendra in enumerate(self.kendras):
+            city_ids.setdefault(kendra.get('city', '').strip().lower(), []).append(kendra_id)
+        self._city_roots = {city: self._build(ids, 0) for city, ids in city_ids.items()}
+
+        # Contiguous coordinate arrays (radians) for vectorized batch distance computation
+        if np is not None:
+            self._lat_rad = np.radians(np.array([k['lat'] for k in self.kendras], dtype=np.float64))
+            self._lng_rad = np.radians(np.array([k['lng'] for k in self.kendras], dtype=np.float64))
+            self._cos_lat = np.cos(self._lat_rad)
+
+    def __len__(self):
+        return len(self.kendras)
+
+    @classmethod
+    def load(cls, path=DEFAULT_KENDRAS_PATH):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def nearest(self, lat, lng, k=10, radius_km=None, city=None):
+        """
+        Returns up to `k` kendras closest to (lat, lng), nearest first.
+        """
+        if city is not None:
+            root = self._city_roots.get(city.strip().lower())
+        else:
+            root = self._root
+        if root is None or k <= 0:
+            return []
+
+        target = unit_vector(lat, lng)
+        max_chord = km_to_chord(radius_km) if radius_km is not None else 2.0
+        # Max-heap (via negated squared chord) holding the best k candidates seen so far
+        heap = []
+        bound = max_chord * max_chord
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            kendra_id, axis, left, right, low, high = node
+            # Skip subtrees whose bounding slab along this axis is already too far away
+            distance_to_slab = max(low - target[axis], 0.0, target[axis] - high)
+            if distance_to_slab * distance_to_slab > bound:
+                continue
+
+            point = self._points[kendra_id]
+            dx, dy, dz = point[0] - target[0], point[1] - target[1], point[2] - target[2]
+            squared = dx * dx + dy * dy + dz * dz
+            if squared <= bound:
+                if len(heap) < k:
+                    heapq.heappush(heap, (-squared, kendra_id))
+                else:
+                    heapq.heapreplace(heap, (-squared, kendra_id))
+                if len(heap) == k:
+                    bound = min(bound, -heap[0][0])
+
+            # Visit the side containing the target first; it is pushed last
+            if target[axis] < point[axis]:
+                stack.append(right)
+                stack.append(left)
+            else:
+                stack.append(left)
+                stack.append(right)
+
+        results = sorted((-negative_squared, kendra_id) for negative_squared, kendra_id in heap)
+        return [
+            dict(self.kendras[kendra_id], distance=round(chord_to_km(math.sqrt(squared)), 2))
+            for squared, kendra_id in results
+        ]
+
+    def nearest_batch(self, points, k=1):
+        """
+        Returns the `k` nearest kendras for each (lat, lng) in `points`, in input order.
+        Distances are computed with a vectorized haversine over blocks of query points.
+        """
+        if np is None or not self.kendras:
+            return [self.nearest(lat, lng, k=k) for lat, lng in points]
+
+        k = min(k, len(self.kendras))
+        results = []
+        coordinates = np.radians(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+        for start in range(0, len(coordinates), BATCH_BLOCK_SIZE):
+            block = coordinates[start:start + BATCH_BLOCK_SIZE]
+            lat = block[:, 0:1]
+            lng = block[:, 1:2]
+            a = (np.sin((self._lat_rad - lat) / 2) ** 2
+                 + np.cos(lat) * self._cos_lat * np.sin((self._lng_rad - lng) / 2) ** 2)
+            distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+            # Select the k smallest per row without sorting the whole row, then order just those
+            if k < distances.shape[1]:
+                nearest_ids = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            else:
+                nearest_ids = np.tile(np.arange(distances.shape[1]), (len(block), 1))
+            nearest_distances = np.take_along_axis(distances, nearest_ids, axis=1)
+            order = np.argsort(nearest_distances, axis=1)
+            nearest_ids = np.take_along_axis(nearest_ids, order, axis=1)
+            nearest_distances = np.take_along_axis(nearest_distances, order, axis=1)
+
+            for row_ids, row_distances in zip(nearest_ids.tolist(), nearest_distances.tolist()):
+                results.append([
+                    dict(self.kendras[kendra_id], distance=round(distance, 2))
+                    for kendra_id, distance in zip(row_ids, row_distances)
+                ])
+        return results
+
+    def _build(self, ids, depth):
+        if not ids:
+            return None
+        axis = depth % 3
+        ids.sort(key=lambda i: self._points[i][axis])
+        middle = len(ids) // 2
+        low, high = self._points[ids[0]][axis], self._points[ids[-1]][axis]
+        return (
+            ids[middle],
+            axis,
+            self._build(ids[:middle], depth + 1),
+            self._build(ids[middle + 1:], depth + 1),
+            low,
+            high,
+        )
@@ -0,0 +1,195 @@
+import time
+import random
+import sqlite3
+import threading
+from email.utils import parsedate_to_datetime
+from cache import CACHE_DB_PATH, shared_connection
+
+# --- Upstream Rate Limiting ---
+# Each upstream API (Google Custom Search, Groq) gets a token bucket stored in the
+# SQLite file shared by every worker process, so the quota is tracked per machine
+# rather than per worker. A call takes tokens before it goes out; when the bucket
+# runs dry the caller waits for the refill or gives up and falls back to cached data.
+# Low-priority calls (images, extra info) cannot dip into a reserve kept for
+# high-priority ones (composition, prices), and they queue behind them: a
+# high-priority call that has to wait records when it expects its tokens, and until
+# then no low-priority call in any worker may take tokens from the bucket. A 429 or
+# Retry-After from the upstream blocks the bucket for every worker until it lapses.
+
+PRIORITY_HIGH = 0
+PRIORITY_LOW = 1
+# Share of a bucket's capacity only high-priority calls may use
+LOW_PRIORITY_RESERVE = 0.2
+MAX_BACKOFF_SECONDS = 60
+# Waits for tokens are stretched by up to this factor so workers do not retry in lockstep
+WAIT_JITTER = 1.2
+
+
+def _add_queue_column(conn):
+    # Bucket tables created before priority queueing lack the column
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(rate_buckets)")}
+    if 'high_waiting_until' not in columns:
+        conn.execute("ALTER TABLE rate_buckets ADD COLUMN high_waiting_until REAL NOT NULL DEFAULT 0")
+
+
+RATE_LIMIT_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS rate_buckets (
+        name TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        blocked_until REAL NOT NULL DEFAULT 0,
+        high_waiting_until REAL NOT NULL DEFAULT 0
+    )
+    """,
+    _add_queue_column,
+)
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Seconds to wait before retry number `attempt` (from 0): the upstream's Retry-After
+    when given, otherwise exponential backoff. Both are jittered so workers spread out.
+    """
+    base = retry_after if retry_after is not None else min(2 ** attempt, MAX_BACKOFF_SECONDS)
+    return base * random.uniform(1.0, 1.5)
+
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header (delta-seconds or an HTTP date) into seconds, or None.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    A token bucket holding up to `capacity` tokens and refilling at `refill_per_second`,
+    shared by all processes using the same SQLite file.
+    """
+
+    def __init__(self, name, capacity, refill_per_second, db_path=CACHE_DB_PATH):
+        self.name = name
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.denied = 0
+        self.blocks = 0
+
+    def try_acquire(self, cost=1, priority=PRIORITY_HIGH, queue_for=0.0):
+        """
+        Takes `cost` tokens if available. Returns 0 on success, otherwise the number of
+        seconds until enough tokens should be available (nothing is taken).
+        A high-priority caller that will wait up to `queue_for` seconds holds off
+        low-priority callers until its tokens are due.
+        """
+        cost = min(float(cost), self.capacity)
+        low_priority = priority == PRIORITY_LOW
+        floor = self.capacity * LOW_PRIORITY_RESERVE if low_priority else 0.0
+        now = time.time()
+        try:
+            with shared_connection(self.db_path, RATE_LIMIT_SCHEMA) as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    row = conn.execute(
+                        "SELECT tokens, updated_at, blocked_until, high_waiting_until FROM rate_buckets WHERE name = ?",
+                        (self.name,)
+                    ).fetchone()
+                    tokens, updated_at, blocked_until, high_waiting_until = row if row else (self.capacity, now, 0.0, 0.0)
+                    tokens = min(self.capacity, tokens + max(now - updated_at, 0.0) * self.refill_per_second)
+                    if now < blocked_until:
+                        wait = blocked_until - now
+                    elif low_priority and now < high_waiting_until:
+                        # Queued behind a high-priority call
+                        wait = high_waiting_until - now
+                    elif tokens - cost >= floor:
+                        tokens -= cost
+                        wait = 0.0
+                    else:
+                        wait = (cost + floor - tokens) / self.refill_per_second if self.refill_per_second else float('inf')
+                        if not low_priority and wait <= queue_for:
+                            # Held until the waiter's jittered retry, so no low-priority call slips in first
+                            high_waiting_until = max(high_waiting_until, now + wait * WAIT_JITTER)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO rate_buckets (name, tokens, updated_at, blocked_until, high_waiting_until) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (self.name, tokens, now, blocked_until, high_waiting_until)
+                    )
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            # A broken limiter must not take the upstream down with it
+            print(f"Rate limiter error in '{self.name}': {e}")
+            return 0.0
+        return wait
+
+    def acquire(self, cost=1, priority=PRIORITY_HIGH, max_wait=0.0):
+        """
+        Takes `cost` tokens, waiting up to `max_wait` seconds for them. Returns False if
+        they could not be had in time.
+        """
+        give_up_at = time.monotonic() + max_wait
+        while True:
+            wait = self.try_acquire(cost, priority, queue_for=max(give_up_at - time.monotonic(), 0.0))
+            if wait == 0:
+                with self._lock:
+                    self.granted += 1
+                return True
+            remaining = give_up_at - time.monotonic()
+            if wait > remaining:
+                with self._lock:
+                    self.denied += 1
+                return False
+            time.sleep(wait * random.uniform(1.0, WAIT_JITTER))
+
+    def block_for(self, seconds):
+        """
+        Stops every worker from calling the upstream for `seconds`, e.g. after a 429.
+        """
+        until = time.time() + seconds
+        try:
+            with shared_connection(self.db_path, RATE_LIMIT_SCHEMA) as conn:
+                conn.execute(
+                    "INSERT INTO rate_buckets (name, tokens, updated_at, blocked_until) VALUES (?, 0, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET blocked_until = MAX(blocked_until, excluded.blocked_until)",
+                    (self.name, time.time(), until)
+                )
+        except sqlite3.Error as e:
+            print(f"Rate limiter error in '{self.name}': {e}")
+        with self._lock:
+            self.blocks += 1
+
+    def stats(self):
+        """
+        Returns this bucket's remaining tokens and this process's grant/deny counters.
+        """
+        with self._lock:
+            stats = {'name': self.name, 'capacity': self.capacity, 'granted': self.granted,
+                     'denied': self.denied, 'blocks': self.blocks}
+        try:
+            with shared_connection(self.db_path, RATE_LIMIT_SCHEMA) as conn:
+                row = conn.execute(
+                    "SELECT tokens, updated_at, blocked_until FROM rate_buckets WHERE name = ?", (self.name,)
+                ).fetchone()
+        except sqlite3.Error:
+            row = None
+        now = time.time()
+        if row:
+            stats['tokens'] = round(min(self.capacity, row[0] + (now - row[1]) * self.refill_per_second), 2)
+            stats['blocked_for'] = round(max(row[2] - now, 0.0), 1)
+        else:
+            stats['tokens'], stats['blocked_for'] = self.capacity, 0.0
+        return stats
@@ -0,0 +1,143 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from cache import TTLCache, CACHE_DB_PATH
+
+try:
+    import fcntl
+except ImportError:  # No cross-process locking on Windows; duplicates are only coalesced per process
+    fcntl = None
+
+# --- Request Coalescing (single-flight) ---
+# Identical lookups that arrive while one is already running wait for it instead of
+# starting their own. Within a process, waiters block on an Event owned by the
+# leading call. Across worker processes, the leader holds an exclusive flock on a
+# per-key lock file and publishes a successful result to the shared SQLite cache;
+# callers in other processes wait for the lock, then pick the result up from the
+# cache. Failed results are handed to callers already waiting but never cached.
+
+DEFAULT_LOCK_DIR = os.environ.get("SINGLEFLIGHT_LOCK_DIR", os.path.join(tempfile.gettempdir(), "medicine-singleflight"))
+LOCK_POLL_INTERVAL = 0.05
+
+
+class _Call:
+    def __init__(self, key):
+        self.key = key
+        self.event = threading.Event()
+        self.result = None
+        self.lock_file = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent computations that share a key.
+
+    A caller runs begin(key). The first caller becomes the leader: it receives a
+    call handle, computes the result and must pass it to finish(). Every other
+    caller blocks in begin() and receives the leader's result instead of a handle.
+    """
+
+    def __init__(self, namespace, result_ttl=30, wait_timeout=90, max_entries=256, lock_dir=DEFAULT_LOCK_DIR,
+                 db_path=CACHE_DB_PATH):
+        self.namespace = namespace
+        self.wait_timeout = wait_timeout
+        self.lock_dir = lock_dir
+        # Published results must at least outlive the wait of callers queued behind the leader
+        self.results = TTLCache(namespace, max_entries=max_entries, default_ttl=result_ttl, db_path=db_path)
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def begin(self, key, timeout=None):
+        """
+        Returns (call, result). A leader gets (call, None) and must later call finish(call, ...).
+        A follower gets (None, result) with the leader's result. When no result could be
+        obtained (the leader crashed or the wait timed out) both are None and the caller
+        should compute on its own without calling finish(). Callers wait up to `timeout`
+        seconds for a leader, wait_timeout when omitted.
+        """
+        timeout = self.wait_timeout if timeout is None else min(timeout, self.wait_timeout)
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call(key)
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            if not call.event.wait(timeout):
+                return None, None
+            with self._lock:
+                self.coalesced += 1
+            return None, call.result
+
+        # In-process leader: now coordinate with the other worker processes
+        call.lock_file = self._acquire_file_lock(key, timeout)
+        cached = self.results.get(key)
+        if cached is not None:
+            # Another process finished this key while we waited for its lock
+            self._release(call, cached)
+            with self._lock:
+                self.coalesced += 1
+            return None, cached
+        return call, None
+
+    def finish(self, call, result, cacheable=True, ttl=None):
+        """
+        Publishes the leader's result to waiting callers. Only cacheable results are
+        shared with other processes, for `ttl` seconds; pass cacheable=False for errors.
+        """
+        if cacheable and result is not None:
+            self.results.set(call.key, result, ttl=ttl)
+        self._release(call, result)
+
+    def _release(self, call, result):
+        call.result = result
+        with self._lock:
+            self._calls.pop(call.key, None)
+        call.event.set()
+        lock_file = call.lock_file
+        if lock_file is not None:
+            call.lock_file = None
+            # Unlinking before unlocking keeps the lock directory from growing. A process that
+            # opened the old file meanwhile still finds the published result in the cache.
+            try:
+                os.unlink(lock_file.name)
+            except OSError:
+                pass
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def _acquire_file_lock(self, key, timeout):
+        """
+        Takes the cross-process lock for `key`, waiting up to `timeout` seconds for another
+        process to release it. Returns the open lock file, or None when locking is unavailable.
+        """
+        if fcntl is None:
+            return None
+        try:
+            os.makedirs(self.lock_dir, exist_ok=True)
+            digest = hashlib.sha256(f"{self.namespace}:{key}".encode('utf-8')).hexdigest()
+            lock_file = open(os.path.join(self.lock_dir, f"{digest}.lock"), 'a')
+        except OSError as e:
+            print(f"Single-flight lock error in '{self.namespace}': {e}")
+            return None
+
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return lock_file
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    print(f"Timed out waiting for in-flight '{key}' in another process; computing it here.")
+                    lock_file.close()
+                    return None
+                time.sleep(LOCK_POLL_INTERVAL)
+
+    def stats(self):
+        with self._lock:
+            return {'in_flight': len(self._calls), 'coalesced': self.coalesced}
@@ -0,0 +1,225 @@
+import json
+from concurrent.futures import FIRST_COMPLETED, wait
+
+# --- Stage Graph ---
+# A medicine lookup is split into named stages (composition, prices, alternatives,
+# ...) that declare which other stages they need. A route asks the graph for the
+# stages it wants; the graph runs those plus their dependencies, starting each stage
+# as soon as its inputs are ready so independent stages run in parallel. Every
+# stage's output is cached under the inputs it is keyed on (the medicine name, its
+# composition, or both), so a user who opens the price page after searching reuses
+# the earlier work instead of repeating its Google and Groq calls. Concurrent
+# computations of the same stage are coalesced through a SingleFlight.
+#
+# A run may carry a request Deadline. Stages that have not started when it passes
+# are skipped, and stages still running are given up on: they keep going in the
+# background and cache their result for the next request, but the run reports
+# them as timed out so the route can answer with what it has.
+#
+# A stage that can only offer a stand-in (say, a similar medicine's data while the web
+# is down) returns it wrapped in Degraded. Dependent stages see the plain value, but it
+# is never cached, and the run records the stage's note so the route can show it.
+#
+# Callers coalesced onto a computation get its outcome whatever it is: a stage that
+# fails fails for all of them at once, rather than each retrying an upstream that is
+# down or rate-limiting.
+
+
+class StageError(Exception):
+    """
+    A stage failure carrying a user-facing message and the HTTP status to report it with.
+    """
+
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+    @property
+    def timed_out(self):
+        return self.status == 504
+
+
+class Degraded:
+    """
+    A stand-in value returned by a stage that could not compute the real one, with a
+    user-facing `note` saying what was substituted.
+    """
+
+    def __init__(self, value, note):
+        self.value = value
+        self.note = note
+
+
+class _Failed:
+    """
+    A leader's exception, handed to the callers coalesced onto its computation.
+    """
+
+    def __init__(self, error):
+        self.error = error
+
+
+# Handed to coalesced callers when the leader's stage returned None, which SingleFlight
+# would otherwise report as "no result obtained" and so send every caller to recompute
+_NOTHING = object()
+
+
+class Stage:
+    def __init__(self, name, compute, requires, key, ttl):
+        self.name = name
+        self.compute = compute
+        self.requires = requires
+        self.key = key
+        self.ttl = ttl
+
+
+def normalize_key_value(value):
+    return " ".join(str(value).lower().split())
+
+
+class StageGraph:
+    """
+    A registry of stages and a scheduler that runs them on `executor`.
+
+    Stages are registered with the stage() decorator. A stage function receives a dict
+    holding the run's inputs (always including 'deadline', which may be None) and the
+    results of every stage computed so far, and returns a JSON-serializable value or
+    raises StageError. A stage that returns None ("nothing found this time") or a
+    Degraded stand-in is not cached. Stages that depend on a failed stage fail with the same error.
+    """
+
+    def __init__(self, executor, flights, key_normalizers=None):
+        self.executor = executor
+        self.flights = flights
+        self.cache = flights.results
+        self.key_normalizers = key_normalizers or {}
+        self.stages = {}
+
+    def stage(self, name, requires=(), key=('medicine',), ttl=None):
+        """
+        Registers the decorated function as stage `name`, cached per the values of `key`
+        (input or stage names) for `ttl` seconds.
+        """
+        def decorator(compute):
+            self.stages[name] = Stage(name, compute, tuple(requires), tuple(key), ttl)
+            return compute
+        return decorator
+
+    def run(self, targets, deadline=None, notes=None, **inputs):
+        """
+        Runs `targets` to completion or until `deadline`. Returns (results, errors): dicts
+        mapping stage names to their values and to StageErrors respectively. Stages that
+        fell back to a Degraded value have their note put in the `notes` dict, if given.
+        """
+        results, errors = {}, {}
+        for name, value, error in self.iter_run(targets, deadline, notes, **inputs):
+            if error is not None:
+                errors[name] = error
+            else:
+                results[name] = value
+        return results, errors
+
+    def iter_run(self, targets, deadline=None, notes=None, **inputs):
+        """
+        Runs `targets` and the stages they need, yielding (name, value, error) as each one
+        settles. Keyword inputs such as `medicine` may also pre-fill stage results.
+        Notes of Degraded values are put in `notes` before their stage is yielded.
+        """
+        pending = self._plan(targets, inputs)
+        values = dict(inputs, deadline=deadline)
+        errors = {}
+        out_of_time = StageError("The request ran out of time. Please try again in a moment.", 504)
+        running = {}
+        while pending or running:
+            for name in list(pending):
+                stage = self.stages[name]
+                failed = next((errors[r] for r in stage.requires if r in errors), None)
+                if failed is None and deadline is not None and deadline.expired():
+                    failed = out_of_time
+                if failed is not None:
+                    pending.remove(name)
+                    errors[name] = failed
+                    yield name, None, failed
+                elif all(r in values for r in stage.requires):
+                    pending.remove(name)
+                    running[self.executor.submit(self._compute, stage, dict(values))] = name
+            if not running:
+                continue
+
+            done, _ = wait(running, timeout=deadline.remaining() if deadline else None, return_when=FIRST_COMPLETED)
+            if not done:
+                # The deadline passed; stop waiting for the stages still running
+                for future, name in list(running.items()):
+                    del running[future]
+                    print(f"Stage '{name}' did not finish in time; continuing without it.")
+                    errors[name] = out_of_time
+                    yield name, None, out_of_time
+                continue
+            for future in done:
+                name = running.pop(future)
+                try:
+                    value = future.result()
+                    if isinstance(value, Degraded):
+                        if notes is not None:
+                            notes[name] = value.note
+                        value = value.value
+                    values[name] = value
+                except StageError as e:
+                    errors[name] = e
+                except Exception as e:
+                    print(f"Unexpected error in stage '{name}': {e}")
+                    errors[name] = StageError("An unexpected server error occurred.")
+                if name in errors:
+                    yield name, None, errors[name]
+                else:
+                    yield name, values[name], None
+
+    def _plan(self, targets, inputs):
+        """
+        Returns the stages needed for `targets`, dependencies first, skipping pre-filled ones.
+        """
+        order = []
+
+        def visit(name):
+            if name in inputs or name in order:
+                return
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage '{name}'")
+            for required in self.stages[name].requires:
+                visit(required)
+            order.append(name)
+
+        for target in targets:
+            visit(target)
+        return order
+
+    def _compute(self, stage, values):
+        key = f"{stage.name}:" + json.dumps([
+            self.key_normalizers.get(field, normalize_key_value)(values[field]) for field in stage.key
+        ])
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        call, shared = self.flights.begin(key)
+        if isinstance(shared, _Failed):
+            # The leader just failed; asking the upstream again at once would only fail again
+            raise shared.error
+        if shared is _NOTHING:
+            return None
+        if shared is not None:
+            return shared
+        outcome = None
+        try:
+            value = stage.compute(values)
+            outcome = _NOTHING if value is None else value
+            return value
+        except Exception as e:
+            outcome = _Failed(e)
+            raise
+        finally:
+            if call is not None:
+                # Failures, empty results and stand-ins reach the callers already waiting but are never cached
+                cacheable = outcome is not _NOTHING and not isinstance(outcome, (_Failed, Degraded))
+                self.flights.finish(call, outcome, cacheable=cacheable, ttl=stage.ttl)
@@ -27,16 +27,16 @@ if (form) {
         resultsContainer.innerHTML = '';
         loader.style.display = 'block';
         try {
-            const response = await fetch('/search', {
+            const response = await fetch('/search/stream', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ medicine_name: userQuery })
             });
-            const data = await response.json();
-            if (!response.ok || data.error) {
+            if (!response.ok || !response.body) {
+                const data = await response.json().catch(() => ({}));
                 throw new Error(data.error || 'An unknown error occurred.');
             }
-            displayResults(data, userQuery);
+            await readSearchStream(response.body, userQuery);
         } catch (error) {
             displayError(error.message);
         } finally {
@@ -45,11 +45,92 @@ if (form) {
     });
 }
 
+// Reads the Server-Sent Events from /search/stream and renders each stage as it arrives
+async function readSearchStream(body, userQuery) {
+    const reader = body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let synthesisText = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let eventName = 'message';
+            let dataText = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) eventName = line.slice(7);
+                else if (line.startsWith('data: ')) dataText += line.slice(6);
+            });
+            const payload = dataText ? JSON.parse(dataText) : {};
+            if (eventName === 'composition') {
+                loader.style.display = 'none';
+                displayProgress(payload, userQuery);
+            } else if (eventName === 'section') {
+                markSectionDone(payload);
+            } else if (eventName === 'synthesis') {
+                synthesisText += payload.delta;
+                showPartialSynthesis(synthesisText);
+            } else if (eventName === 'result') {
+                displayResults(payload, userQuery);
+                return;
+            } else if (eventName === 'error') {
+                throw new Error(payload.error || 'An unknown error occurred.');
+            }
+        }
+    }
+    throw new Error('The search ended unexpectedly. Please try again.');
+}
+
+function displayProgress(data, userQuery) {
+    resultsContainer.innerHTML = `
+        <div class="results-card">
+            <div class="results-header">
+                <div class="title-block">
+                    <h2>${data.identified_medicine || userQuery}</h2>
+                    <div class="info-line">
+                        <span class="label">Generic Name:</span>
+                        <span class="value">${data.generic_name || "N/A"}</span>
+                    </div>
+                    <div class="info-line">
+                        <span class="label">Composition:</span>
+                        <span class="value">${data.composition || "Not specified"}</span>
+                    </div>
+                </div>
+            </div>
+            <ul id="search-progress" class="search-progress"></ul>
+            <p id="partial-synthesis" class="generic-info-paragraph"></p>
+        </div>`;
+}
+
+function markSectionDone(section) {
+    const progress = document.getElementById('search-progress');
+    if (!progress) return;
+    const label = section.section.replace(/_/g, ' ');
+    const item = document.createElement('li');
+    item.innerHTML = `<i class="fas fa-check"></i> Gathered ${label} (${section.results_found} sources)`;
+    progress.appendChild(item);
+}
+
+// Shows the generic information paragraph while the AI report is still being written
+function showPartialSynthesis(text) {
+    const target = document.getElementById('partial-synthesis');
+    if (!target) return;
+    const match = text.match(/"generic_info_paragraph"\s*:\s*"((?:[^"\\]|\\.)*)/);
+    if (match) {
+        target.textContent = match[1].replace(/\\n/g, ' ').replace(/\\"/g, '"');
+    }
+}
+
 function displayResults(data, userQuery) {
     let resultsHtml = `<div class="results-card">`;
     resultsHtml += `<div class="results-header">`;
     if (data.image_url) {
-        resultsHtml += `<img src="${data.image_url}" alt="Image of ${data.identified_medicine}">`;
+        // The image is resolved by the server only when requested; hide it if none is found
+        resultsHtml += `<img src="${data.image_url}" alt="Image of ${data.identified_medicine}" onerror="this.onerror=null; this.style.display='none';">`;
     }
     resultsHtml += `<div class="title-block">
             <h2>${data.identified_medicine || userQuery}</h2>
@@ -63,6 +144,13 @@ function displayResults(data, userQuery) {
             </div>
         </div>
     </div>`;
+    if (data.missing_sections && data.missing_sections.length > 0) {
+        const missing = data.missing_sections.map(section => section.replace(/_/g, ' ')).join(', ');
+        resultsHtml += `<p class="no-info">Some sections could not be loaded in time (${missing}). Search again in a moment for the full report.</p>`;
+    }
+    Object.values(data.degraded_sections || {}).forEach(note => {
+        resultsHtml += `<p class="no-info">${note}</p>`;
+    });
     resultsHtml += `
         <div class="tabs">
             <button class="tab-button active" data-tab="tab-generic-info"><i class="fas fa-info-circle"></i> About</button>
@@ -139,6 +227,47 @@ function initializeKendraFinder() {
 }
 
 // --- AI Assistant Chat UI ---
+// Streams a reply from /ai-assistant/stream, calling onText with the reply so far after every chunk.
+// Resolves with the full reply text.
+async function streamAIReply(userMsg, onText) {
+    const res = await fetch('/ai-assistant/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ message: userMsg })
+    });
+    if (!res.ok || !res.body) {
+        const data = await res.json().catch(() => ({}));
+        throw new Error(data.reply || 'Sorry, I could not process your request.');
+    }
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let replyText = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            const eventLine = rawEvent.split('\n').find(line => line.startsWith('event: '));
+            const dataLine = rawEvent.split('\n').find(line => line.startsWith('data: '));
+            const eventName = eventLine ? eventLine.slice(7) : 'message';
+            const payload = dataLine ? JSON.parse(dataLine.slice(6)) : {};
+            if (eventName === 'delta') {
+                replyText += payload.delta;
+                onText(replyText);
+            } else if (eventName === 'error') {
+                throw new Error(payload.reply || 'Sorry, there was an error processing your request.');
+            } else if (eventName === 'done') {
+                return replyText;
+            }
+        }
+    }
+    return replyText;
+}
+
 function createAIChatUI() {
     const container = document.getElementById('ai-chat-container');
     if (!container) return;
@@ -170,15 +299,13 @@ function createAIChatUI() {
         appendMessage('ai', '<span class="ai-loading">...</span>');
         chatWindow.scrollTop = chatWindow.scrollHeight;
         try {
-            const res = await fetch('/ai-assistant', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ message: userMsg })
+            const aiReply = await streamAIReply(userMsg, (replySoFar) => {
+                replaceLastAIMessage(converter.makeHtml(replySoFar));
+                chatWindow.scrollTop = chatWindow.scrollHeight;
             });
-            const data = await res.json();
-            const aiReply = data.reply || 'Sorry, I could not process your request.';
-            const htmlReply = converter.makeHtml(aiReply);
-            replaceLastAIMessage(htmlReply);
+            if (!aiReply) {
+                replaceLastAIMessage('Sorry, I could not process your request.');
+            }
         } catch (err) {
             replaceLastAIMessage('Sorry, there was an error contacting the AI.');
         } finally {
@@ -475,19 +602,23 @@ function createBlogUI() {
             content: 'Pharmacists can advise on medicine use, side effects, and interactions. Consult them for any doubts about your prescription.'
         }
     ];
-    container.innerHTML = `
-        <div class="blog-grid">
-            ${blogs.map((blog, i) => `
-                <div class="blog-card" data-idx="${i}">
-                    <img src="${blog.img}" alt="${blog.title}" class="blog-img" />
-                    <div class="blog-info">
-                        <h4>${blog.title}</h4>
-                        <div class="blog-meta">By ${blog.author} | ${blog.date}</div>
-                        <div class="blog-summary">${blog.summary}</div>
-                    </div>
-                </div>
-            `).join('')}
+    // Cards are rendered a page at a time and their images load lazily, so the page
+    // stays fast however long the list grows
+    const BLOG_PAGE_SIZE = 12;
+    let rendered = 0;
+    const blogCard = (blog, i) => `
+        <div class="blog-card" data-idx="${i}">
+            <img src="${blog.img}" alt="${blog.title}" class="blog-img" loading="lazy" />
+            <div class="blog-info">
+                <h4>${blog.title}</h4>
+                <div class="blog-meta">By ${blog.author} | ${blog.date}</div>
+                <div class="blog-summary">${blog.summary}</div>
+            </div>
         </div>
+    `;
+    container.innerHTML = `
+        <div class="blog-grid"></div>
+        <div class="text-center mt-3"><button id="blog-load-more" class="btn btn-primary" style="display:none;">Load more</button></div>
         <div id="blog-modal" class="blog-modal" style="display:none;">
             <div class="blog-modal-content">
                 <span class="blog-modal-close">&times;</span>
@@ -498,6 +629,17 @@ function createBlogUI() {
             </div>
         </div>
     `;
+    const grid = container.querySelector('.blog-grid');
+    const loadMoreBtn = document.getElementById('blog-load-more');
+    function renderNextPage() {
+        const page = blogs.slice(rendered, rendered + BLOG_PAGE_SIZE);
+        grid.insertAdjacentHTML('beforeend', page.map((blog, i) => blogCard(blog, rendered + i)).join(''));
+        rendered += page.length;
+        loadMoreBtn.style.display = rendered < blogs.length ? '' : 'none';
+    }
+    loadMoreBtn.addEventListener('click', renderNextPage);
+    renderNextPage();
+
     // Modal logic
     const modal = document.getElementById('blog-modal');
     const closeBtn = modal.querySelector('.blog-modal-close');
@@ -505,17 +647,17 @@ function createBlogUI() {
     const modalTitle = document.getElementById('modal-title');
     const modalMeta = document.getElementById('modal-meta');
     const modalContent = document.getElementById('modal-content');
-    container.querySelectorAll('.blog-card').forEach(card => {
-        card.addEventListener('click', function() {
-            const idx = parseInt(this.getAttribute('data-idx'));
-            const blog = blogs[idx];
-            modalImg.src = blog.img;
-            modalImg.alt = blog.title;
-            modalTitle.textContent = blog.title;
-            modalMeta.textContent = `By ${blog.author} | ${blog.date}`;
-            modalContent.textContent = blog.content;
-            modal.style.display = 'flex';
-        });
+    // One delegated listener instead of one per card
+    grid.addEventListener('click', (e) => {
+        const card = e.target.closest('.blog-card');
+        if (!card) return;
+        const blog = blogs[parseInt(card.getAttribute('data-idx'))];
+        modalImg.src = blog.img;
+        modalImg.alt = blog.title;
+        modalTitle.textContent = blog.title;
+        modalMeta.textContent = `By ${blog.author} | ${blog.date}`;
+        modalContent.textContent = blog.content;
+        modal.style.display = 'flex';
     });
     closeBtn.addEventListener('click', () => { modal.style.display = 'none'; });
     modal.addEventListener('click', (e) => { if (e.target === modal) modal.style.display = 'none'; });
@@ -0,0 +1,28 @@
+import importlib.util
+import os
+import sys
+import tempfile
+
+import pytest
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Set before any module reads them, so tests never touch the working tree's cache,
+# lock files or keys
+_scratch = tempfile.mkdtemp(prefix="root_tests_")
+os.environ["CACHE_DB_PATH"] = os.path.join(_scratch, "cache.sqlite3")
+os.environ["SINGLEFLIGHT_LOCK_DIR"] = os.path.join(_scratch, "locks")
+os.environ.pop("IMAGE_URL_SECRET", None)
+
+
+@pytest.fixture(scope="session")
+def flask_app():
+    """
+    The Flask app module (app.py). It is loaded by path because the name `app` may
+    already belong to the backend package when both test suites run together.
+    """
+    spec = importlib.util.spec_from_file_location("flask_app", os.path.join(REPOSITORY_ROOT, "app.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["flask_app"] = module
+    spec.loader.exec_module(module)
+    return module
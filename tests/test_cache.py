@@ -0,0 +1,148 @@
+import threading
+import time
+
+import cache
+from cache import TTLCache, shared_connection, sweep_expired
+
+
+def test_values_are_shared_through_the_disk_tier(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    TTLCache('search', db_path=db_path).set('q', {'items': [1, 2]})
+
+    other_process = TTLCache('search', db_path=db_path)
+    assert other_process.get('q') == {'items': [1, 2]}
+    assert other_process.stats()['disk_hits'] == 1
+    assert TTLCache('groq', db_path=db_path).get('q') is None
+
+
+def test_expired_entries_miss_but_stay_available_as_stale(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    TTLCache('search', db_path=db_path).set('q', 'old', ttl=-1)
+
+    cache = TTLCache('search', db_path=db_path)
+    assert cache.get('q') is None
+    assert cache.get_stale('q') == 'old'
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = TTLCache('search', max_entries=2, db_path=None)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+
+def test_purge_removes_matching_keys_only(tmp_path):
+    cache = TTLCache('search', db_path=str(tmp_path / "cache.sqlite3"))
+    cache.set('dolo 650', 1)
+    cache.set('crocin', 2)
+
+    assert cache.purge(contains='dolo') == 1
+    assert cache.get('dolo 650') is None
+    assert cache.get('crocin') == 2
+
+
+def test_sweep_deletes_entries_past_the_grace_period(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    cache = TTLCache('search', db_path=db_path)
+    cache.set('long_gone', 1, ttl=-3600)
+    cache.set('recently_expired', 2, ttl=-10)
+    cache.set('fresh', 3)
+
+    assert sweep_expired(db_path, grace=60) == 1
+    with shared_connection(db_path) as conn:
+        keys = {row[0] for row in conn.execute("SELECT key FROM cache_entries")}
+    assert keys == {'recently_expired', 'fresh'}
+
+
+def test_threads_share_a_bounded_pool_of_connections(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DB_POOL_SIZE", 2)
+    db_path = str(tmp_path / "cache.sqlite3")
+    seen, active, most_active = [], [], []
+    lock = threading.Lock()
+
+    def use_connection():
+        with shared_connection(db_path) as conn:
+            with lock:
+                seen.append(conn.conn)
+                active.append(conn)
+                most_active.append(len(active))
+            time.sleep(0.01)
+            with lock:
+                active.remove(conn)
+
+    threads = [threading.Thread(target=use_connection) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(seen) == 8
+    assert len({id(conn) for conn in seen}) <= 2
+    assert max(most_active) <= 2
+
+
+def test_a_held_write_transaction_does_not_block_cache_reads(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    reader = TTLCache('search', db_path=db_path)
+    TTLCache('search', db_path=db_path).set('q', 1)
+    in_transaction, release = threading.Event(), threading.Event()
+
+    def hold_write_lock():
+        # As a rate limiter transaction waiting on another process would
+        with shared_connection(db_path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            in_transaction.set()
+            release.wait(5)
+            conn.execute("COMMIT")
+
+    holder = threading.Thread(target=hold_write_lock)
+    holder.start()
+    in_transaction.wait()
+    started = time.monotonic()
+    assert reader.get('q') == 1
+    assert time.monotonic() - started < 1
+    release.set()
+    holder.join()
+
+
+def test_sqlite_calls_leave_the_gevent_loop(monkeypatch):
+    ran_in_pool = []
+
+    class FakeThreadPool:
+        def apply(self, function, args):
+            ran_in_pool.append(function)
+            return function(*args)
+
+    class FakeHub:
+        threadpool = FakeThreadPool()
+
+    monkeypatch.setattr(cache, "get_hub", lambda: FakeHub())
+    monkeypatch.setattr(cache, "is_module_patched", lambda module: True, raising=False)
+    assert cache._blocking(lambda a, b: a + b, 1, 2) == 3
+    assert len(ran_in_pool) == 1
+
+
+def test_purges_reach_other_processes_memory_tier(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_PURGE_CHECK_INTERVAL", 0)
+    db_path = str(tmp_path / "cache.sqlite3")
+    worker_a, worker_b = TTLCache('search', db_path=db_path), TTLCache('search', db_path=db_path)
+    worker_a.set('dolo 650', 1)
+    worker_a.set('crocin', 2)
+    assert worker_b.get('dolo 650') == 1 and worker_b.get('crocin') == 2
+
+    worker_a.purge(contains='dolo')
+    assert worker_b.get('dolo 650') is None
+    assert worker_b.get_stale('dolo 650') is None
+    assert worker_b.get('crocin') == 2
+
+    # Entries stored after the purge are kept
+    worker_b.set('dolo 650', 3)
+    assert worker_b.get('dolo 650') == 3
+    worker_a.purge()
+    assert worker_b.get('crocin') is None and worker_b.get('dolo 650') is None
+
@@ -0,0 +1,74 @@
+import json
+
+import context_compactor
+from context_compactor import clean_snippet, compact_results, compact_snippets, dedupe, estimate_tokens
+
+
+def test_clean_snippet_strips_dates_calls_to_action_and_ellipses():
+    snippet = "Mar 3, 2024 — Paracetamol relieves pain ... Buy now! Free delivery."
+    assert clean_snippet(snippet) == "Paracetamol relieves pain"
+
+
+def test_dedupe_drops_near_duplicates_within_a_group_only():
+    items = [
+        ("a.com", "Paracetamol is used to treat fever and mild pain in adults"),
+        ("a.com", "Paracetamol is used to treat fever and mild pain in children"),
+        ("b.com", "Paracetamol is used to treat fever and mild pain in adults"),
+    ]
+    kept = dedupe(items, text_of=lambda item: item[1], group_of=lambda item: item[0])
+    assert kept == [items[0], items[2]]
+
+
+def test_compact_snippets_stays_within_the_token_budget():
+    results = [{'snippet': f"Result {i} describes a distinct use number {i} of the drug"} for i in range(50)]
+    compacted = compact_snippets(results, max_tokens=40)
+    assert compacted.startswith("Result 0 ")
+    assert estimate_tokens(compacted) <= 40
+
+
+def test_compact_results_keeps_the_highest_ranked_results_as_json():
+    results = [
+        {'title': f"Store {i}", 'snippet': f"Brand {i} costs {i * 10} rupees", 'link': f"https://store{i}.example/x",
+         'pagemap': {'large': 'ignored'}}
+        for i in range(30)
+    ]
+    kept = json.loads(compact_results(results, max_tokens=60))
+    assert 0 < len(kept) < 30
+    assert [entry['title'] for entry in kept] == [f"Store {i}" for i in range(len(kept))]
+    assert set(kept[0]) == {'title', 'snippet', 'link'}
+
+
+def test_estimate_tokens_handles_empty_text():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens(None) == 0
+    assert estimate_tokens("word") >= 1
+
+
+def test_token_counts_never_load_the_tokenizer_themselves(monkeypatch):
+    loads = []
+
+    class FakeEncoding:
+        def encode(self, text, disallowed_special=()):
+            return text.split()
+
+    class FakeTiktoken:
+        @staticmethod
+        def get_encoding(name):
+            loads.append(name)
+            return FakeEncoding()
+
+    monkeypatch.setattr(context_compactor, "tiktoken", FakeTiktoken)
+    monkeypatch.setattr(context_compactor, "_encoding", None)
+    assert estimate_tokens("one two three four five six seven eight") == 10
+    assert loads == []
+
+    assert context_compactor.load_tokenizer() is True
+    assert loads == ["cl100k_base"]
+    assert estimate_tokens("one two three four five six seven eight") == 8
+
+
+def test_missing_tiktoken_falls_back_to_the_estimate(monkeypatch):
+    monkeypatch.setattr(context_compactor, "tiktoken", None)
+    monkeypatch.setattr(context_compactor, "_encoding", None)
+    assert context_compactor.load_tokenizer() is False
+    assert estimate_tokens("x" * 40) == 10
@@ -0,0 +1,26 @@
+import threading
+
+
+def test_generated_image_key_is_kept_and_shared(flask_app, tmp_path):
+    path = str(tmp_path / "image_url_secret")
+    keys = []
+    threads = [threading.Thread(target=lambda: keys.append(flask_app.persisted_secret(path))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Every worker, and the next start, reads the same key
+    assert len(set(keys)) == 1 and len(keys[0]) == 64
+    assert flask_app.persisted_secret(path) == keys[0]
+    assert list(tmp_path.iterdir()) == [tmp_path / "image_url_secret"]
+
+
+def test_image_urls_are_signed_with_the_persisted_key(flask_app):
+    assert flask_app.IMAGE_URL_SECRET == flask_app.persisted_secret(flask_app.IMAGE_URL_SECRET_PATH).encode('utf-8')
+    with flask_app.app.test_request_context():
+        url = flask_app.medicine_image_url("Unlisted Brand 10")
+    assert f"sig={flask_app.image_signature('unlisted brand 10')}" in url
+
+    client = flask_app.app.test_client()
+    assert client.get("/medicine-image/unlisted%20brand%2010?sig=forged").status_code == 403
@@ -0,0 +1,66 @@
+import math
+import random
+
+import pytest
+
+from kendras import EARTH_RADIUS_KM, KendraIndex
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+@pytest.fixture
+def kendras():
+    rng = random.Random(7)
+    return [
+        {'name': f'Kendra {i}', 'city': rng.choice(['Delhi', 'Pune', 'Chennai']),
+         'lat': rng.uniform(8, 35), 'lng': rng.uniform(68, 97)}
+        for i in range(500)
+    ]
+
+
+def brute_force(kendras, lat, lng, k):
+    return sorted(kendras, key=lambda kendra: haversine_km(lat, lng, kendra['lat'], kendra['lng']))[:k]
+
+
+def test_nearest_matches_brute_force(kendras):
+    index = KendraIndex(kendras)
+    for lat, lng in [(28.6, 77.2), (13.0, 80.2), (19.0, 72.8), (34.9, 96.9)]:
+        found = index.nearest(lat, lng, k=5)
+        assert [kendra['name'] for kendra in found] == [kendra['name'] for kendra in brute_force(kendras, lat, lng, 5)]
+        assert [kendra['distance'] for kendra in found] == sorted(kendra['distance'] for kendra in found)
+
+
+def test_radius_and_city_filters(kendras):
+    index = KendraIndex(kendras)
+    within = index.nearest(20.0, 80.0, k=500, radius_km=300)
+    expected = [kendra for kendra in kendras if haversine_km(20.0, 80.0, kendra['lat'], kendra['lng']) <= 300]
+    assert len(within) == len(expected)
+
+    in_pune = index.nearest(20.0, 80.0, k=3, city=' pune ')
+    assert [kendra['name'] for kendra in in_pune] == [
+        kendra['name'] for kendra in brute_force([k for k in kendras if k['city'] == 'Pune'], 20.0, 80.0, 3)
+    ]
+    assert index.nearest(20.0, 80.0, city='Nowhere') == []
+
+
+def test_results_do_not_mutate_stored_kendras(kendras):
+    index = KendraIndex(kendras)
+    index.nearest(28.6, 77.2, k=3)
+    assert all('distance' not in kendra for kendra in index.kendras)
+
+
+def test_batch_agrees_with_single_queries(kendras):
+    index = KendraIndex(kendras)
+    points = [(28.6, 77.2), (13.0, 80.2), (22.5, 88.3)]
+    for point, batch in zip(points, index.nearest_batch(points, k=3)):
+        assert [kendra['name'] for kendra in batch] == [kendra['name'] for kendra in index.nearest(*point, k=3)]
+
+
+def test_bundled_kendras_load():
+    index = KendraIndex.load()
+    assert len(index) > 0
+    assert index.nearest(28.6, 77.2, k=1)[0]['city']
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def prices(flask_app, monkeypatch):
+    """
+    Stands in for the /price-comparison compute step, answering with a numbered price.
+    """
+    calls = []
+    computed = threading.Event()
+
+    def compute_price_comparison(medicine_name, deadline):
+        calls.append(medicine_name)
+        computed.set()
+        return {'medicine_name': medicine_name, 'prices': [len(calls)], 'missing_sections': []}, 200
+
+    monkeypatch.setitem(flask_app.LOOKUPS, 'price-comparison', compute_price_comparison)
+    compute_price_comparison.calls = calls
+    compute_price_comparison.computed = computed
+    return compute_price_comparison
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_fresh_responses_are_served_from_cache(flask_app, prices):
+    client = flask_app.app.test_client()
+    first = client.post('/price-comparison', json={'medicine_name': 'Dolo 650'})
+    again = client.post('/price-comparison', json={'medicine_name': ' dolo  650 '})
+
+    assert first.status_code == again.status_code == 200
+    assert again.get_json()['prices'] == first.get_json()['prices'] == [1]
+    assert prices.calls == ['Dolo 650']
+
+
+def test_stale_responses_are_served_while_a_background_refresh_replaces_them(flask_app, prices):
+    client = flask_app.app.test_client()
+    client.post('/price-comparison', json={'medicine_name': 'Crocin 500'})
+    key = flask_app.coalesce_key('price-comparison', 'Crocin 500')
+    entry = flask_app.response_cache.get(key)
+    flask_app.response_cache.set(key, dict(entry, fresh_until=time.time() - 1))
+    # By the time a response goes stale, the result shared with coalesced requests is long gone
+    flask_app.request_flights.results.purge(key)
+    prices.computed.clear()
+
+    stale = client.post('/price-comparison', json={'medicine_name': 'Crocin 500'})
+    assert stale.status_code == 200
+    assert stale.get_json()['prices'] == [1]
+
+    assert prices.computed.wait(5)
+    wait_for(lambda: flask_app.response_cache.get(key)['payload']['prices'] == [2])
+    refreshed = flask_app.response_cache.get(key)
+    assert refreshed['fresh_until'] > time.time()
+    assert client.post('/price-comparison', json={'medicine_name': 'Crocin 500'}).get_json()['prices'] == [2]
+    assert prices.calls == ['Crocin 500', 'Crocin 500']
+
+
+def test_responses_can_be_refreshed_outside_a_request(flask_app, prices):
+    payload, status = flask_app.refresh_response('price-comparison', 'Calpol 250')
+
+    assert (payload['prices'], status) == ([1], 200)
+    entry = flask_app.response_cache.get(flask_app.coalesce_key('price-comparison', 'calpol 250'))
+    assert entry['payload'] == payload
+
+
+def test_incomplete_responses_are_not_cached(flask_app, monkeypatch):
+    calls = []
+
+    def compute_price_comparison(medicine_name, deadline):
+        calls.append(medicine_name)
+        return {'medicine_name': medicine_name, 'prices': [], 'missing_sections': ['prices']}, 200
+
+    monkeypatch.setitem(flask_app.LOOKUPS, 'price-comparison', compute_price_comparison)
+    client = flask_app.app.test_client()
+    for _ in range(2):
+        assert client.post('/price-comparison', json={'medicine_name': 'Pacimol 650'}).status_code == 200
+    assert calls == ['Pacimol 650', 'Pacimol 650']
+
+
+@pytest.mark.parametrize("route", ['/search', '/search/stream', '/alternative-medicine-price', '/price-comparison'])
+@pytest.mark.parametrize("body, error", [
+    (['Dolo 650'], "Invalid request: expected a JSON object."),
+    ("Dolo 650", "Invalid request: expected a JSON object."),
+    ({'medicine_name': 650}, "Please enter a medicine name."),
+    ({'medicine_name': '  '}, "Please enter a medicine name."),
+])
+def test_lookups_reject_bodies_without_a_medicine_name(flask_app, route, body, error):
+    response = flask_app.app.test_client().post(route, json=body)
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
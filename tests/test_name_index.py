@@ -0,0 +1,61 @@
+import pytest
+
+from backend.app import name_index
+from backend.app.name_index import NameIndex, edit_distance, tokenize
+
+
+@pytest.fixture
+def index():
+    index = NameIndex()
+    for name in ["Crocin Advance", "Crocin Pain Relief", "Dolo 650", "Augmentin 625 Duo",
+                 "Paracetamol", "Pantocid 40", "Pantocid DSR", "Cefix", "Cefox"]:
+        index.add(name)
+    return index
+
+
+def test_tokenize_folds_strengths_and_punctuation():
+    assert tokenize("Dolo-650mg Tablet") == ["dolo", "650", "tablet"]
+
+
+def test_edit_distance_counts_transpositions_and_stops_early():
+    assert edit_distance("paracetamol", "paracetmaol", 2) == 1
+    assert edit_distance("cefix", "cefox", 1) == 1
+    assert edit_distance("abcdef", "uvwxyz", 2) == 3
+
+
+def test_search_tolerates_typos_and_partial_words(index):
+    assert index.search("paracetmol")[0]['name'] == "Paracetamol"
+    assert index.search("augm")[0]['name'] == "Augmentin 625 Duo"
+    assert index.search("augm", complete_prefixes=False) == []
+
+
+def test_correct_rewrites_unambiguous_misspellings(index):
+    assert index.correct("dollo 650")['name'] == "Dolo 650"
+    assert index.correct("paracetmol")['name'] == "Paracetamol"
+
+
+@pytest.mark.parametrize("query", [
+    "crocin",    # a real word that several products start with
+    "croc",      # prefix completion only
+    "pantocid",  # two products share the word
+    "cefax",     # equally close to two names
+    "zzz",
+])
+def test_correct_leaves_partial_or_ambiguous_queries_alone(index, query):
+    assert index.correct(query) is None
+
+
+def test_common_tokens_score_a_bounded_number_of_names(monkeypatch):
+    monkeypatch.setattr(name_index, "MAX_SCORED_CANDIDATES", 20)
+    index = NameIndex()
+    for n in range(300):
+        index.add(f"Brand{n} Extra Words 650")
+        index.add(f"Other{n} Tablet")
+    index.add("Dolo 650")
+    index.add("Zydol Tablet 650")
+
+    assert len(index._candidate_names([index._candidate_tokens("650")])) == 20
+    # Postings are shortest name first, so the closest names survive the cut
+    assert index.search("650")[0]['name'] == "Dolo 650"
+    # The one name with both common tokens is found even though neither token is rare
+    assert index.search("tablet 650")[0]['name'] == "Zydol Tablet 650"
@@ -0,0 +1,83 @@
+import sqlite3
+import threading
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from rate_limiter import LOW_PRIORITY_RESERVE, PRIORITY_HIGH, PRIORITY_LOW, TokenBucket, parse_retry_after
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "cache.sqlite3")
+
+
+def test_bucket_grants_until_empty(db_path):
+    bucket = TokenBucket('groq', capacity=10, refill_per_second=0.001, db_path=db_path)
+    assert bucket.acquire(6)
+    assert not bucket.acquire(6)
+    assert bucket.stats()['granted'] == 1 and bucket.stats()['denied'] == 1
+
+
+def test_low_priority_calls_leave_the_reserve(db_path):
+    bucket = TokenBucket('google', capacity=10, refill_per_second=0.001, db_path=db_path)
+    low_grants = sum(bucket.acquire(1, PRIORITY_LOW) for _ in range(10))
+    assert low_grants == 10 * (1 - LOW_PRIORITY_RESERVE)
+    assert bucket.acquire(1, PRIORITY_HIGH)
+
+
+def test_buckets_are_shared_through_the_file(db_path):
+    TokenBucket('groq', capacity=5, refill_per_second=0.001, db_path=db_path).acquire(5)
+    assert not TokenBucket('groq', capacity=5, refill_per_second=0.001, db_path=db_path).acquire(1)
+
+
+def test_block_for_stops_every_caller(db_path):
+    bucket = TokenBucket('groq', capacity=10, refill_per_second=1, db_path=db_path)
+    bucket.block_for(30)
+    assert bucket.try_acquire(1) > 25
+    assert bucket.stats()['blocked_for'] > 25
+
+
+def test_waiting_high_priority_call_holds_off_low_priority_ones(db_path):
+    bucket = TokenBucket('google', capacity=10, refill_per_second=20, db_path=db_path)
+    assert bucket.acquire(10)
+
+    # The high-priority call queues for its tokens; low-priority calls may not take them meanwhile
+    assert bucket.try_acquire(5, PRIORITY_HIGH, queue_for=5) > 0
+    assert bucket.try_acquire(1, PRIORITY_LOW) > 0
+
+    order = []
+    lows = [threading.Thread(target=lambda: bucket.acquire(1, PRIORITY_LOW, max_wait=5) and order.append('low'))
+            for _ in range(3)]
+    for thread in lows:
+        thread.start()
+    time.sleep(0.01)
+    assert bucket.acquire(5, PRIORITY_HIGH, max_wait=5)
+    order.append('high')
+    for thread in lows:
+        thread.join()
+    assert order[0] == 'high'
+
+
+def test_old_bucket_tables_gain_the_queue_column(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE rate_buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, "
+                 "updated_at REAL NOT NULL, blocked_until REAL NOT NULL DEFAULT 0)")
+    conn.execute("INSERT INTO rate_buckets VALUES ('groq', 3, ?, 0)", (time.time(),))
+    conn.commit()
+    conn.close()
+
+    bucket = TokenBucket('groq', capacity=10, refill_per_second=0.001, db_path=db_path)
+    assert bucket.acquire(3)
+    assert not bucket.acquire(1)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("12") == 12.0
+    assert parse_retry_after("-3") == 0.0
+    in_a_minute = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=60), usegmt=True)
+    assert 55 < parse_retry_after(in_a_minute) <= 60
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+@pytest.fixture
+def make_flights(tmp_path):
+    def make(**options):
+        return SingleFlight('lookups', lock_dir=str(tmp_path / "locks"), db_path=str(tmp_path / "cache.sqlite3"), **options)
+    return make
+
+
+def begin_in_thread(flights, key, **options):
+    outcome = {}
+    thread = threading.Thread(target=lambda: outcome.update(zip(('call', 'result'), flights.begin(key, **options))))
+    thread.start()
+    return thread, outcome
+
+
+def test_followers_receive_the_leaders_result(make_flights):
+    flights = make_flights()
+    call, shared = flights.begin('dolo')
+    assert call is not None and shared is None
+
+    thread, outcome = begin_in_thread(flights, 'dolo')
+    time.sleep(0.05)
+    flights.finish(call, {'price': 30})
+    thread.join()
+
+    assert outcome == {'call': None, 'result': {'price': 30}}
+    assert flights.stats() == {'in_flight': 0, 'coalesced': 1}
+
+
+def test_follower_wait_is_capped_by_its_timeout(make_flights):
+    flights = make_flights(wait_timeout=30)
+    call, _ = flights.begin('dolo')
+
+    started = time.monotonic()
+    assert flights.begin('dolo', timeout=0.1) == (None, None)
+    assert time.monotonic() - started < 1
+    flights.finish(call, None, cacheable=False)
+
+
+def test_failed_results_are_not_cached(make_flights):
+    flights = make_flights()
+    call, _ = flights.begin('dolo')
+    flights.finish(call, {'error': 'upstream down'}, cacheable=False)
+
+    call, shared = flights.begin('dolo')
+    assert call is not None and shared is None
+    flights.finish(call, None, cacheable=False)
+
+
+def test_other_processes_pick_up_the_published_result(make_flights):
+    # Two instances share the lock directory and cache file like two worker processes
+    leader_process, other_process = make_flights(), make_flights()
+    call, _ = leader_process.begin('dolo')
+
+    thread, outcome = begin_in_thread(other_process, 'dolo')
+    time.sleep(0.1)
+    assert thread.is_alive()
+    leader_process.finish(call, {'price': 30})
+    thread.join()
+
+    assert outcome == {'call': None, 'result': {'price': 30}}
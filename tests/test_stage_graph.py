@@ -0,0 +1,100 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight
+from stage_graph import Degraded, StageError, StageGraph
+
+
+@pytest.fixture
+def graph(tmp_path):
+    executor = ThreadPoolExecutor(max_workers=4)
+    yield StageGraph(executor, SingleFlight('stages', lock_dir=str(tmp_path / "locks"), db_path=str(tmp_path / "cache.sqlite3")))
+    executor.shutdown()
+
+
+def test_stages_run_after_their_dependencies_and_are_cached(graph):
+    calls = []
+
+    @graph.stage('composition')
+    def composition(inputs):
+        calls.append('composition')
+        return f"{inputs['medicine']} 500mg"
+
+    @graph.stage('uses', requires=('composition',), key=('composition',))
+    def uses(inputs):
+        calls.append('uses')
+        return [f"uses of {inputs['composition']}"]
+
+    results, errors = graph.run(['uses'], medicine='Dolo')
+    assert results == {'composition': 'Dolo 500mg', 'uses': ['uses of Dolo 500mg']}
+    assert errors == {}
+    graph.run(['uses'], medicine='dolo')
+    assert calls == ['composition', 'uses']
+
+
+def test_failures_propagate_to_dependent_stages(graph):
+    @graph.stage('composition')
+    def composition(inputs):
+        raise StageError("Not found", 404)
+
+    @graph.stage('uses', requires=('composition',))
+    def uses(inputs):
+        return []
+
+    results, errors = graph.run(['uses'], medicine='Dolo')
+    assert results == {}
+    assert errors['uses'].status == 404
+
+
+def test_degraded_values_are_reported_and_never_cached(graph):
+    calls = []
+
+    @graph.stage('composition')
+    def composition(inputs):
+        calls.append(inputs['medicine'])
+        return Degraded("Paracetamol 650mg", "Showing the composition of 'Calpol 650mg'.")
+
+    @graph.stage('uses', requires=('composition',), key=('composition',))
+    def uses(inputs):
+        return [inputs['composition']]
+
+    for _ in range(2):
+        notes = {}
+        results, _ = graph.run(['uses'], notes=notes, medicine='Calpo')
+        assert results['composition'] == "Paracetamol 650mg"
+        assert results['uses'] == ["Paracetamol 650mg"]
+        assert notes == {'composition': "Showing the composition of 'Calpol 650mg'."}
+    assert calls == ['Calpo', 'Calpo']
+
+
+@pytest.mark.parametrize("outcome", ["fails", "finds nothing"])
+def test_coalesced_runs_share_a_failure_or_empty_result(tmp_path, outcome):
+    executor = ThreadPoolExecutor(max_workers=8)
+    graph = StageGraph(executor, SingleFlight('stages', lock_dir=str(tmp_path / "locks"), db_path=str(tmp_path / "cache.sqlite3")))
+    calls, started = [], threading.Event()
+
+    @graph.stage('composition')
+    def composition(inputs):
+        calls.append(inputs['medicine'])
+        started.set()
+        time.sleep(0.2)
+        if outcome == "fails":
+            raise StageError("Search is rate-limited", 429)
+        return None
+
+    with ThreadPoolExecutor(max_workers=5) as runs:
+        first = runs.submit(graph.run, ['composition'], medicine='Dolo')
+        started.wait()
+        others = [runs.submit(graph.run, ['composition'], medicine='Dolo') for _ in range(4)]
+        outcomes = [run.result() for run in [first] + others]
+    executor.shutdown()
+
+    assert calls == ['Dolo']
+    for results, errors in outcomes:
+        if outcome == "fails":
+            assert results == {} and errors['composition'].status == 429
+        else:
+            assert results == {'composition': None} and errors == {}
@@ -0,0 +1,88 @@
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import app
+
+# --- Response Cache Warmup ---
+# Runs the /search, /alternative-medicine-price and /price-comparison lookups for
+# popular medicines and stores the responses in the response cache, so those drugs
+# are always answered from cache. Meant to run off-peak, e.g. from cron:
+#
+#     python warmup.py --top 300
+#
+# Entries that are still fresh for longer than --refresh-within seconds are left
+# alone, so repeated runs only refresh what is about to go stale.
+
+DEFAULT_ROUTES = ('search', 'alternative-medicine-price', 'price-comparison')
+
+
+def load_names(names_file=None, top=200):
+    """
+    Reads medicine names from `names_file` (one per line, '#' starts a comment), or takes
+    the first `top` brands of the local catalogue.
+    """
+    if names_file:
+        with open(names_file, encoding='utf-8') as f:
+            names = [line.split('#', 1)[0].strip() for line in f]
+        return [name for name in names if name][:top]
+    return app.drug_catalogue.brands[:top]
+
+
+def needs_refresh(route, medicine_name, refresh_within):
+    entry = app.response_cache.get(app.coalesce_key(route, medicine_name))
+    return entry is None or entry['fresh_until'] - time.time() <= refresh_within
+
+
+def warm(route, medicine_name):
+    """
+    Recomputes one lookup and stores it. Returns True if a complete response was cached.
+    """
+    started = time.perf_counter()
+    try:
+        payload, status = app.refresh_response(route, medicine_name)
+    except Exception as e:
+        print(f"FAILED {route} '{medicine_name}': {e}")
+        return False
+    cached = app.is_complete_response((payload, status))
+    outcome = "ok" if cached else f"not cached (status {status}, missing {payload.get('missing_sections', [])})"
+    print(f"{route} '{medicine_name}': {outcome} in {time.perf_counter() - started:.1f}s")
+    return cached
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute and cache lookup responses for popular medicines.")
+    parser.add_argument('--names-file', help="File with one medicine name per line (default: catalogue brands)")
+    parser.add_argument('--top', type=int, default=200, help="How many names to warm (default: 200)")
+    parser.add_argument('--routes', default=",".join(DEFAULT_ROUTES),
+                        help=f"Comma-separated lookups to warm (default: {','.join(DEFAULT_ROUTES)})")
+    parser.add_argument('--refresh-within', type=int, default=3600,
+                        help="Refresh entries that go stale within this many seconds (default: 3600)")
+    parser.add_argument('--workers', type=int, default=2, help="Lookups run in parallel (default: 2)")
+    parser.add_argument('--force', action='store_true', help="Refresh every entry, even fresh ones")
+    args = parser.parse_args(argv)
+
+    routes = [route.strip() for route in args.routes.split(',') if route.strip()]
+    unknown = [route for route in routes if route not in app.LOOKUPS]
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(unknown)} (choose from {', '.join(app.LOOKUPS)})")
+
+    names = load_names(args.names_file, args.top)
+    jobs = [
+        (route, name) for name in names for route in routes
+        if args.force or needs_refresh(route, name, args.refresh_within)
+    ]
+    skipped = len(names) * len(routes) - len(jobs)
+    print(f"--- Warming {len(jobs)} lookups for {len(names)} medicines ({skipped} still fresh) ---")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(lambda job: warm(*job), jobs))
+    failed = results.count(False)
+    print(f"✅ Warmed {len(jobs) - failed} lookups in {time.perf_counter() - started:.1f}s; {failed} not cached.")
+    return 1 if failed and failed == len(jobs) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())